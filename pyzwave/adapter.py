@@ -6,6 +6,7 @@ import enum
 import logging
 
 from pyzwave.commandclass import NetworkManagementInclusion, NetworkManagementProxy, Zip
+from .timerwheel import timerWheel
 from .util import Listenable, MessageWaiter
 from .types import dsk_t
 from .message import Message
@@ -30,16 +31,29 @@ class Ack:
         PENDING = enum.auto()
         QUEUED = enum.auto()
         RECEIVED = enum.auto()
+        NACKED = enum.auto()
+        QUEUE_FULL = enum.auto()
+        OPTION_ERROR = enum.auto()
 
     def __init__(self):
-        self._event = asyncio.Event()
+        self._future = asyncio.get_event_loop().create_future()
         self._status = Ack.Status.PENDING
         self._expectedDelay = 0
 
+    def nacked(self, queueFull: bool = False, optionError: bool = False):
+        """Call this function when the message was rejected"""
+        if queueFull:
+            self._status = Ack.Status.QUEUE_FULL
+        elif optionError:
+            self._status = Ack.Status.OPTION_ERROR
+        else:
+            self._status = Ack.Status.NACKED
+        self._signal()
+
     def received(self):
         """Call this function when this ack has been received"""
         self._status = Ack.Status.RECEIVED
-        self._event.set()
+        self._signal()
 
     def queued(self, expectedDelay: int):
         """Call this function when the message cannot be delivered right now"""
@@ -50,16 +64,27 @@ class Ack:
         # Add some "wiggle room" for the wakeup
         self._expectedDelay = expectedDelay + 60
         self._status = Ack.Status.QUEUED
-        self._event.set()
+        self._signal()
 
-    async def wait(self, timeout):
-        """Wait until the node ack the message"""
-        await asyncio.wait_for(self._event.wait(), timeout)
+    @property
+    def status(self) -> "Ack.Status":
+        """The status of the message"""
+        return self._status
+
+    async def wait(self, timeout) -> "Ack.Status":
+        """Wait until the node ack or nack the message. Returns the status."""
+        wheel = timerWheel()
+        await wheel.waitFor(self._future, timeout)
         # Message was queued for a sleeping node.
         # Wait longer!
         while self._status == Ack.Status.QUEUED:
-            self._event.clear()
-            await asyncio.wait_for(self._event.wait(), self._expectedDelay)
+            self._future = wheel.loop.create_future()
+            await wheel.waitFor(self._future, self._expectedDelay)
+        return self._status
+
+    def _signal(self):
+        if not self._future.done():
+            self._future.set_result(None)
 
 
 class Adapter(Listenable, MessageWaiter, metaclass=abc.ABCMeta):
@@ -160,6 +185,17 @@ class Adapter(Listenable, MessageWaiter, metaclass=abc.ABCMeta):
         """Return a list of nodes included in the network"""
         raise NotImplementedError()
 
+    def nackReceived(self, zipPkt: Zip.ZipPacket) -> bool:
+        """Call this method when a nack, other than nack waiting, has been received"""
+        ack = self._ackQueue.pop(zipPkt.seqNo, None)
+        if not ack:
+            _LOGGER.warning(
+                "Received nack %d for command not waiting for", zipPkt.seqNo
+            )
+            return False
+        ack.nacked(queueFull=zipPkt.nackQueueFull, optionError=zipPkt.nackOptionError)
+        return True
+
     @property
     def nodeId(self) -> int:
         """Return the node id of the controller"""
@@ -202,6 +238,15 @@ class Adapter(Listenable, MessageWaiter, metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    async def sendMulticast(self, nodeIds: set, cmd: Message, **kwargs) -> bool:
+        """
+        Send message to several nodes with one multicast transmission. Returns True
+        if the controller accepted the message. The nodes do not acknowledge
+        multicast messages. Must be implemented in subclasses returning True from
+        supportsMulticast.
+        """
+        raise NotImplementedError()
+
     async def sendToNode(self, nodeId: int, cmd: Message, **kwargs) -> bool:
         """Send message to node. Must be implemented in subclass"""
         raise NotImplementedError()
@@ -223,14 +268,22 @@ class Adapter(Listenable, MessageWaiter, metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
-    async def waitForAck(self, ackId: int, timeout: int = 3):
-        """Async method for waiting for the adapter to receive a specific ack id"""
+    @property
+    def supportsMulticast(self) -> bool:
+        """Returns True if the adapter implements sendMulticast()"""
+        return False
+
+    async def waitForAck(self, ackId: int, timeout: int = 3) -> Ack.Status:
+        """
+        Async method for waiting for the adapter to receive a specific ack id.
+        Returns the status, Ack.Status.RECEIVED or one of the nack statuses.
+        """
         if ackId in self._ackQueue:
             raise Exception("Duplicate ackid used!")
         ack = Ack()
         self._ackQueue[ackId] = ack
         try:
-            await ack.wait(timeout)
+            return await ack.wait(timeout)
         except asyncio.TimeoutError:
             _LOGGER.warning("Timeout waiting for response for ack %s", ackId)
             del self._ackQueue[ackId]
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import logging
 from typing import Any, Dict
 
@@ -13,6 +14,7 @@ from pyzwave.const.ZW_classcmd import (
     COMMAND_CLASS_MULTI_CHANNEL_V2,
 )
 from pyzwave.persistantstorage import PersistantStorage
+from pyzwave.scheduler import Priority
 from pyzwave.util import Listenable
 
 _LOGGER = logging.getLogger(__name__)
@@ -157,6 +159,56 @@ class Application(Listenable):
         _LOGGER.info("Unhandled message! %s", command.debugString())
         return False
 
+    async def sendMulticast(
+        self, destinations, cmd: Message, followUp: bool = True, timeout: int = 3
+    ) -> Dict[int, bool]:
+        """
+        Send a command to several nodes using Z-Wave multicast addressing.
+        destinations are nodes or node ids in the format nodeid:channel. The command
+        is sent in one transmission for each endpoint addressed.
+
+        The nodes do not acknowledge multicast messages. If followUp is True the
+        command is also sent to each node, with maintenance priority so other
+        messages are not delayed. Nodes the multicast could not be sent to, or all
+        nodes if the adapter does not support multicast, get the command one by one.
+
+        Returns a dict with the result for each node id. If several endpoints of a
+        node were addressed the result is True only if all of them succeeded.
+        """
+        groups = {}
+        for node in destinations:
+            if isinstance(node, str):
+                node = self._nodes[node]
+            groups.setdefault(node.endpoint, []).append(node)
+        results = {}
+        singlecast = []
+        followUps = []
+        multicast = self.adapter.supportsMulticast
+        for endpoint, nodes in groups.items():
+            sent = False
+            if multicast and len(nodes) > 1:
+                sent = await self.adapter.sendMulticast(
+                    {node.rootNodeId for node in nodes},
+                    cmd,
+                    destEP=endpoint,
+                    timeout=timeout,
+                )
+            if not sent:
+                singlecast.extend(nodes)
+            elif followUp:
+                followUps.extend(nodes)
+            else:
+                for node in nodes:
+                    results.setdefault(node.rootNodeId, True)
+        sends = [node.send(cmd, timeout=timeout) for node in singlecast]
+        sends.extend(
+            node.send(cmd, timeout=timeout, priority=Priority.MAINTENANCE)
+            for node in followUps
+        )
+        for node, result in zip(singlecast + followUps, await asyncio.gather(*sends)):
+            results[node.rootNodeId] = results.get(node.rootNodeId, True) and result
+        return results
+
     def setNodeInfo(self, generic, specific, cmdClasses):
         """Set the application NIF (Node Information Frame)"""
         self._typeInfo = (generic, specific)
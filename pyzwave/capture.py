@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Offline decoding of captured Z-Wave frames.
+
+A capture file is a text file with one frame per line. Each line holds a timestamp
+(seconds as a float) followed by the frame in hex. The timestamp may be left out.
+A first word containing a decimal point, or not being hex, is read as the timestamp.
+Empty lines and lines starting with # are ignored::
+
+    # timestamp frame
+    1582289938.512 2302805002000052 0102
+    1582289938.634 230200d0600000...
+
+Large captures can be analyzed in parallel from the command line::
+
+    python -m pyzwave.capture --jobs 8 capture.txt
+"""
+
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+import sys
+from typing import Iterator, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Size in bytes of each part of the capture file handed to a worker process
+CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def parseCaptureLine(line) -> Optional[Tuple[Optional[float], bytes]]:
+    """
+    Parse one line from a capture file into a tuple (timestamp, frame).
+    Returns None for empty lines and comments.
+    """
+    if isinstance(line, (bytes, bytearray)):
+        line = line.decode("ascii")
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    parts = line.split(None, 1)
+    if len(parts) == 2 and _isTimestamp(parts[0]):
+        return (float(parts[0]), bytes.fromhex(parts[1]))
+    return (None, bytes.fromhex(line))
+
+
+def readCapture(source) -> Iterator[Tuple[Optional[float], bytes]]:
+    """
+    Read frames from a capture file. source can be a path or an open file object.
+    The file is streamed so arbitrary large captures can be read.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r") as fd:
+            yield from readCapture(fd)
+        return
+    for lineNo, line in enumerate(source, 1):
+        try:
+            frame = parseCaptureLine(line)
+        except ValueError as error:
+            raise ValueError(
+                "Malformed capture line {}: {}".format(lineNo, error)
+            ) from error
+        if frame is not None:
+            yield frame
+
+
+class CaptureStatistics:
+    """Frame statistics for a capture, grouped per command class and command"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.commands = Counter()
+        self.errors = 0
+        self.firstTimestamp = None
+        self.frames = 0
+        self.lastTimestamp = None
+
+    def add(self, frame: bytes, timestamp: Optional[float] = None):
+        """Decode a frame and add it to the statistics"""
+        self.frames += 1
+        self.bytes += len(frame)
+        if timestamp is not None:
+            if self.firstTimestamp is None or timestamp < self.firstTimestamp:
+                self.firstTimestamp = timestamp
+            if self.lastTimestamp is None or timestamp > self.lastTimestamp:
+                self.lastTimestamp = timestamp
+        try:
+            msg = Message.decode(frame)
+            if isinstance(msg, Zip.ZipPacket) and msg.command is not None:
+                # Count the encapsulated command, this is the interesting one
+                msg = msg.command
+            hid = msg.hid()
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.debug("Could not decode frame %s", frame.hex(), exc_info=True)
+            self.errors += 1
+            return
+        self.commands[hid] += 1
+
+    def cmdClasses(self) -> Counter:
+        """Return the number of frames per command class"""
+        counter = Counter()
+        for hid, count in self.commands.items():
+            counter[hid >> 8] += count
+        return counter
+
+    def merge(self, other: "CaptureStatistics"):
+        """Add the statistics from another (partial) capture to this one"""
+        self.bytes += other.bytes
+        self.commands.update(other.commands)
+        self.errors += other.errors
+        self.frames += other.frames
+        for timestamp in (other.firstTimestamp, other.lastTimestamp):
+            if timestamp is None:
+                continue
+            if self.firstTimestamp is None or timestamp < self.firstTimestamp:
+                self.firstTimestamp = timestamp
+            if self.lastTimestamp is None or timestamp > self.lastTimestamp:
+                self.lastTimestamp = timestamp
+
+    def report(self) -> str:
+        """Return the statistics as human readable text"""
+        lines = [
+            "Frames: {}, bytes: {}, decode errors: {}".format(
+                self.frames, self.bytes, self.errors
+            )
+        ]
+        if self.firstTimestamp is not None:
+            lines.append(
+                "Duration: {:.3f}s".format(self.lastTimestamp - self.firstTimestamp)
+            )
+        perCmd = {}
+        for hid, count in self.commands.items():
+            perCmd.setdefault(hid >> 8, []).append((count, hid))
+        for cmdClass, count in self.cmdClasses().most_common():
+            name = cmdClasses.get(cmdClass, "0x{:02X}".format(cmdClass))
+            lines.append("{:<40} {:>10}".format(name, count))
+            for cmdCount, hid in sorted(perCmd[cmdClass], reverse=True):
+                lines.append("  {:<38} {:>10}".format(_commandName(hid), cmdCount))
+        return "\n".join(lines)
+
+
+def _commandName(hid: int) -> str:
+    msgCls = ZWaveMessage.get(hid)
+    if msgCls is None or msgCls.NAME is None:
+        return "0x{:02X}".format(hid & 0xFF)
+    return msgCls.NAME
+
+
+def _isTimestamp(word: str) -> bool:
+    if "." in word:
+        return True
+    try:
+        bytes.fromhex(word)
+    except ValueError:
+        return True
+    return False
+
+
+def _analyzeRange(path, start: int, end: int) -> CaptureStatistics:
+    """Analyze all lines starting within the byte range [start, end) of a capture"""
+    stats = CaptureStatistics()
+    with open(path, "rb") as fd:
+        pos = start
+        if start > 0:
+            # Skip the line started in the previous range
+            fd.seek(start - 1)
+            pos += len(fd.readline()) - 1
+        while pos < end:
+            line = fd.readline()
+            if not line:
+                break
+            pos += len(line)
+            try:
+                frame = parseCaptureLine(line)
+            except ValueError:
+                stats.errors += 1
+                continue
+            if frame is not None:
+                stats.add(frame[1], frame[0])
+    return stats
+
+
+def analyze(path, jobs: Optional[int] = None, chunkSize: int = CHUNK_SIZE):
+    """
+    Decode a capture file and return the statistics as CaptureStatistics.
+    The file is split into parts of chunkSize bytes decoded in parallel by jobs
+    processes (defaults to the number of cpus). Set jobs to 1 to decode in this
+    process.
+    """
+    size = os.path.getsize(path)
+    ranges = [
+        (start, min(start + chunkSize, size)) for start in range(0, size, chunkSize)
+    ]
+    stats = CaptureStatistics()
+    if jobs == 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            stats.merge(_analyzeRange(path, start, end))
+        return stats
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_analyzeRange, path, start, end) for start, end in ranges
+        ]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+def main(argv=None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        prog="pyzwave-capture", description="Decode and analyze Z-Wave captures"
+    )
+    parser.add_argument("capture", nargs="+", help="Capture file(s) to analyze")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of cpus)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="Number of bytes of the capture handed to a worker at a time",
+    )
+    args = parser.parse_args(argv)
+    stats = CaptureStatistics()
+    for path in args.capture:
+        stats.merge(analyze(path, jobs=args.jobs, chunkSize=args.chunk_size))
+    print(stats.report())
+    return 0
+
+
+# pylint: disable=wrong-import-position
+from pyzwave.commandclass import ZWaveMessage, Zip, cmdClasses
+from pyzwave.message import Message
+
+if __name__ == "__main__":
+    sys.exit(main())
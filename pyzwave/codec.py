@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+import inspect
+import struct
+
+from pyzwave.types import (
+    BitsBase,
+    BitStreamReader,
+    BitStreamWriter,
+    int_t,
+    uintbits_t,
+    STRUCT_FORMATS,
+)
+
+BITS_TYPES = (BitsBase, uintbits_t)
+
+# Marker for attributes not yet set in the storage array of AttributesMixin
+MISSING = object()
+
+
+def _bindHook(owner, name):
+    """
+    Lookup a parse_/compose_ hook on the class once and return a function taking
+    (instance, stream) regardless of how the hook was declared
+    """
+    raw = inspect.getattr_static(owner, name, None)
+    if raw is None:
+        return None
+    if isinstance(raw, staticmethod):
+        func = raw.__func__
+        return lambda _obj, stream: func(stream)
+    if isinstance(raw, classmethod):
+        func = getattr(owner, name)
+        return lambda _obj, stream: func(stream)
+    return raw
+
+
+def _isFixedInt(attrType) -> bool:
+    if not isinstance(attrType, type) or not issubclass(attrType, int_t):
+        return False
+    if attrType.endian != "big":
+        return False
+    if (attrType.size, attrType.signed) not in STRUCT_FORMATS:
+        return False
+    return (
+        attrType.deserialize.__func__ is int_t.deserialize.__func__
+        and attrType.serialize is int_t.serialize
+    )
+
+
+def _isBits(attrType) -> bool:
+    if not isinstance(attrType, type) or not issubclass(attrType, BITS_TYPES):
+        return False
+    if not 0 < attrType.sizeBits <= 8:
+        return False
+    return attrType.deserialize.__func__ in (
+        BitsBase.deserialize.__func__,
+        uintbits_t.deserialize.__func__,
+    ) and attrType.serialize in (BitsBase.serialize, uintbits_t.serialize)
+
+
+class FieldStep:
+    """Plan step encoding or decoding a single attribute using its type or custom hook"""
+
+    def __init__(self, owner, name, attrType):
+        self.name = name
+        self.attrType = attrType
+        # Index in the storage array of the instance
+        self.index = owner._attributeTable[name][0]  # pylint: disable=protected-access
+        self.default = getattr(attrType, "default", None)
+        self.parser = _bindHook(owner, "parse_{}".format(name))
+        self.composer = _bindHook(owner, "compose_{}".format(name))
+        # Only used by RunStep
+        self.slot = 0
+        self.shift = 0
+        self.mask = 0
+        self.defaultValue = None
+
+    def decode(self, obj, stream: BitStreamReader):
+        """Decode this attribute from stream into obj"""
+        if self.parser:
+            value = self.parser(obj, stream)
+        else:
+            value = self.attrType.deserialize(stream)
+        setattr(obj, self.name, value)
+
+    def encode(self, obj, stream: BitStreamWriter):
+        """Encode this attribute from obj into stream"""
+        value = obj._values[self.index]  # pylint: disable=protected-access
+        if value is MISSING:
+            if self.default is not None:
+                self.attrType(self.default).serialize(stream)
+                return
+            raise AttributeError(
+                "Value for attribute '{}' in {} has not been set".format(self.name, obj)
+            )
+        if self.composer:
+            self.composer(obj, stream)
+            return
+        if not hasattr(value, "serialize"):
+            raise ValueError("Cannot encode", self.name, value)
+        value.serialize(stream)
+
+
+class RunStep:
+    """
+    Plan step for a byte aligned run of fixed size integers and bit fields.
+    The whole run is packed and unpacked with one precompiled struct.
+    """
+
+    def __init__(self, fields, fmt):
+        self.fields = fields
+        self.slots = len(fmt)
+        self.struct = struct.Struct(">" + fmt)
+
+    def decode(self, obj, stream: BitStreamReader):
+        """Decode all fields in the run, falling back per field on short data"""
+        if not stream.isByteAligned() or stream.bytesLeft() < self.struct.size:
+            for field in self.fields:
+                if stream.bytesLeft() == 0:
+                    return False
+                field.decode(obj, stream)
+            return True
+        values = stream.unpack(self.struct)
+        for field in self.fields:
+            value = values[field.slot]
+            if field.mask:
+                value = (value >> field.shift) & field.mask
+            setattr(obj, field.name, value)
+        return True
+
+    def encode(self, obj, stream: BitStreamWriter):
+        """Encode all fields in the run, falling back per field if not possible"""
+        if not stream.isByteAligned() or not self._pack(obj, stream):
+            for field in self.fields:
+                field.encode(obj, stream)
+
+    def _pack(self, obj, stream: BitStreamWriter) -> bool:
+        # pylint: disable=protected-access
+        values = obj._values
+        slots = [0] * self.slots
+        try:
+            for field in self.fields:
+                value = values[field.index]
+                if value is MISSING:
+                    if field.defaultValue is None:
+                        return False
+                    value = field.defaultValue
+                else:
+                    value = int(value)
+                if field.mask:
+                    if not 0 <= value <= field.mask:
+                        return False
+                    slots[field.slot] |= value << field.shift
+                else:
+                    slots[field.slot] = value
+            stream.addStruct(self.struct, *slots)
+        except (TypeError, ValueError, struct.error):
+            return False
+        return True
+
+
+class LazyDecode:
+    """
+    Holds the undecoded tail of a lazily parsed object until one of the deferred
+    attributes is accessed
+    """
+
+    def __init__(self, steps, data):
+        self.steps = steps
+        self.data = data
+
+    def decode(self, obj):
+        """Decode the deferred attributes into obj"""
+        _decodeSteps(self.steps, obj, BitStreamReader(self.data))
+
+
+def _decodeSteps(steps, obj, stream: BitStreamReader):
+    for step in steps:
+        if stream.bytesLeft() == 0:
+            # No more data, cannot decode rest of the attributes
+            break
+        if step.decode(obj, stream) is False:
+            break
+
+
+class CodecPlan:
+    """
+    Precompiled encode/decode plan for a class using AttributesMixin.
+    The plan is compiled once per class and resolves custom parse_/compose_ hooks,
+    struct formats for fixed size fields and the command class header up front.
+    """
+
+    def __init__(self, owner, cmdClass=None, cmd=None):
+        self.hid = None
+        self.header = b""
+        if cmdClass is not None and cmd is not None:
+            self.hid = (cmdClass << 8) | (cmd & 0xFF)
+            self.header = bytes((cmdClass, cmd))
+        self.steps = self._compile(owner)
+        # Index of the first step that may be deferred when decoding lazily
+        self.lazyIndex = len(self.steps)
+        lazyAttributes = getattr(owner, "lazyAttributes", ())
+        for i, step in enumerate(self.steps):
+            fields = step.fields if isinstance(step, RunStep) else [step]
+            if any(field.name in lazyAttributes for field in fields):
+                self.lazyIndex = i
+                break
+
+    def decode(self, obj, stream: BitStreamReader, lazy: bool = False):
+        """
+        Populate the attributes of obj from stream.
+        If lazy is set the attributes listed in lazyAttributes of the class, and
+        everything after them, is not decoded until first accessed.
+        """
+        if not lazy or self.lazyIndex == len(self.steps):
+            _decodeSteps(self.steps, obj, stream)
+            return
+        _decodeSteps(self.steps[: self.lazyIndex], obj, stream)
+        if stream.bytesLeft() <= 0:
+            return
+        if not stream.isByteAligned():
+            _decodeSteps(self.steps[self.lazyIndex :], obj, stream)
+            return
+        data = stream.view(stream.bytesLeft())
+        if not data.readonly:
+            # The buffer may change under our feet, keep a private copy
+            data = data.tobytes()
+        obj._lazy = LazyDecode(  # pylint: disable=protected-access
+            self.steps[self.lazyIndex :], data
+        )
+
+    def encode(self, obj, stream: BitStreamWriter):
+        """Write the attributes of obj into stream"""
+        for step in self.steps:
+            step.encode(obj, stream)
+
+    @staticmethod
+    def compile(owner, cmdClass=None, cmd=None) -> "CodecPlan":
+        """Compile a new plan for the class owner and store it on the class"""
+        plan = CodecPlan(owner, cmdClass, cmd)
+        owner.__codecPlan__ = plan
+        return plan
+
+    @staticmethod
+    def forClass(owner) -> "CodecPlan":
+        """Return the plan for the class owner, compiling it on first use"""
+        plan = owner.__dict__.get("__codecPlan__")
+        if plan is None:
+            plan = CodecPlan.compile(owner)
+        return plan
+
+    @staticmethod
+    def _compile(owner) -> list:
+        steps = []
+        pending = []
+        fmt = ""
+        bitPos = 0
+
+        def flush():
+            nonlocal pending, fmt, bitPos
+            if pending and bitPos % 8 == 0:
+                steps.append(RunStep(pending, fmt))
+            else:
+                steps.extend(pending)
+            pending, fmt, bitPos = [], "", 0
+
+        for attr in getattr(owner, "attributes"):
+            field = FieldStep(owner, attr[0], attr[1])
+            attrType = field.attrType
+            hooked = field.parser is not None or field.composer is not None
+            if not hooked and _isFixedInt(attrType) and bitPos % 8 == 0:
+                field.slot = len(fmt)
+                fmt += STRUCT_FORMATS[(attrType.size, attrType.signed)]
+                bitPos += attrType.size * 8
+            elif (
+                not hooked and _isBits(attrType) and bitPos % 8 + attrType.sizeBits <= 8
+            ):
+                if bitPos % 8 == 0:
+                    fmt += "B"
+                field.slot = len(fmt) - 1
+                field.shift = 8 - bitPos % 8 - attrType.sizeBits
+                field.mask = (1 << attrType.sizeBits) - 1
+                bitPos += attrType.sizeBits
+            else:
+                flush()
+                steps.append(field)
+                continue
+            if field.default is not None:
+                try:
+                    field.defaultValue = int(attrType(field.default))
+                except (TypeError, ValueError):
+                    field.defaultValue = None
+            pending.append(field)
+        flush()
+        return steps
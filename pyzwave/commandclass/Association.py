@@ -96,6 +96,8 @@ class Nodes(list):
 class Group(DictAttribute):
     """Attribute for information regarding one association group"""
 
+    __slots__ = ("multiChannelMaxNodes",)
+
     attributes = (
         ("maxNodes", uint8_t),
         ("nodes", Nodes),
@@ -12,6 +12,8 @@ _LOGGER = logging.getLogger(__name__)
 class Attribute:
     """An attribute"""
 
+    __slots__ = ()
+
 
 class DictAttribute(Attribute, AttributesMixin):
     """A dict attribute"""
@@ -158,6 +160,9 @@ class CommandClass(AttributesMixin, Listenable):
         if self.id == 0:
             # Not implemented command class
             return 0
+        # Loaded here to not pull in all constants when this module is imported
+        from . import Version  # pylint: disable=import-outside-toplevel
+
         try:
             answer = await self._node.sendAndReceive(
                 Version.VersionCommandClassGet(requestedCommandClass=self.id),
@@ -234,7 +239,3 @@ class UnknownCommandClass(CommandClass):
     @property
     def name(self):
         return "UNKNOWN (0x{:X})".format(self.id)
-
-
-# pylint: disable=wrong-import-position
-from . import Version
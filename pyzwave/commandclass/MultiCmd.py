@@ -0,0 +1,159 @@
+import logging
+
+from pyzwave.const.ZW_classcmd import COMMAND_CLASS_MULTI_CMD, MULTI_CMD_ENCAP
+from pyzwave.message import Message
+from pyzwave.types import BitStreamReader, BitStreamWriter
+from . import ZWaveCommandClass, ZWaveMessage, ZWaveMessageHandler
+from .CommandClass import CommandClass
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default maximum payload for one frame. This leaves room for the security
+# encapsulation added by the gateway.
+MAX_PAYLOAD = 26
+# Command class, command and number of commands
+ENCAP_HEADER_SIZE = 3
+
+
+class Commands(list):
+    """
+    List of commands encapsulated in a multi command message. If the commands have
+    already been composed the result can be passed as composed to reuse it. A copy
+    of another Commands reuses its composed commands.
+    """
+
+    __slots__ = ("_composed",)
+
+    def __init__(self, commands=(), composed: list = None):
+        super().__init__(commands)
+        if composed is None and isinstance(commands, Commands):
+            composed = commands._composed
+        self._composed = composed
+
+    def __getstate__(self):
+        return [command.__getstate__() for command in self]
+
+    def serialize(self, stream: BitStreamWriter):
+        """Serialize the number of commands and each command prefixed by its length"""
+        composed = self._composed
+        if composed is None or len(composed) != len(self):
+            composed = [command.compose() for command in self]
+        stream.append(len(self))
+        for data in composed:
+            stream.append(len(data))
+            stream.extend(data)
+
+    @classmethod
+    def deserialize(cls, stream: BitStreamReader):
+        """Deserialize the encapsulated commands"""
+        commands = cls()
+        numberOfCommands = stream.byte()
+        for _ in range(numberOfCommands):
+            length = stream.byte()
+            commands.append(Message.deserialize(stream.subReader(length)))
+        return commands
+
+
+@ZWaveMessage(COMMAND_CLASS_MULTI_CMD, MULTI_CMD_ENCAP)
+class Encap(Message):
+    """Command Class message COMMAND_CLASS_MULTI_CMD MULTI_CMD_ENCAP"""
+
+    NAME = "ENCAP"
+
+    attributes = (("commands", Commands),)
+
+    def __init__(self, **kwargs):
+        # A class level default would share one list between all messages
+        kwargs.setdefault("commands", ())
+        super().__init__(**kwargs)
+
+
+class Batch:
+    """
+    Collects commands to one node and sends them in as few frames as possible. Use
+    :meth:`pyzwave.node.Node.batch` to create a batch.
+
+    No frame is larger than maxPayload bytes. The default leaves room for the
+    security encapsulation added by the gateway.
+    """
+
+    def __init__(self, node, maxPayload: int = MAX_PAYLOAD):
+        self._commands = []
+        self._maxPayload = maxPayload
+        self._node = node
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    async def __aenter__(self) -> "Batch":
+        return self
+
+    async def __aexit__(self, excType, exc, traceback):
+        if excType is None:
+            await self.flush()
+
+    def add(self, command: Message):
+        """Add a command to the batch"""
+        self._commands.append(command)
+
+    async def flush(self, timeout: int = 3) -> bool:
+        """
+        Send all commands added since the last flush. Returns False if any of the
+        frames was not acknowledged.
+        """
+        commands, self._commands = self._commands, []
+        if self._node.supports(COMMAND_CLASS_MULTI_CMD):
+            frames = self.pack(commands, self._maxPayload)
+        else:
+            frames = commands
+        success = True
+        for frame in frames:
+            if not await self._node.send(frame, timeout=timeout):
+                success = False
+        return success
+
+    @staticmethod
+    def pack(commands: list, maxPayload: int = MAX_PAYLOAD) -> list:
+        """
+        Group the commands in multi command frames no larger than maxPayload. The
+        order of the commands is kept. A command alone in its frame, or too large to
+        share a frame, is not encapsulated.
+        """
+        frames = []
+        group = []
+        composed = []
+        size = ENCAP_HEADER_SIZE
+
+        def flush():
+            if len(group) == 1:
+                frames.append(group[0])
+            elif group:
+                # Reuse the commands composed for measuring them
+                frames.append(Encap(commands=Commands(group, composed)))
+
+        for command in commands:
+            data = command.compose()
+            length = 1 + len(data)
+            if group and size + length > maxPayload:
+                flush()
+                group = []
+                composed = []
+                size = ENCAP_HEADER_SIZE
+            group.append(command)
+            composed.append(data)
+            size += length
+        flush()
+        return frames
+
+
+@ZWaveCommandClass(COMMAND_CLASS_MULTI_CMD)
+class MultiCmd(CommandClass):
+    """Command Class COMMAND_CLASS_MULTI_CMD"""
+
+    NAME = "MULTI_CMD"
+
+    @ZWaveMessageHandler(Encap)
+    async def __encap__(self, encap: Encap, flags):
+        for command in encap.commands:
+            await self._node.handleMessage(command, flags)
+        return True
@@ -27,7 +27,7 @@ class Get(Message):
     def parse_command(stream: BitStreamReader):  # pylint: disable=invalid-name
         """Parse the length prefixed command"""
         length = stream.byte()
-        return Message.decode(stream.value(length))
+        return Message.deserialize(stream.subReader(length))
 
 
 @ZWaveMessage(COMMAND_CLASS_SUPERVISION, SUPERVISION_REPORT)
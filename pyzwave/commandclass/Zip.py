@@ -1,4 +1,5 @@
 from enum import IntEnum
+from functools import lru_cache
 from pyzwave.const.ZW_classcmd import (
     COMMAND_CLASS_ZIP,
     COMMAND_ZIP_PACKET,
@@ -80,6 +81,10 @@ class IMELastWorkingRoute(IMEValue, AttributesMixin):
         lastWorkingRoute.parseAttributes(value)
         return lastWorkingRoute
 
+    def serialize(self, stream: BitStreamWriter):
+        """Serialize the route into stream"""
+        self.composeAttributes(stream)
+
 
 class IMERouteChanged(IMEValue, uint8_t):
     """Route changed"""
@@ -118,11 +123,19 @@ class ZIPPacketOptionMaintenanceReport(
         while stream.bytesLeft():
             imeType = IMEType(stream.byte())
             length = stream.byte()
-            imeVal = stream.value(length)
             typeCls = IME_MAPPING.get(imeType, IMEUnknownValue)
-            retval[imeType] = typeCls.load(BitStreamReader(imeVal))
+            retval[imeType] = typeCls.load(stream.subReader(length))
         return retval
 
+    def serialize(self, stream: BitStreamWriter):
+        """Serialize ZIP Maintenance Report"""
+        for imeType, value in self.items():
+            data = BitStreamWriter()
+            value.serialize(data)
+            stream.append(imeType)
+            stream.append(len(data))
+            stream.extend(data)
+
 
 class ZIPPacketOptionEncapsulationFormatInfo(ZIPPacketOptionData, AttributesMixin):
     """Zip packet option encapsulation format info"""
@@ -133,11 +146,64 @@ class ZIPPacketOptionEncapsulationFormatInfo(ZIPPacketOptionData, AttributesMixi
         ("crc16", flag_t),
     )
 
+    def serialize(self, stream: BitStreamWriter):
+        """Serialize the encapsulation format info into stream"""
+        self.composeAttributes(stream)
+
+
+class ZIPPacketOptionMaintenanceGet(ZIPPacketOptionData, AttributesMixin):
+    """Zip packet option maintenance get. Requests a maintenance report in the ack"""
+
+    def serialize(self, stream: BitStreamWriter):
+        """The option has no data"""
+
 
 class ZIPPacketOptionExpectedDelay(ZIPPacketOptionData, int24_t):
     """Zip Packet option expexted delay"""
 
 
+class ZIPPacketOptionMulticastAddressing(ZIPPacketOptionData, set):
+    """
+    Zip packet option multicast addressing. The node ids the command is sent to,
+    encoded as a bitmask where bit 0 of the first byte is node 1
+    """
+
+    @classmethod
+    def deserialize(cls, stream: BitStreamReader):
+        """Deserialize the node ids"""
+        nodeIds = set()
+        i = 0
+        while stream.bytesLeft():
+            nodeByte = stream.byte()
+            for j in range(8):
+                if nodeByte & (1 << j):
+                    nodeIds.add(i * 8 + j + 1)
+            i += 1
+        return nodeIds
+
+    def serialize(self, stream: BitStreamWriter):
+        """Serialize the node ids. Trailing empty bytes are left out"""
+        mask = bytearray((max(self, default=0) + 7) // 8)
+        for nodeId in self:
+            mask[(nodeId - 1) // 8] |= 1 << ((nodeId - 1) % 8)
+        stream.extend(mask)
+
+
+class ZIPPacketOptionUnknown(ZIPPacketOptionData, bytes_t):
+    """
+    Option not implemented. The raw data and the critical flag are kept so the
+    option is composed again unchanged.
+    """
+
+    def __new__(cls, value=b"", critical: bool = False):
+        return super().__new__(cls, value)
+
+    def __init__(self, value=b"", critical: bool = False):
+        # pylint: disable=unused-argument
+        super().__init__()
+        self.critical = critical
+
+
 class ZIPPacketOptionType(IntEnum):
     """ZIP Packet option type"""
 
@@ -148,6 +214,15 @@ class ZIPPacketOptionType(IntEnum):
     ZWAVE_MULTICAST_ADDRESSING = 5
 
 
+# Options the receiver must understand. If not the packet is rejected with a nack
+CRITICAL_OPTIONS = frozenset((ZIPPacketOptionType.ZWAVE_MULTICAST_ADDRESSING,))
+# Encoded option type byte, including the critical flag, for each option
+OPTION_TYPE_BYTES = {
+    optionType: (optionType in CRITICAL_OPTIONS) << 7 | optionType
+    for optionType in ZIPPacketOptionType
+}
+
+
 class ZIPPacketOption(AttributesMixin):
     """ZIP Packet option"""
 
@@ -159,24 +234,29 @@ class ZIPPacketOption(AttributesMixin):
 
     def parse_optionData(self, stream: BitStreamReader):  # pylint: disable=invalid-name
         """Parse attribute optionData"""
-        clsType = ZIPPacketOptionData
+        clsType = ZIPPacketOptionUnknown
         length = stream.byte()
-        data = stream.value(length)
-        if self.optionType == ZIPPacketOptionType.MAINTENANCE_REPORT:
+        reader = stream.subReader(length)
+        if self.optionType == ZIPPacketOptionType.MAINTENANCE_GET:
+            clsType = ZIPPacketOptionMaintenanceGet
+        elif self.optionType == ZIPPacketOptionType.MAINTENANCE_REPORT:
             clsType = ZIPPacketOptionMaintenanceReport
         elif self.optionType == ZIPPacketOptionType.ENCAPSULATION_FORMAT_INFORMATION:
             clsType = ZIPPacketOptionEncapsulationFormatInfo
         elif self.optionType == ZIPPacketOptionType.EXPECTED_DELAY:
             clsType = ZIPPacketOptionExpectedDelay
+        elif self.optionType == ZIPPacketOptionType.ZWAVE_MULTICAST_ADDRESSING:
+            clsType = ZIPPacketOptionMulticastAddressing
         cls = clsType()
         if hasattr(cls, "parseAttributes"):
-            cls.parseAttributes(BitStreamReader(data))
+            cls.parseAttributes(reader)
         elif hasattr(cls, "__setstate__"):
-            data = clsType.deserialize(BitStreamReader(data))
+            data = clsType.deserialize(reader)
             cls.__setstate__(data)
+        elif clsType is ZIPPacketOptionUnknown:
+            cls = clsType(clsType.deserialize(reader), critical=bool(self.critical))
         else:
-            value = clsType.deserialize(BitStreamReader(data))
-            return clsType(value)
+            cls = clsType(clsType.deserialize(reader))
         return cls
 
 
@@ -192,21 +272,60 @@ class HeaderExtension(VarDictAttribute(ZIPPacketOptionType, ZIPPacketOptionData)
         """Returns the expected delay for sleeping nodes"""
         return self.get(ZIPPacketOptionType.EXPECTED_DELAY, 0)
 
+    @property
+    def lastWorkingRoute(self) -> IMELastWorkingRoute:
+        """Returns the last working route if included in a maintenance report"""
+        report = self.get(ZIPPacketOptionType.MAINTENANCE_REPORT)
+        if not report:
+            return None
+        return report.get(IMEType.LAST_WORKING_ROUTE)
+
+    @property
+    def multicastAddressing(self) -> set:
+        """Returns the node ids the packet is multicast to, if any"""
+        return self.get(ZIPPacketOptionType.ZWAVE_MULTICAST_ADDRESSING)
+
     def serialize(self, stream: BitStreamWriter):
         """Serialize header extension into stream"""
+        if not self:
+            return
+        # Reserve the length byte and fill it in when all options are written
+        start = len(stream)
+        stream.append(0)
+        for optionType, optionData in self.items():
+            typeByte = OPTION_TYPE_BYTES.get(optionType)
+            if typeByte is None:
+                # Unknown option, keep the critical flag it was received with
+                typeByte = optionData.critical << 7 | optionType
+            stream.append(typeByte)
+            lengthPos = len(stream)
+            stream.append(0)
+            optionData.serialize(stream)
+            stream[lengthPos] = len(stream) - lengthPos - 1
+        # The length includes the length byte itself
+        stream[start] = len(stream) - start
 
     @classmethod
     def deserialize(cls, stream: BitStreamReader):
         """Deserialize header extension from stream"""
         retval = {}
         extLength = stream.byte() - 1
-        reader = BitStreamReader(stream.value(extLength))
+        reader = stream.subReader(extLength)
         while reader.bytesLeft() > 0:
             option = ZIPPacketOption()
             option.parseAttributes(reader)
             retval[option.optionType] = option.optionData
         return retval
 
+    def __setstate__(self, state):
+        for key, value in state.items():
+            try:
+                key = ZIPPacketOptionType(key)
+            except ValueError:
+                # Unknown option, keyed by its type number
+                key = int(key)
+            self[key] = value
+
 
 @ZWaveMessage(COMMAND_CLASS_ZIP, COMMAND_ZIP_KEEP_ALIVE)
 class ZipKeepAlive(Message):
@@ -222,6 +341,15 @@ class ZipKeepAlive(Message):
         ("_", reserved_t(6)),
     )
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def frame(ackRequest: bool, ackResponse: bool) -> bytes:
+        """
+        Return the composed keep alive message. The message is constant so it is
+        only composed once for each combination of flags.
+        """
+        return ZipKeepAlive(ackRequest=ackRequest, ackResponse=ackResponse).compose()
+
 
 @ZWaveMessage(COMMAND_CLASS_ZIP, COMMAND_ZIP_PACKET)
 class ZipPacket(Message):
@@ -254,6 +382,54 @@ class ZipPacket(Message):
         ("headerExtension", HeaderExtension),
         ("command", Message),
     )
+    # When decoded lazily only the fixed header is parsed up front
+    lazyAttributes = ("headerExtension", "command")
+    # Offset of seqNo in a composed packet
+    SEQ_NO_OFFSET = 4
+
+    @classmethod
+    def frame(
+        cls,
+        seqNo: int,
+        command,
+        sourceEP: int = 0,
+        destEP: int = 0,
+        secureOrigin: bool = True,
+        headerExtension: HeaderExtension = None,
+    ) -> bytes:
+        """
+        Compose a packet requesting an ack and encapsulating command.
+        This gives the same result as composing a ZipPacket but the header is taken
+        from a precomposed template so only the command has to be composed.
+        The command may also be given already composed, as bytes.
+        """
+        headerExtIncluded = bool(headerExtension)
+        frame = BitStreamWriter()
+        frame.extend(cls.template(sourceEP, destEP, secureOrigin, headerExtIncluded))
+        frame[cls.SEQ_NO_OFFSET] = seqNo
+        if headerExtIncluded:
+            headerExtension.serialize(frame)
+        frame += command if isinstance(command, bytes) else command.compose()
+        return bytes(frame)
+
+    def commandHid(self) -> int:
+        """
+        Return the hid of the encapsulated command. If the packet was decoded lazily
+        the command is not decoded to find this out.
+        """
+        lazy = self._lazy
+        if lazy is None:
+            return self.command.hid() if self.command else 0
+        data = lazy.data
+        offset = 0
+        if self.headerExtIncluded:
+            if not data:
+                return 0
+            # The length byte includes itself
+            offset = data[0]
+        if len(data) < offset + 2:
+            return 0
+        return data[offset] << 8 | data[offset + 1]
 
     def parse_headerExtension(
         self, stream: BitStreamReader
@@ -263,6 +439,32 @@ class ZipPacket(Message):
             return {}
         return HeaderExtension.deserialize(stream)
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def template(
+        sourceEP: int, destEP: int, secureOrigin: bool, headerExtIncluded: bool = False
+    ) -> bytes:
+        """
+        Return the composed header used by frame(), with seqNo set to zero and
+        without any header extension or command
+        """
+        return ZipPacket(
+            ackRequest=True,
+            ackResponse=False,
+            nackResponse=False,
+            nackWaiting=False,
+            nackQueueFull=False,
+            nackOptionError=False,
+            headerExtIncluded=headerExtIncluded,
+            zwCmdIncluded=True,
+            moreInformation=False,
+            secureOrigin=secureOrigin,
+            seqNo=0,
+            sourceEP=sourceEP,
+            destEP=destEP,
+            command=Message(),
+        ).compose()
+
     def response(
         self,
         success: bool,
@@ -1,38 +1,113 @@
 import asyncio
+import importlib
 import logging
+import pkgutil
 
+from pyzwave.codec import CodecPlan
 from pyzwave.util import Listenable
 
+from . import index
+
 _LOGGER = logging.getLogger(__name__)
 
 
-class CommandClassMessageCollection(dict):
+def _loadModule(name):
+    """Import a command class module by name, registering its messages"""
+    return importlib.import_module("{}.{}".format(__name__, name))
+
+
+class LazyCollection(dict):
     """
-    Decorator for registering a CommandClass message to the system
+    Registry loading the command class module on first lookup of a key not yet
+    registered. The modules are looked up in the generated index.
+
+    Iterating the registry, or asking for its length, loads all the modules in the
+    index first so only loaded entries are ever returned.
     """
 
-    def __init__(self):
+    def __init__(self, moduleIndex):
         super().__init__()
         self.reverseMapping = {}
+        self._complete = False
+        self._moduleIndex = moduleIndex
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def items(self):
+        self._loadAll()
+        return super().items()
+
+    def keys(self):
+        self._loadAll()
+        return super().keys()
+
+    def values(self):
+        self._loadAll()
+        return super().values()
+
+    def __contains__(self, key):
+        if super().__contains__(key):
+            return True
+        module = self._moduleIndex.get(key)
+        if module is None:
+            return False
+        _loadModule(module)
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self._loadAll()
+        return super().__iter__()
+
+    def __len__(self):
+        self._loadAll()
+        return super().__len__()
+
+    def __missing__(self, key):
+        module = self._moduleIndex.get(key)
+        if module is None:
+            raise KeyError(key)
+        _loadModule(module)
+        return super().__getitem__(key)
+
+    def _loadAll(self):
+        if self._complete:
+            return
+        for module in sorted(set(self._moduleIndex.values())):
+            _loadModule(module)
+        self._complete = True
+
+
+class CommandClassMessageCollection(LazyCollection):
+    """
+    Decorator for registering a CommandClass message to the system
+    """
+
+    def __init__(self):
+        super().__init__(index.MESSAGES)
 
     def __call__(self, cmdClass, cmd):
         def decorator(message):
             hid = (cmdClass << 8) | (cmd & 0xFF)
             self[hid] = message
             self.reverseMapping[message] = (cmdClass, cmd)
+            # Compile the codec plan once so encoding and decoding does not need
+            # to look up hooks and types per field
+            CodecPlan.compile(message, cmdClass, cmd)
             return message
 
         return decorator
 
 
-class CommandClassCollection(dict):
+class CommandClassCollection(LazyCollection):
     """
     Decorator for registering a CommandClass to the system
     """
 
     def __init__(self):
-        super().__init__()
-        self.reverseMapping = {}
+        super().__init__(index.COMMAND_CLASSES)
 
     def __call__(self, cmdClass):
         def decorator(cls):
@@ -46,7 +121,8 @@ class CommandClassCollection(dict):
 
 ZWaveMessage = CommandClassMessageCollection()  # pylint: disable=invalid-name
 ZWaveCommandClass = CommandClassCollection()  # pylint: disable=invalid-name
-cmdClasses = {}  # pylint: disable=invalid-name
+# Prefilled from the index so names are available before the module is loaded
+cmdClasses = dict(index.NAMES)  # pylint: disable=invalid-name
 
 
 class ZWaveMessageHandler:
@@ -74,29 +150,98 @@ def registerCmdClass(cmdClass, name):
     cmdClasses[cmdClass] = name
 
 
-# pylint: disable=wrong-import-position,import-self
-from . import (
-    ApplicationStatus,
-    Association,
-    AssociationGrpInfo,
-    Basic,
-    Battery,
-    Configuration,
-    Indicator,
-    Mailbox,
-    ManufacturerSpecific,
-    Meter,
-    MultiChannelAssociation,
-    NetworkManagementInclusion,
-    NetworkManagementProxy,
-    NodeProvisioning,
-    SensorMultilevel,
-    Supervision,
-    SwitchBinary,
-    Version,
-    Zip,
-    ZipGateway,
-    ZipND,
-    ZwavePlusInfo,
-)
+def buildIndex() -> str:
+    """
+    Import all command class modules and return the source for the index module
+    mapping messages and command classes to the module implementing them
+    """
+    modules = loadAll()
+    prefix = __name__ + "."
+
+    def moduleName(obj):
+        return obj.__module__[len(prefix) :]
+
+    messages = {
+        hid: moduleName(msg)
+        for hid, msg in ZWaveMessage.items()
+        if msg.__module__.startswith(prefix)
+    }
+    commandClasses = {
+        cmdClass: moduleName(cls)
+        for cmdClass, cls in ZWaveCommandClass.items()
+        if cls.__module__.startswith(prefix)
+    }
+    names = {
+        cmdClass: cmdClasses[cmdClass]
+        for cmdClass in {hid >> 8 for hid in messages} | set(commandClasses)
+        if cmdClass in cmdClasses
+    }
+    lines = [
+        '"""',
+        "Index of the command class modules. Generated by",
+        "pyzwave.commandclass.writeIndex(), do not edit.",
+        '"""',
+        "",
+        "MODULES = (",
+        *['    "{}",'.format(module) for module in modules],
+        ")",
+        "",
+        "# Message hid -> module",
+        "MESSAGES = {",
+        *[
+            '    0x{:04X}: "{}",'.format(hid, module)
+            for hid, module in sorted(messages.items())
+        ],
+        "}",
+        "",
+        "# Command class id -> module",
+        "COMMAND_CLASSES = {",
+        *[
+            '    0x{:02X}: "{}",'.format(cmdClass, module)
+            for cmdClass, module in sorted(commandClasses.items())
+        ],
+        "}",
+        "",
+        "# Command class id -> name",
+        "NAMES = {",
+        *[
+            '    0x{:02X}: "{}",'.format(cmdClass, name)
+            for cmdClass, name in sorted(names.items())
+        ],
+        "}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def loadAll() -> list:
+    """
+    Import all command class modules. Normally the modules are loaded on demand when
+    a message or command class is first looked up. Returns the module names
+    """
+    modules = sorted(
+        module.name
+        for module in pkgutil.iter_modules(__path__)
+        if module.name[0].isupper() and module.name != "CommandClass"
+    )
+    for module in modules:
+        _loadModule(module)
+    return modules
+
+
+def writeIndex():
+    """Regenerate the index module. Run this after adding a command class module"""
+    source = buildIndex()
+    with open(index.__file__, "w") as fd:
+        fd.write(source)
+
+
+def __getattr__(name):
+    # Load command class modules on first access, pyzwave.commandclass.Basic etc
+    if name in index.MODULES:
+        return _loadModule(name)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+# pylint: disable=wrong-import-position
 from .CommandClass import CommandClass, VarDictAttribute
@@ -0,0 +1,180 @@
+"""
+Index of the command class modules. Generated by
+pyzwave.commandclass.writeIndex(), do not edit.
+"""
+
+MODULES = (
+    "ApplicationStatus",
+    "Association",
+    "AssociationGrpInfo",
+    "Basic",
+    "Battery",
+    "Configuration",
+    "Indicator",
+    "Mailbox",
+    "ManufacturerSpecific",
+    "Meter",
+    "MultiChannelAssociation",
+    "MultiCmd",
+    "NetworkManagementInclusion",
+    "NetworkManagementProxy",
+    "NodeProvisioning",
+    "SensorMultilevel",
+    "Supervision",
+    "SwitchBinary",
+    "Version",
+    "Zip",
+    "ZipGateway",
+    "ZipND",
+    "ZwavePlusInfo",
+)
+
+# Message hid -> module
+MESSAGES = {
+    0x2001: "Basic",
+    0x2002: "Basic",
+    0x2003: "Basic",
+    0x2201: "ApplicationStatus",
+    0x2302: "Zip",
+    0x2303: "Zip",
+    0x2501: "SwitchBinary",
+    0x2502: "SwitchBinary",
+    0x2503: "SwitchBinary",
+    0x3101: "SensorMultilevel",
+    0x3102: "SensorMultilevel",
+    0x3103: "SensorMultilevel",
+    0x3104: "SensorMultilevel",
+    0x3105: "SensorMultilevel",
+    0x3106: "SensorMultilevel",
+    0x3201: "Meter",
+    0x3202: "Meter",
+    0x3203: "Meter",
+    0x3204: "Meter",
+    0x3205: "Meter",
+    0x3401: "NetworkManagementInclusion",
+    0x3402: "NetworkManagementInclusion",
+    0x3403: "NetworkManagementInclusion",
+    0x3404: "NetworkManagementInclusion",
+    0x3407: "NetworkManagementInclusion",
+    0x3408: "NetworkManagementInclusion",
+    0x3409: "NetworkManagementInclusion",
+    0x340A: "NetworkManagementInclusion",
+    0x340B: "NetworkManagementInclusion",
+    0x340C: "NetworkManagementInclusion",
+    0x340D: "NetworkManagementInclusion",
+    0x340E: "NetworkManagementInclusion",
+    0x340F: "NetworkManagementInclusion",
+    0x3410: "NetworkManagementInclusion",
+    0x3411: "NetworkManagementInclusion",
+    0x3412: "NetworkManagementInclusion",
+    0x3413: "NetworkManagementInclusion",
+    0x3414: "NetworkManagementInclusion",
+    0x3415: "NetworkManagementInclusion",
+    0x3419: "NetworkManagementInclusion",
+    0x5201: "NetworkManagementProxy",
+    0x5202: "NetworkManagementProxy",
+    0x5203: "NetworkManagementProxy",
+    0x5204: "NetworkManagementProxy",
+    0x5205: "NetworkManagementProxy",
+    0x5206: "NetworkManagementProxy",
+    0x5207: "NetworkManagementProxy",
+    0x5208: "NetworkManagementProxy",
+    0x520B: "NetworkManagementProxy",
+    0x520C: "NetworkManagementProxy",
+    0x5801: "ZipND",
+    0x5804: "ZipND",
+    0x5901: "AssociationGrpInfo",
+    0x5902: "AssociationGrpInfo",
+    0x5903: "AssociationGrpInfo",
+    0x5904: "AssociationGrpInfo",
+    0x5905: "AssociationGrpInfo",
+    0x5906: "AssociationGrpInfo",
+    0x5E01: "ZwavePlusInfo",
+    0x5E02: "ZwavePlusInfo",
+    0x5F01: "ZipGateway",
+    0x5F02: "ZipGateway",
+    0x5F03: "ZipGateway",
+    0x5F04: "ZipGateway",
+    0x5F08: "ZipGateway",
+    0x5F0B: "ZipGateway",
+    0x6901: "Mailbox",
+    0x6902: "Mailbox",
+    0x6903: "Mailbox",
+    0x6904: "Mailbox",
+    0x6905: "Mailbox",
+    0x6906: "Mailbox",
+    0x6907: "Mailbox",
+    0x6C01: "Supervision",
+    0x6C02: "Supervision",
+    0x7004: "Configuration",
+    0x7005: "Configuration",
+    0x7006: "Configuration",
+    0x7008: "Configuration",
+    0x7009: "Configuration",
+    0x7204: "ManufacturerSpecific",
+    0x7205: "ManufacturerSpecific",
+    0x7801: "NodeProvisioning",
+    0x7803: "NodeProvisioning",
+    0x7804: "NodeProvisioning",
+    0x8002: "Battery",
+    0x8003: "Battery",
+    0x8501: "Association",
+    0x8502: "Association",
+    0x8503: "Association",
+    0x8505: "Association",
+    0x8506: "Association",
+    0x8611: "Version",
+    0x8612: "Version",
+    0x8613: "Version",
+    0x8614: "Version",
+    0x8701: "Indicator",
+    0x8702: "Indicator",
+    0x8703: "Indicator",
+    0x8E01: "MultiChannelAssociation",
+    0x8E02: "MultiChannelAssociation",
+    0x8E03: "MultiChannelAssociation",
+    0x8F01: "MultiCmd",
+}
+
+# Command class id -> module
+COMMAND_CLASSES = {
+    0x20: "Basic",
+    0x31: "SensorMultilevel",
+    0x32: "Meter",
+    0x59: "AssociationGrpInfo",
+    0x5E: "ZwavePlusInfo",
+    0x69: "Mailbox",
+    0x70: "Configuration",
+    0x72: "ManufacturerSpecific",
+    0x80: "Battery",
+    0x85: "Association",
+    0x86: "Version",
+    0x87: "Indicator",
+    0x8F: "MultiCmd",
+}
+
+# Command class id -> name
+NAMES = {
+    0x20: "BASIC",
+    0x22: "APPLICATION_STATUS",
+    0x23: "ZIP",
+    0x25: "SWITCH_BINARY",
+    0x31: "SENSOR_MULTILEVEL",
+    0x32: "METER",
+    0x34: "NETWORK_MANAGEMENT_INCLUSION",
+    0x52: "NETWORK_MANAGEMENT_PROXY",
+    0x58: "ZIP_ND",
+    0x59: "ASSOCIATION_GRP_INFO",
+    0x5E: "ZWAVEPLUS_INFO",
+    0x5F: "ZIP_GATEWAY",
+    0x69: "MAILBOX",
+    0x6C: "SUPERVISION",
+    0x70: "CONFIGURATION",
+    0x72: "MANUFACTURER_SPECIFIC",
+    0x78: "NODE_PROVISIONING",
+    0x80: "BATTERY",
+    0x85: "ASSOCIATION",
+    0x86: "VERSION",
+    0x87: "INDICATOR",
+    0x8F: "MULTI_CMD",
+}
@@ -5,6 +5,10 @@ import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+# Port used by Z/IP for plain and DTLS connections
+ZIP_PORT = 4123
+ZIP_DTLS_PORT = 41230
+
 
 class ZipClientProtocol:
     """Internal ZIP Client protocol implementation"""
@@ -33,15 +37,20 @@ class ZipClientProtocol:
 
 
 class Connection:
-    """Connection object to create a non encrypted connection using PSK"""
+    """
+    Connection object to create a non encrypted connection using PSK.
+    If secure is set the connection is encrypted using DTLS, running in the event
+    loop.
+    """
 
-    def __init__(self):
+    def __init__(self, secure: bool = False):
         super().__init__()
         self._address = None
         self._psk = None
         self._running = False
         self._sock = None
         self._onMessage = None
+        self._secure = secure
         self._server = False
 
     async def connect(self, address, psk):
@@ -51,10 +60,19 @@ class Connection:
 
         loop = asyncio.get_event_loop()
         onConLost = loop.create_future()
-        self._sock, _protocol = await loop.create_datagram_endpoint(
-            lambda: ZipClientProtocol(onConLost, self._msgReceived),
-            remote_addr=(self._address, 4123),
+        sock, protocol = await loop.create_datagram_endpoint(
+            lambda: self._createProtocol(onConLost),
+            remote_addr=(self._address, ZIP_DTLS_PORT if self._secure else ZIP_PORT),
         )
+        if self._secure:
+            try:
+                await asyncio.wait_for(protocol.handshakeDone, timeout=10)
+            except BaseException:
+                protocol.close()
+                raise
+            # The protocol encrypts the data before passing it to the transport
+            sock = protocol
+        self._sock = sock
         asyncio.ensure_future(self.run(onConLost))
 
     async def listen(self, psk, port):
@@ -63,10 +81,10 @@ class Connection:
         self._psk = psk
         loop = asyncio.get_event_loop()
         onConLost = loop.create_future()
-        self._sock, _protocol = await loop.create_datagram_endpoint(
-            lambda: ZipClientProtocol(onConLost, self._msgReceived),
-            local_addr=("::", port),
+        sock, protocol = await loop.create_datagram_endpoint(
+            lambda: self._createProtocol(onConLost), local_addr=("::", port)
         )
+        self._sock = protocol if self._secure else sock
 
     async def run(self, onConLost):  # pylint: disable=missing-function-docstring
         try:
@@ -95,6 +113,17 @@ class Connection:
         self._running = False
         self._sock.close()
 
+    def _createProtocol(self, onConLost) -> ZipClientProtocol:
+        if self._secure:
+            # Imported here since the DTLS protocol builds on ZipClientProtocol
+            # pylint: disable=import-outside-toplevel
+            from pyzwave.dtlsprotocol import DTLSProtocol
+
+            return DTLSProtocol(
+                onConLost, self._msgReceived, self._psk, server=self._server
+            )
+        return ZipClientProtocol(onConLost, self._msgReceived)
+
     def _msgReceived(self, msg, sender):
         if not self._onMessage:
             return
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from collections import OrderedDict
+import logging
+import time
+
+from pyzwave.timerwheel import timerWheel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default maximum number of open connections
+MAX_SIZE = 32
+# Default number of seconds a connection may be unused before it is closed
+IDLE_TIMEOUT = 3600
+
+
+class ConnectionPool:
+    """
+    Pool of open connections keyed by node id.
+
+    The pool holds at most maxSize connections. When a new connection is added to a
+    full pool the least recently used connection is closed. Connections not used for
+    idleTimeout seconds are closed as well. Connections with messages in flight are
+    never closed by the pool.
+
+    A connection must implement ``close()`` and the property ``busy``.
+    """
+
+    def __init__(self, maxSize: int = MAX_SIZE, idleTimeout: float = IDLE_TIMEOUT):
+        self._connections = OrderedDict()
+        self._idleTimeout = idleTimeout
+        self._lastUsed = {}
+        self._maxSize = maxSize
+        self._sweep = None
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self._connections
+
+    def __getitem__(self, key):
+        return self._connections[key]
+
+    def __iter__(self):
+        return iter(self._connections)
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def __setitem__(self, key, connection):
+        previous = self._connections.get(key)
+        if previous is not None and previous is not connection:
+            previous.close()
+        self._connections[key] = connection
+        self.touch(key)
+        excess = len(self._connections) - self._maxSize
+        for lruKey in list(self._connections):
+            if excess <= 0:
+                break
+            if lruKey == key or self._connections[lruKey].busy:
+                continue
+            self._evict(lruKey)
+            excess -= 1
+        self._scheduleSweep()
+
+    def clear(self):
+        """Close all connections"""
+        if self._sweep:
+            self._sweep.cancel()
+            self._sweep = None
+        for key in list(self._connections):
+            self.pop(key).close()
+
+    def evictIdle(self) -> int:
+        """Close all connections not used within the idle timeout"""
+        deadline = time.monotonic() - self._idleTimeout
+        evicted = 0
+        # The connections are kept in least recently used order
+        for key in list(self._connections):
+            if self._lastUsed[key] > deadline:
+                break
+            if self._connections[key].busy:
+                continue
+            self._evict(key)
+            evicted += 1
+        return evicted
+
+    def get(self, key, default=None):
+        """Return the connection for key and mark it as used"""
+        connection = self._connections.get(key)
+        if connection is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.touch(key)
+        return connection
+
+    @property
+    def idleTimeout(self) -> float:
+        """Number of seconds a connection may be unused before it is closed"""
+        return self._idleTimeout
+
+    def items(self):
+        """Return the node ids and connections in the pool"""
+        return self._connections.items()
+
+    @property
+    def maxSize(self) -> int:
+        """The maximum number of connections kept open"""
+        return self._maxSize
+
+    @property
+    def metrics(self) -> dict:
+        """Returns counters for the pool usage"""
+        return {
+            "size": len(self._connections),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def pop(self, key, *args):
+        """Remove a connection from the pool without closing it"""
+        self._lastUsed.pop(key, None)
+        return self._connections.pop(key, *args)
+
+    def touch(self, key):
+        """Mark the connection for key as used"""
+        if key not in self._connections:
+            return
+        self._connections.move_to_end(key)
+        self._lastUsed[key] = time.monotonic()
+
+    def _evict(self, key):
+        _LOGGER.debug("Closing connection to node %s", key)
+        self.evictions += 1
+        self.pop(key).close()
+
+    def _runSweep(self):
+        self._sweep = None
+        self.evictIdle()
+        self._scheduleSweep()
+
+    def _scheduleSweep(self):
+        if self._sweep or not self._connections:
+            return
+        try:
+            wheel = timerWheel(asyncio.get_event_loop())
+        except RuntimeError:
+            # No event loop, idle connections are closed when the next connection
+            # is added instead
+            self.evictIdle()
+            return
+        self._sweep = wheel.callLater(max(self._idleTimeout / 4, 1), self._runSweep)
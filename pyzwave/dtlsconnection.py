@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+from collections import deque
 import logging
+import selectors
 import ssl
 import socket
 import threading
@@ -33,10 +35,52 @@ SERVERPSKFUNC = CFUNCTYPE(c_uint, c_void_p, c_char_p, POINTER(c_char), c_uint)
 CLIENTCBFUNC = CFUNCTYPE(None, c_void_p, c_int, c_int)
 
 
+class PacketHandoff:
+    """
+    Hands received packets over from a reader thread to the event loop.
+    Packets arriving before the loop got to run are delivered together, so a burst
+    of packets costs one loop wakeup instead of one per packet.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._packets = deque()
+        self._scheduled = False
+
+    def put(self, callback, *args):
+        """Call callback(*args) from the event loop. Thread safe."""
+        with self._lock:
+            self._packets.append((callback, args))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._deliver)
+
+    def _deliver(self):
+        with self._lock:
+            packets, self._packets = self._packets, deque()
+            self._scheduled = False
+        for callback, args in packets:
+            try:
+                callback(*args)
+            except Exception as error:  # pylint: disable=broad-except
+                # Do not let one failing packet drop the rest of the batch
+                self._loop.call_exception_handler(
+                    {"message": "Error delivering packet", "exception": error}
+                )
+
+
 class DTLSConnection(threading.Thread):
-    """Connection object to create a DTLS connection using PSK"""
+    """
+    Connection object to create a DTLS connection using PSK.
 
-    def __init__(self):
+    By default each connection reads its socket from its own thread. If a
+    :class:`DTLSMultiplexer` is given the socket is serviced by the multiplexer
+    instead and no thread is started for this connection.
+    """
+
+    def __init__(self, multiplexer: "DTLSMultiplexer" = None):
         super().__init__(name="Z-Wave DTLS connection")
         self._address = None
         self._psk = None
@@ -44,6 +88,10 @@ class DTLSConnection(threading.Thread):
         self._sock = None
         self._connectionEvent = asyncio.Event()
         self._loop = asyncio.get_event_loop()
+        self._multiplexer = multiplexer
+        self._handoff = (
+            multiplexer.handoff if multiplexer else PacketHandoff(self._loop)
+        )
         self._onMessage = None
         self._server = False
         self.setDaemon(True)
@@ -56,6 +104,14 @@ class DTLSConnection(threading.Thread):
         """Connect to remote using psk"""
         self._address = address
         self._psk = psk
+        if self._multiplexer:
+            # The handshake is blocking, do not stall the multiplexer with it
+            self._sock = await asyncio.wait_for(
+                self._loop.run_in_executor(None, self.createDtlsPskSock), timeout=10
+            )
+            self._running = True
+            self._multiplexer.register(self)
+            return
         self._connectionEvent.clear()
         self.start()
         await asyncio.wait_for(self._connectionEvent.wait(), timeout=10)
@@ -64,22 +120,31 @@ class DTLSConnection(threading.Thread):
         """Start server socket"""
         self._server = True
         self._psk = psk
+        if self._multiplexer:
+            self._sock = self.createDtlsPskSock()
+            self._running = True
+            self._multiplexer.register(self)
+            return
         self.start()
 
+    def readPacket(self):
+        """Read one packet from the socket and hand it over to the event loop"""
+        if self._server:
+            pkt, address = self._sock.recvfrom(1500)
+            if self._onMessage:
+                self._handoff.put(self._onMessage, pkt, address)
+        else:
+            pkt = self._sock.recv(1500)
+            if self._onMessage:
+                self._handoff.put(self._onMessage, pkt)
+
     def run(self):  # pylint: disable=missing-function-docstring
         self._sock = self.createDtlsPskSock()
         self._loop.call_soon_threadsafe(self._connectionEvent.set)
         self._running = True
         while self._running:
             try:
-                if self._server:
-                    pkt, address = self._sock.recvfrom(1500)
-                    if self._onMessage:
-                        self._loop.call_soon_threadsafe(self._onMessage, pkt, address)
-                else:
-                    pkt = self._sock.recv(1500)
-                    if self._onMessage:
-                        self._loop.call_soon_threadsafe(self._onMessage, pkt)
+                self.readPacket()
             except AttributeError:
                 _LOGGER.error("Got attribute error!")
             except ssl.SSLError as error:
@@ -100,9 +165,16 @@ class DTLSConnection(threading.Thread):
         """Set the callback function to use when data has arrived"""
         self._onMessage = cbfn
 
+    @property
+    def sock(self):
+        """The underlying socket"""
+        return self._sock
+
     def stop(self):
         """Stop the thread"""
         self._running = False
+        if self._multiplexer:
+            self._multiplexer.unregister(self)
 
     def clientPskCb(self, _ssl, _hint, identity, _maxIdenityLen, cpsk, _maxPskLen):
         """Callback function used by ssl to get the DTLS psk"""
@@ -208,3 +280,119 @@ class DTLSConnection(threading.Thread):
         if not self._server:
             sock.do_handshake()
         return sock
+
+
+class DTLSMultiplexer(threading.Thread):
+    """
+    Services the sockets of any number of DTLS connections from a single thread.
+    Share one multiplexer between all connections to keep the number of threads
+    constant regardless of the number of nodes:
+
+    .. code-block:: python
+
+        multiplexer = DTLSMultiplexer()
+        connection = DTLSConnection(multiplexer=multiplexer)
+    """
+
+    def __init__(self):
+        super().__init__(name="Z-Wave DTLS multiplexer")
+        self._changes = []
+        self._handoff = PacketHandoff(asyncio.get_event_loop())
+        self._lock = threading.Lock()
+        self._running = False
+        self._selector = selectors.DefaultSelector()
+        self._wakeupReader, self._wakeupWriter = socket.socketpair()
+        self._wakeupReader.setblocking(False)
+        self._wakeupWriter.setblocking(False)
+        self._selector.register(self._wakeupReader, selectors.EVENT_READ)
+        self.setDaemon(True)
+
+    @property
+    def handoff(self) -> PacketHandoff:
+        """Packets from all connections are handed over to the loop using this"""
+        return self._handoff
+
+    def register(self, connection: DTLSConnection):
+        """Start servicing the socket of a connection"""
+        connection.sock.setblocking(False)
+        self._change(True, connection)
+        with self._lock:
+            if not self._running:
+                self._running = True
+                self.start()
+
+    def run(self):  # pylint: disable=missing-function-docstring
+        while self._running:
+            for key, _events in self._selector.select():
+                if key.fileobj is self._wakeupReader:
+                    self._applyChanges()
+                else:
+                    self._service(key.data)
+        self._selector.close()
+
+    def stop(self):
+        """Stop the thread. The sockets of the connections are left open."""
+        self._running = False
+        self._wakeup()
+
+    def unregister(self, connection: DTLSConnection):
+        """Stop servicing the socket of a connection"""
+        self._change(False, connection)
+
+    def _applyChanges(self):
+        try:
+            while self._wakeupReader.recv(64):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            changes, self._changes = self._changes, []
+        for register, connection in changes:
+            try:
+                if register:
+                    self._selector.register(
+                        connection.sock, selectors.EVENT_READ, connection
+                    )
+                else:
+                    self._selector.unregister(connection.sock)
+            except (KeyError, ValueError):
+                # Already registered or unregistered
+                pass
+
+    def _change(self, register: bool, connection: DTLSConnection):
+        # The selector is only touched from the multiplexer thread
+        with self._lock:
+            self._changes.append((register, connection))
+        self._wakeup()
+
+    def _service(self, connection: DTLSConnection):
+        """Read all packets available for a connection"""
+        while True:
+            try:
+                connection.readPacket()
+            except BlockingIOError:
+                return
+            except ssl.SSLError as error:
+                if error.errno == ssl.SSL_ERROR_WANT_READ:
+                    return
+                _LOGGER.info("SSL error: %s", error)
+                self._selector.unregister(connection.sock)
+                return
+            except AttributeError:
+                _LOGGER.error("Got attribute error!")
+                return
+            except Exception as error:  # pylint: disable=broad-except
+                _LOGGER.error("Could not read from zipgateway %s", error)
+                self._selector.unregister(connection.sock)
+                return
+            # Decrypted data may be buffered without the socket being readable
+            pending = getattr(connection.sock, "pending", None)
+            if pending is None or not pending():
+                return
+
+    def _wakeup(self):
+        try:
+            self._wakeupWriter.send(b"\0")
+        except BlockingIOError:
+            # Wakeup already pending
+            pass
@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+DTLS with PSK implemented on top of OpenSSL memory BIOs.
+
+OpenSSL never touches a socket here. Received datagrams are fed into a
+:class:`DTLSSession` and the records it produces are sent by the caller. This
+allows DTLS to run as a regular asyncio datagram protocol in the event loop
+thread, the same way :class:`ssl.SSLObject` works for TLS.
+"""
+
+import asyncio
+from collections import OrderedDict
+from ctypes import (
+    CDLL,
+    CFUNCTYPE,
+    POINTER,
+    c_char,
+    c_char_p,
+    c_int,
+    c_long,
+    c_size_t,
+    c_uint,
+    c_ulong,
+    c_void_p,
+    create_string_buffer,
+    memmove,
+)
+from ctypes.util import find_library
+from functools import lru_cache
+import logging
+import ssl
+
+from pyzwave.connection import ZipClientProtocol
+from pyzwave.timerwheel import timerWheel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default identity sent by the client, this is what zipgateway expects
+IDENTITY = b"Client_identity"
+# Maximum size of a datagram produced by OpenSSL
+MTU = 1280
+# Interval for retransmitting lost handshake packets
+HANDSHAKE_RETRANSMIT = 1.0
+# Default maximum number of peers a server keeps a session with
+MAX_SESSIONS = 64
+# Default number of seconds a server keeps a session without traffic
+SESSION_IDLE_TIMEOUT = 300
+
+SSL_CTRL_OPTIONS = 32
+SSL_CTRL_SET_MTU = 17
+DTLS_CTRL_HANDLE_TIMEOUT = 74
+SSL_OP_NO_QUERY_MTU = 0x00001000
+
+SSL_ERROR_NONE = 0
+SSL_ERROR_WANT_READ = 2
+SSL_ERROR_WANT_WRITE = 3
+SSL_ERROR_ZERO_RETURN = 6
+
+CLIENTPSKFUNC = CFUNCTYPE(
+    c_uint, c_void_p, c_char_p, POINTER(c_char), c_uint, POINTER(c_char), c_uint
+)
+SERVERPSKFUNC = CFUNCTYPE(c_uint, c_void_p, c_char_p, POINTER(c_char), c_uint)
+
+_PROTOTYPES = {
+    # name: (restype, argtypes)
+    "BIO_ctrl_pending": (c_size_t, (c_void_p,)),
+    "BIO_new": (c_void_p, (c_void_p,)),
+    "BIO_read": (c_int, (c_void_p, c_void_p, c_int)),
+    "BIO_s_mem": (c_void_p, ()),
+    "BIO_write": (c_int, (c_void_p, c_char_p, c_int)),
+    "DTLS_client_method": (c_void_p, ()),
+    "DTLS_server_method": (c_void_p, ()),
+    "ERR_clear_error": (None, ()),
+    "ERR_error_string_n": (None, (c_ulong, c_char_p, c_size_t)),
+    "ERR_get_error": (c_ulong, ()),
+    "SSL_CTX_free": (None, (c_void_p,)),
+    "SSL_CTX_new": (c_void_p, (c_void_p,)),
+    "SSL_CTX_set_cipher_list": (c_int, (c_void_p, c_char_p)),
+    "SSL_ctrl": (c_long, (c_void_p, c_int, c_long, c_void_p)),
+    "SSL_do_handshake": (c_int, (c_void_p,)),
+    "SSL_free": (None, (c_void_p,)),
+    "SSL_get_error": (c_int, (c_void_p, c_int)),
+    "SSL_is_init_finished": (c_int, (c_void_p,)),
+    "SSL_new": (c_void_p, (c_void_p,)),
+    "SSL_read": (c_int, (c_void_p, c_void_p, c_int)),
+    "SSL_set_accept_state": (None, (c_void_p,)),
+    "SSL_set_bio": (None, (c_void_p, c_void_p, c_void_p)),
+    "SSL_set_connect_state": (None, (c_void_p,)),
+    "SSL_set_options": (c_ulong, (c_void_p, c_ulong)),
+    "SSL_set_psk_client_callback": (None, (c_void_p, CLIENTPSKFUNC)),
+    "SSL_set_psk_server_callback": (None, (c_void_p, SERVERPSKFUNC)),
+    "SSL_shutdown": (c_int, (c_void_p,)),
+    "SSL_write": (c_int, (c_void_p, c_char_p, c_int)),
+}
+
+
+class _OpenSSL:  # pylint: disable=too-few-public-methods
+    """Typed bindings for the parts of libssl and libcrypto we need"""
+
+    def __init__(self):
+        libssl = CDLL(find_library("ssl"))
+        libcrypto = CDLL(find_library("crypto"))
+        for name, (restype, argtypes) in _PROTOTYPES.items():
+            lib = libcrypto if name.startswith(("BIO_", "ERR_")) else libssl
+            func = getattr(lib, name, None)
+            if func is None:
+                # Macro in older versions of OpenSSL, see setOptions()
+                continue
+            func.restype = restype
+            func.argtypes = argtypes
+            setattr(self, name, func)
+
+    def setOptions(self, sslObj, options: int):
+        """SSL_set_options() is a macro before OpenSSL 3"""
+        if hasattr(self, "SSL_set_options"):
+            self.SSL_set_options(sslObj, options)  # pylint: disable=no-member
+        else:
+            self.SSL_ctrl(  # pylint: disable=no-member
+                sslObj, SSL_CTRL_OPTIONS, options, None
+            )
+
+
+@lru_cache(maxsize=None)
+def openssl() -> _OpenSSL:
+    """Load OpenSSL. This is done on first use so importing never fails."""
+    return _OpenSSL()
+
+
+def _sslError(lib: _OpenSSL, message: str) -> ssl.SSLError:
+    code = lib.ERR_get_error()
+    if code:
+        buf = create_string_buffer(256)
+        lib.ERR_error_string_n(code, buf, len(buf))
+        message = "{}: {}".format(message, buf.value.decode(errors="replace"))
+    lib.ERR_clear_error()
+    return ssl.SSLError(message)
+
+
+class DTLSSession:
+    """
+    One DTLS-PSK session using memory BIOs. Incoming datagrams are passed to
+    :meth:`feed` and the records to transmit are fetched with :meth:`outgoing`.
+    """
+
+    def __init__(self, psk: bytes, server: bool = False, identity: bytes = IDENTITY):
+        self._identity = identity
+        self._psk = psk
+        self._server = server
+        lib = openssl()
+        self._lib = lib
+        method = lib.DTLS_server_method() if server else lib.DTLS_client_method()
+        self._ctx = lib.SSL_CTX_new(method)
+        if not self._ctx:
+            raise _sslError(lib, "Could not create SSL context")
+        if lib.SSL_CTX_set_cipher_list(self._ctx, b"PSK:@SECLEVEL=0") != 1:
+            raise _sslError(lib, "No PSK ciphers available")
+        self._ssl = lib.SSL_new(self._ctx)
+        self._incoming = lib.BIO_new(lib.BIO_s_mem())
+        self._outgoing = lib.BIO_new(lib.BIO_s_mem())
+        lib.SSL_set_bio(self._ssl, self._incoming, self._outgoing)
+        # A memory BIO cannot be asked for the MTU
+        lib.setOptions(self._ssl, SSL_OP_NO_QUERY_MTU)
+        lib.SSL_ctrl(self._ssl, SSL_CTRL_SET_MTU, MTU, None)
+        # Keep references to the callbacks, they must outlive the session
+        if server:
+            self._pskCb = SERVERPSKFUNC(self.serverPskCb)
+            lib.SSL_set_psk_server_callback(self._ssl, self._pskCb)
+            lib.SSL_set_accept_state(self._ssl)
+        else:
+            self._pskCb = CLIENTPSKFUNC(self.clientPskCb)
+            lib.SSL_set_psk_client_callback(self._ssl, self._pskCb)
+            lib.SSL_set_connect_state(self._ssl)
+        self._buffer = create_string_buffer(MTU * 2)
+
+    def __del__(self):
+        self.free()
+
+    def clientPskCb(self, _ssl, _hint, identity, maxIdentityLen, psk, maxPskLen):
+        """Callback function used by OpenSSL to get the identity and psk"""
+        if len(self._identity) >= maxIdentityLen or len(self._psk) > maxPskLen:
+            return 0
+        memmove(identity, self._identity + b"\0", len(self._identity) + 1)
+        memmove(psk, self._psk, len(self._psk))
+        return len(self._psk)
+
+    def close(self):
+        """Send a close notify to the peer. Fetch it with :meth:`outgoing`"""
+        if self._ssl and self.handshakeDone:
+            self._lib.SSL_shutdown(self._ssl)
+
+    def doHandshake(self) -> bool:
+        """Continue the handshake. Returns True when the handshake is done."""
+        ret = self._lib.SSL_do_handshake(self._ssl)
+        if ret == 1:
+            return True
+        self._check(ret, "Handshake failed")
+        return False
+
+    def feed(self, data: bytes) -> list:
+        """
+        Feed a datagram received from the peer. Returns a list with the decrypted
+        application data packets, if any
+        """
+        self._lib.BIO_write(self._incoming, data, len(data))
+        if not self.handshakeDone and not self.doHandshake():
+            return []
+        packets = []
+        while True:
+            ret = self._lib.SSL_read(self._ssl, self._buffer, len(self._buffer))
+            if ret <= 0:
+                self._check(ret, "Could not decrypt packet")
+                return packets
+            packets.append(self._buffer.raw[:ret])
+
+    def free(self):
+        """Release the OpenSSL resources. The session cannot be used after this."""
+        if getattr(self, "_ssl", None):
+            # The BIOs are owned by the SSL object
+            self._lib.SSL_free(self._ssl)
+            self._ssl = None
+        if getattr(self, "_ctx", None):
+            self._lib.SSL_CTX_free(self._ctx)
+            self._ctx = None
+
+    def handleTimeout(self):
+        """Retransmit the last handshake flight if its timer has expired"""
+        if not self.handshakeDone:
+            self._lib.SSL_ctrl(self._ssl, DTLS_CTRL_HANDLE_TIMEOUT, 0, None)
+
+    @property
+    def handshakeDone(self) -> bool:
+        """Returns True if the handshake has finished"""
+        return self._lib.SSL_is_init_finished(self._ssl) == 1
+
+    def outgoing(self) -> bytes:
+        """Return the records waiting to be sent to the peer"""
+        pending = self._lib.BIO_ctrl_pending(self._outgoing)
+        if not pending:
+            return b""
+        buf = create_string_buffer(pending)
+        read = self._lib.BIO_read(self._outgoing, buf, pending)
+        return buf.raw[: max(read, 0)]
+
+    @property
+    def server(self) -> bool:
+        """Returns True if this is the server side of the session"""
+        return self._server
+
+    def serverPskCb(self, _ssl, _identity, psk, maxPskLen):
+        """Callback function used by OpenSSL to get the psk"""
+        if len(self._psk) > maxPskLen:
+            return 0
+        memmove(psk, self._psk, len(self._psk))
+        return len(self._psk)
+
+    def write(self, data: bytes):
+        """Encrypt a packet. Fetch the record to send with :meth:`outgoing`"""
+        ret = self._lib.SSL_write(self._ssl, data, len(data))
+        if ret <= 0:
+            self._check(ret, "Could not encrypt packet")
+            raise ssl.SSLError("Could not encrypt packet, handshake not done")
+
+    def _check(self, ret: int, message: str):
+        error = self._lib.SSL_get_error(self._ssl, ret)
+        if error in (SSL_ERROR_WANT_READ, SSL_ERROR_WANT_WRITE):
+            self._lib.ERR_clear_error()
+            return
+        if error == SSL_ERROR_ZERO_RETURN:
+            self._lib.ERR_clear_error()
+            raise ConnectionResetError("Session closed by peer")
+        raise _sslError(self._lib, message)
+
+
+class DTLSProtocol(ZipClientProtocol):
+    """
+    Datagram protocol decrypting and encrypting DTLS inside the event loop.
+
+    The protocol also acts as the transport for :class:`~pyzwave.connection.Connection`
+    so sending and receiving works the same as for plain connections. As a client
+    one session is handshaked with the remote. As a server a session is created for
+    each peer. Sessions without traffic for idleTimeout seconds are closed. If more
+    than maxSessions peers are connected the least recently used session is closed.
+    """
+
+    def __init__(
+        self,
+        onConLost,
+        onMessage,
+        psk: bytes,
+        server: bool = False,
+        maxSessions: int = MAX_SESSIONS,
+        idleTimeout: float = SESSION_IDLE_TIMEOUT,
+    ):
+        super().__init__(onConLost, onMessage)
+        loop = asyncio.get_event_loop()
+        self.handshakeDone = loop.create_future()
+        self._idleTimeout = idleTimeout
+        self._idleTimers = {}
+        self._maxSessions = maxSessions
+        self._psk = psk
+        self._retransmit = None
+        self._server = server
+        # Least recently used first
+        self._sessions = OrderedDict()
+
+    def close(self):
+        """Send close notify to all peers and close the transport"""
+        if self._retransmit:
+            self._retransmit.cancel()
+            self._retransmit = None
+        for address in list(self._sessions):
+            self._closeSession(address)
+        if self.transport:
+            self.transport.close()
+
+    def connection_made(self, transport):  # pylint: disable=invalid-name
+        super().connection_made(transport)
+        if self._server:
+            return
+        session = DTLSSession(self._psk)
+        self._sessions[None] = session
+        self._handshake(session, None)
+
+    def datagram_received(self, data, addr):  # pylint: disable=invalid-name
+        key = addr if self._server else None
+        session = self._sessions.get(key)
+        if session is None:
+            if not self._server:
+                return
+            session = self._newSession(key)
+        elif self._server:
+            self._sessions.move_to_end(key)
+            self._idleTimers[key].reset(self._idleTimeout)
+        try:
+            packets = session.feed(data)
+        except (ssl.SSLError, ConnectionResetError) as error:
+            _LOGGER.info("DTLS error from %s: %s", addr, error)
+            self._sessions.pop(key, None)
+            self._cancelIdleTimer(key)
+            self._flush(session, key)
+            session.free()
+            if not self._server and not self.handshakeDone.done():
+                self.handshakeDone.set_exception(error)
+            return
+        self._flush(session, key)
+        if session.handshakeDone and not self._server:
+            if not self.handshakeDone.done():
+                self.handshakeDone.set_result(True)
+        for pkt in packets:
+            self.onMessage(pkt, addr)
+
+    def sendto(self, data, addr=None):
+        """Encrypt and send a packet. Same signature as the transport."""
+        key = addr if self._server else None
+        session = self._sessions.get(key)
+        if session is None or not session.handshakeDone:
+            _LOGGER.error("Could not send, no DTLS session with %s", addr)
+            return
+        session.write(data)
+        self._flush(session, key)
+
+    def _cancelIdleTimer(self, key):
+        timer = self._idleTimers.pop(key, None)
+        if timer:
+            timer.cancel()
+
+    def _closeSession(self, key):
+        """Send close notify to the peer and forget the session"""
+        session = self._sessions.pop(key)
+        self._cancelIdleTimer(key)
+        session.close()
+        self._flush(session, key)
+        session.free()
+
+    def _expire(self, key):
+        if key in self._sessions:
+            _LOGGER.debug("Closing idle DTLS session with %s", key)
+            self._closeSession(key)
+
+    def _flush(self, session: DTLSSession, key):
+        data = session.outgoing()
+        if data and self.transport:
+            if key is None:
+                self.transport.sendto(data)
+            else:
+                self.transport.sendto(data, key)
+
+    def _handshake(self, session: DTLSSession, key):
+        self._retransmit = None
+        if session.handshakeDone or self._sessions.get(key) is not session:
+            return
+        try:
+            if session.doHandshake() is False:
+                session.handleTimeout()
+        except ssl.SSLError as error:
+            if not self.handshakeDone.done():
+                self.handshakeDone.set_exception(error)
+            return
+        self._flush(session, key)
+        self._retransmit = asyncio.get_event_loop().call_later(
+            HANDSHAKE_RETRANSMIT, self._handshake, session, key
+        )
+
+    def _newSession(self, key) -> DTLSSession:
+        while len(self._sessions) >= self._maxSessions:
+            lruKey = next(iter(self._sessions))
+            _LOGGER.debug("Too many DTLS sessions, closing %s", lruKey)
+            self._closeSession(lruKey)
+        session = DTLSSession(self._psk, server=True)
+        self._sessions[key] = session
+        self._idleTimers[key] = timerWheel().callLater(
+            self._idleTimeout, self._expire, key
+        )
+        return session
@@ -8,6 +8,7 @@ import crcmod.predefined
 from pyzwave.adapter import Adapter
 from pyzwave.commandclass import Mailbox, Zip
 from pyzwave.message import Message
+from pyzwave.timerwheel import timerWheel
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,7 +55,7 @@ class QueueItem:
         i = 0
         while True:
             i += 1
-            await asyncio.sleep(60)
+            await timerWheel().sleep(60)
             operation = Mailbox.Queue.Operation.WAITING
             if i % 10 == 0:
                 operation = Mailbox.Queue.Operation.PING
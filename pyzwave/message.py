@@ -1,13 +1,71 @@
 import logging
+import os
 
+from pyzwave.codec import MISSING
 from pyzwave.types import BitStreamReader, BitStreamWriter
 from pyzwave.util import AttributesMixin
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _attributeValues(obj: AttributesMixin) -> list:
+    """Return the attribute values of obj, using the type default for unset ones"""
+    # pylint: disable=protected-access
+    obj.resolveAttributes()
+    values = []
+    for index, attrType, _ in obj._attributeTable.values():
+        value = obj._values[index]
+        if value is MISSING:
+            value = getattr(attrType, "default", None)
+        values.append(value)
+    return values
+
+
+def _valuesEqual(first, second) -> bool:
+    """Structural comparison of two attribute values"""
+    if first is second:
+        return True
+    if isinstance(first, AttributesMixin) and not isinstance(first, Message):
+        # Nested attributes, such as header extension options
+        if type(first) is not type(second):
+            return False
+        return all(map(_valuesEqual, _attributeValues(first), _attributeValues(second)))
+    if isinstance(first, dict):
+        if not isinstance(second, dict) or first.keys() != second.keys():
+            return False
+        return all(_valuesEqual(value, second[key]) for key, value in first.items())
+    if isinstance(first, (list, tuple)):
+        if not isinstance(second, (list, tuple)) or len(first) != len(second):
+            return False
+        return all(map(_valuesEqual, first, second))
+    return first == second
+
+
+def _hashable(value):
+    """Convert an attribute value into something hashable consistent with _valuesEqual"""
+    if isinstance(value, Message):
+        return value
+    if isinstance(value, AttributesMixin):
+        return (type(value), tuple(map(_hashable, _attributeValues(value))))
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(map(_hashable, value))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
 class Message(AttributesMixin):
-    """Base class for all Z-Wave messages. This class should not be initiated manually"""
+    """
+    Base class for all Z-Wave messages. This class should not be initiated manually.
+
+    Messages compare equal if they are of the same type and all attributes are equal.
+    The hash is calculated from the attributes, do not modify a message while it is
+    used as a dict key.
+    """
 
     NAME = None
 
@@ -17,29 +75,14 @@ class Message(AttributesMixin):
 
     def compose(self) -> bytes:
         """Convert the message to a bytearray ready to be sent over the wire"""
-        cmdClass, cmd = ZWaveMessage.reverseMapping.get(self.__class__, (None, None))
-        if cmdClass is None or cmd is None:
+        plan = self.__class__.__dict__.get("__codecPlan__")
+        if plan is None or plan.hid is None:
             # Pure Message object, encode to empty bytes
             return b""
+        self.resolveAttributes()
         stream = BitStreamWriter()
-        stream.addBytes(cmdClass, 1, False)
-        stream.addBytes(cmd, 1, False)
-        for name, attrType in self.attributes:
-            if name not in self._attributes:
-                default = getattr(attrType, "default", None)
-                if default is not None:
-                    attrType(default).serialize(stream)
-                    continue
-                raise AttributeError(
-                    "Value for attribute '{}' in {} has not been set".format(name, self)
-                )
-            serializer = getattr(self, "compose_{}".format(name), None)
-            if serializer:
-                serializer(stream)
-                continue
-            if not hasattr(self._attributes[name], "serialize"):
-                raise ValueError("Cannot encode", name, self._attributes[name])
-            self._attributes[name].serialize(stream)
+        stream.extend(plan.header)
+        plan.encode(self, stream)
         return bytes(stream)
 
     def serialize(self, stream: BitStreamWriter):
@@ -47,19 +90,29 @@ class Message(AttributesMixin):
         stream.extend(self.compose())
 
     def __eq__(self, other):
-        if not isinstance(other, Message):
+        if self is other:
+            return True
+        if type(self) is not type(other) or self.hid() != other.hid():
             return False
-        return self.compose() == other.compose()
+        return all(map(_valuesEqual, _attributeValues(self), _attributeValues(other)))
 
     def __getattr__(self, name):
         # Default implentation in AttributesMixin returns (and sets) a default value.
         # We do not want it here. We only return default if it is explicit set.
-        if name not in self._attributes:
-            for attrName, attrType in getattr(self, "attributes"):
-                if attrName != name:
-                    continue
-                return getattr(attrType, "default", None)
-        return self._attributes.get(name)
+        entry = self._attributeTable.get(name)
+        if entry is None:
+            return None
+        if self._lazy is not None:
+            self.resolveAttributes()
+        value = self._values[entry[0]]
+        if value is MISSING:
+            return getattr(entry[1], "default", None)
+        return value
+
+    def __hash__(self):
+        return hash(
+            (type(self), self.hid(), tuple(map(_hashable, _attributeValues(self))))
+        )
 
     def __repr__(self):
         hid = self.hid()
@@ -70,12 +123,35 @@ class Message(AttributesMixin):
         return "<Z-Wave {}.{}>".format(cmdClassName, name)
 
     @classmethod
-    def decode(cls, pkt: bytearray):
-        """Decode a raw bytearray into a Message object"""
-        return cls.deserialize(BitStreamReader(pkt))
+    def decode(cls, pkt: bytearray, lazy: bool = False):
+        """
+        Decode a raw bytearray into a Message object.
+        See :meth:`pyzwave.util.AttributesMixin.parseAttributes` for lazy decoding.
+        """
+        return cls.deserialize(BitStreamReader(pkt), lazy)
+
+    @classmethod
+    def decodeMany(cls, frames, lazy: bool = False):
+        """
+        Decode a stream of raw frames, yielding the messages one by one as they are
+        decoded. frames can be an iterable of raw frames, an iterable of
+        (timestamp, frame) tuples or a capture file (path or open file object, see
+        :mod:`pyzwave.capture`). For timestamped frames (timestamp, message) tuples
+        are yielded.
+        """
+        if isinstance(frames, (str, os.PathLike)) or hasattr(frames, "readline"):
+            # pylint: disable=import-outside-toplevel
+            from pyzwave.capture import readCapture
+
+            frames = readCapture(frames)
+        for frame in frames:
+            if isinstance(frame, tuple):
+                yield frame[0], cls.decode(frame[1], lazy)
+            else:
+                yield cls.decode(frame, lazy)
 
     @staticmethod
-    def deserialize(stream: BitStreamReader):
+    def deserialize(stream: BitStreamReader, lazy: bool = False):
         """Deserialize a bitstream into a Message object"""
         if stream.bytesLeft() < 2:
             return UnknownMessage(0x0000)
@@ -85,7 +161,7 @@ class Message(AttributesMixin):
         MsgCls = ZWaveMessage.get(hid, None)  # pylint: disable=invalid-name
         if MsgCls:
             msg = MsgCls()
-            msg.parseAttributes(stream)
+            msg.parseAttributes(stream, lazy)
         else:
             msg = UnknownMessage(hid)
         return msg
@@ -95,8 +171,10 @@ class Message(AttributesMixin):
         """
         Return the command class id and command id as a single word for easier lookup
         """
-        cmdClass, cmd = ZWaveMessage.reverseMapping.get(cls, (0, 0))
-        return (cmdClass << 8) | (cmd & 0xFF)
+        plan = cls.__dict__.get("__codecPlan__")
+        if plan is None or plan.hid is None:
+            return 0
+        return plan.hid
 
 
 class UnknownMessage(Message):
@@ -105,6 +183,8 @@ class UnknownMessage(Message):
     command class and command this message is (but we don't know how to decode it)
     """
 
+    __slots__ = ("_hid",)
+
     def __init__(self, hid):
         super().__init__()
         self._hid = hid
@@ -8,11 +8,13 @@ from typing import Dict
 from pyzwave.adapter import Adapter
 from pyzwave.commandclass import (
     CommandClass,
+    MultiCmd,
     NetworkManagementInclusion,
     Supervision,
     Zip,
 )
 from pyzwave.message import Message
+from pyzwave.scheduler import Priority, currentPriority, sendPriority
 from pyzwave.util import Listenable, MessageWaiter
 
 from pyzwave.const.ZW_classcmd import COMMAND_CLASS_ZWAVEPLUS_INFO
@@ -121,6 +123,23 @@ class Node(Listenable, MessageWaiter):
     def basicDeviceClass(self, basicDeviceClass: int):
         self._basicDeviceClass = basicDeviceClass
 
+    def batch(self, maxPayload: int = MultiCmd.MAX_PAYLOAD) -> MultiCmd.Batch:
+        """
+        Collect commands and send them encapsulated in as few frames as possible.
+        Nodes not supporting multi command get the commands one by one.
+
+        No frame is larger than maxPayload bytes. Lower it for nodes reached through
+        encapsulations adding more overhead than the default allows for.
+
+        .. code-block:: python
+
+            async with node.batch() as batch:
+                for parameter, value in settings.items():
+                    batch.add(Configuration.Set(...))
+            # The commands are sent here
+        """
+        return MultiCmd.Batch(self, maxPayload)
+
     def commandClassUpdated(self, _commandClass: CommandClass):
         """Called by the command classes if their data is updated"""
         if self._storageStatus == StorageStatus.CLEAN:
@@ -183,12 +202,16 @@ class Node(Listenable, MessageWaiter):
         """
         (Re)interview this node. It is recommended to apply the :meth:`storageLock()`
         before calling this function.
+
+        The messages are sent with maintenance priority so they do not delay
+        interactive messages.
         """
-        for _, cmdClass in self._supported.items():
-            try:
-                await cmdClass.interview()
-            except asyncio.TimeoutError:
-                _LOGGER.warning("Timeout interviewing %s", cmdClass.name)
+        with sendPriority(Priority.MAINTENANCE):
+            for _, cmdClass in self._supported.items():
+                try:
+                    await cmdClass.interview()
+                except asyncio.TimeoutError:
+                    _LOGGER.warning("Timeout interviewing %s", cmdClass.name)
 
     @property
     def isFailed(self) -> bool:
@@ -234,11 +257,19 @@ class Node(Listenable, MessageWaiter):
         """Return the root node id"""
         return self._nodeId
 
-    async def send(self, cmd: Message, timeout: int = 3) -> bool:
-        """Send a message to this node"""
-        return await self._adapter.sendToNode(
-            self._nodeId, cmd, sourceEP=0, destEP=self._endpoint, timeout=timeout
-        )
+    async def send(
+        self, cmd: Message, timeout: int = 3, priority: Priority = None
+    ) -> bool:
+        """
+        Send a message to this node. If priority is not set the priority of the
+        calling context is used, see :mod:`pyzwave.scheduler`.
+        """
+        if priority is None:
+            priority = currentPriority()
+        with sendPriority(priority):
+            return await self._adapter.sendToNode(
+                self._nodeId, cmd, sourceEP=0, destEP=self._endpoint, timeout=timeout
+            )
 
     async def sendAndReceive(
         self, cmd: Message, waitFor: Message, timeout: int = 3, **kwargs
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Retransmission of messages rejected by the gateway.
+
+The gateway answers a message with a nack if it could not be delivered to the
+node, or if its queue is full. Failed deliveries are retried for the message
+alone, while a full queue pauses every connection through the gateway.
+"""
+
+import logging
+import random
+
+from pyzwave.timerwheel import timerWheel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default number of retransmissions after the first attempt
+RETRIES = 3
+# Default delay before the first retransmission, in seconds
+BASE_DELAY = 0.05
+# Default upper limit for the delay between retransmissions, in seconds
+MAX_DELAY = 2.0
+# Default share of the delay that is randomized
+JITTER = 0.5
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter. The delay before retry n (starting at 0) is
+    baseDelay * 2^n, capped at maxDelay, with up to jitter of it randomly removed
+    so senders rejected at the same time do not retry at the same time.
+    """
+
+    def __init__(
+        self,
+        retries: int = RETRIES,
+        baseDelay: float = BASE_DELAY,
+        maxDelay: float = MAX_DELAY,
+        jitter: float = JITTER,
+    ):
+        self.retries = retries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """Returns the number of seconds to wait before retry attempt"""
+        delay = min(self.baseDelay * (1 << attempt), self.maxDelay)
+        return delay * (1 - self.jitter * random.random())
+
+
+class QueuePause:
+    """
+    Pause shared by all connections sending through the same gateway. Used when
+    the gateway reports its queue is full.
+    """
+
+    def __init__(self):
+        self._until = 0.0
+        self.pauses = 0
+
+    def pause(self, seconds: float):
+        """Hold all senders for seconds, unless already paused for longer"""
+        self.pauses += 1
+        until = timerWheel().loop.time() + seconds
+        if until > self._until:
+            _LOGGER.debug("Gateway queue full, pausing for %.3fs", seconds)
+            self._until = until
+
+    @property
+    def paused(self) -> bool:
+        """Returns True if sending is paused"""
+        return timerWheel().loop.time() < self._until
+
+    async def wait(self):
+        """Wait until the pause is over"""
+        wheel = timerWheel()
+        while True:
+            remaining = self._until - wheel.loop.time()
+            if remaining <= 0:
+                return
+            await wheel.sleep(remaining)
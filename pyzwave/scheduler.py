@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Scheduling of outbound messages to the nodes.
+
+Every message is sent with a priority. Higher priority messages are always sent
+first, messages with the same priority are sent round-robin between the nodes so
+one node with a lot of queued messages cannot starve the others.
+
+The priority is taken from the context of the caller. Use :func:`sendPriority`
+to change it for everything sent within a block:
+
+.. code-block:: python
+
+    with sendPriority(Priority.MAINTENANCE):
+        await node.interview()
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+import contextlib
+import contextvars
+import enum
+import logging
+
+from pyzwave.commandclass.Zip import IMELastWorkingRoute
+from pyzwave.timerwheel import timerWheel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default maximum number of messages in flight to all nodes
+MAX_ACTIVE = 16
+# Default maximum number of messages in flight to one node
+MAX_ACTIVE_PER_NODE = 1
+
+# Default share of the channel the messages sent by us may occupy. The rest is left
+# for the nodes' own reports and for retransmissions.
+AIRTIME_BUDGET = 0.5
+# Default number of seconds of airtime that may be sent back to back
+AIRTIME_BURST = 0.1
+# Speed assumed for nodes without a known route
+DEFAULT_SPEED = IMELastWorkingRoute.Speed.SPEED_40_KBIT_S
+
+# Bit rate, preamble length and checksum length for each speed (ITU-T G.9959)
+_PHY = {
+    IMELastWorkingRoute.Speed.SPEED_9_6_KBIT_S: (9600, 10, 1),
+    IMELastWorkingRoute.Speed.SPEED_40_KBIT_S: (40000, 10, 2),
+    IMELastWorkingRoute.Speed.SPEED_100_KBIT_S: (100000, 40, 2),
+}
+# Start of frame and MAC header (home id, source, frame control, length, destination)
+_FRAME_HEADER = 1 + 9
+# Routing header, not including one byte per repeater
+_ROUTING_HEADER = 2
+
+
+class Priority(enum.IntEnum):
+    """Priority classes for outbound messages. Lower values are sent first."""
+
+    INTERACTIVE = 0
+    REPORTING = 1
+    MAINTENANCE = 2
+
+
+_PRIORITY = contextvars.ContextVar("priority", default=Priority.INTERACTIVE)
+
+
+def currentPriority() -> Priority:
+    """Return the priority used for messages sent from the current context"""
+    return _PRIORITY.get()
+
+
+@contextlib.contextmanager
+def sendPriority(priority: Priority):
+    """Send all messages within the block using priority"""
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def airtime(length: int, speed=DEFAULT_SPEED, repeaters: int = 0) -> float:
+    """
+    Estimate the seconds of airtime used for sending a command of length bytes,
+    including the ack from the node and all retransmissions by the repeaters
+    """
+    rate, preamble, checksum = _PHY.get(speed, _PHY[DEFAULT_SPEED])
+    overhead = preamble + _FRAME_HEADER + checksum
+    if repeaters:
+        overhead += _ROUTING_HEADER + repeaters
+    # The frame and the ack are both transmitted once for every hop
+    return (2 * overhead + length) * 8 * (repeaters + 1) / rate
+
+
+def routeAirtime(length: int, route: IMELastWorkingRoute = None) -> float:
+    """Estimate the airtime for a command sent over route. See :func:`airtime`"""
+    if route is None:
+        return airtime(length)
+    repeaters = sum(
+        1
+        for repeater in (
+            route.repeater1,
+            route.repeater2,
+            route.repeater3,
+            route.repeater4,
+        )
+        if repeater
+    )
+    return airtime(length, route.speed, repeaters)
+
+
+class AirtimeLimiter:
+    """
+    Limits the airtime used by the messages sent to the network.
+
+    On average at most budget seconds of airtime are used per second, with bursts
+    of up to burst seconds. Callers are let through in the order they call
+    acquire().
+    """
+
+    def __init__(self, budget: float = AIRTIME_BUDGET, burst: float = AIRTIME_BURST):
+        self._budget = budget
+        self._burst = burst
+        # Time when the channel is considered free given what has been sent so far
+        self._free = 0.0
+        self.used = 0.0
+
+    async def acquire(self, seconds: float):
+        """Wait until seconds of airtime may be used"""
+        wheel = timerWheel()
+        now = wheel.loop.time()
+        start = max(self._free, now)
+        self._free = start + seconds / self._budget
+        self.used += seconds
+        delay = start - now - self._burst / self._budget
+        if delay > 0:
+            await wheel.sleep(delay)
+
+    @property
+    def budget(self) -> float:
+        """Share of the channel that may be used"""
+        return self._budget
+
+    @property
+    def burst(self) -> float:
+        """Seconds of airtime that may be sent back to back"""
+        return self._burst
+
+
+class OutboundScheduler:
+    """
+    Hands out slots for sending messages to the nodes.
+
+    At most maxActive messages are in flight at the same time and at most
+    maxActivePerNode to one node. Messages to the same node with the same priority
+    are sent in the order they were queued.
+
+    A multicast is scheduled with a frozenset of node ids. It counts as one message
+    in flight to each of the nodes and waits until all of them are free.
+    """
+
+    def __init__(
+        self, maxActive: int = MAX_ACTIVE, maxActivePerNode: int = MAX_ACTIVE_PER_NODE
+    ):
+        self._active = 0
+        self._activePerNode = {}
+        self._maxActive = max(maxActive, 1)
+        self._maxActivePerNode = max(maxActivePerNode, 1)
+        # One round-robin ring of nodes per priority, each holding a queue of waiters
+        self._queues = tuple(OrderedDict() for _ in Priority)
+
+    @property
+    def active(self) -> int:
+        """Number of messages in flight"""
+        return self._active
+
+    async def acquire(self, nodeId, priority: Priority = None):
+        """Wait until a message may be sent to the node"""
+        if priority is None:
+            priority = currentPriority()
+        # Any queued message is waiting for a busy node or for the total limit, so
+        # if this node is free the message can be sent right away
+        if self._canSend(nodeId):
+            self._take(nodeId)
+            return
+        future = asyncio.get_event_loop().create_future()
+        self._queues[priority].setdefault(nodeId, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed to us just before we were cancelled
+                self.release(nodeId)
+            raise
+
+    @property
+    def pending(self) -> int:
+        """Number of messages waiting to be sent"""
+        return sum(
+            not future.done()
+            for queue in self._queues
+            for waiters in queue.values()
+            for future in waiters
+        )
+
+    def release(self, nodeId):
+        """Release the slot after the message has been sent"""
+        self._active -= 1
+        for node in self._members(nodeId):
+            self._activePerNode[node] -= 1
+            if not self._activePerNode[node]:
+                del self._activePerNode[node]
+        self._dispatch()
+
+    def slot(self, nodeId, priority: Priority = None) -> "SchedulerSlot":
+        """
+        Context manager holding a slot for sending to the node. If priority is not
+        given the priority of the calling context is used.
+        """
+        if priority is None:
+            priority = currentPriority()
+        return SchedulerSlot(self, nodeId, priority)
+
+    def _canSend(self, nodeId) -> bool:
+        return self._active < self._maxActive and all(
+            self._activePerNode.get(node, 0) < self._maxActivePerNode
+            for node in self._members(nodeId)
+        )
+
+    def _dispatch(self):
+        # Waiters left in a higher priority are waiting for their node to be free so
+        # the lower priorities may use the remaining slots for the other nodes
+        for queue in self._queues:
+            if self._active >= self._maxActive:
+                return
+            for nodeId in list(queue):
+                if not self._canSend(nodeId):
+                    continue
+                waiters = queue[nodeId]
+                while waiters and self._canSend(nodeId):
+                    future = waiters.popleft()
+                    if future.done():
+                        continue
+                    self._take(nodeId)
+                    future.set_result(None)
+                # Move the node last in the ring to let the other nodes go first
+                del queue[nodeId]
+                if waiters:
+                    queue[nodeId] = waiters
+
+    @staticmethod
+    def _members(nodeId) -> tuple:
+        if isinstance(nodeId, frozenset):
+            return tuple(nodeId)
+        return (nodeId,)
+
+    def _take(self, nodeId):
+        self._active += 1
+        for node in self._members(nodeId):
+            self._activePerNode[node] = self._activePerNode.get(node, 0) + 1
+
+
+class SchedulerSlot:
+    """
+    Async context manager returned by :meth:`OutboundScheduler.slot`. Acquires a
+    slot on enter and releases it on exit.
+    """
+
+    __slots__ = ("_nodeId", "_priority", "_scheduler")
+
+    def __init__(self, scheduler: OutboundScheduler, nodeId, priority: Priority):
+        self._nodeId = nodeId
+        self._priority = priority
+        self._scheduler = scheduler
+
+    async def __aenter__(self):
+        await self._scheduler.acquire(self._nodeId, self._priority)
+
+    async def __aexit__(self, excType, exc, traceback):
+        self._scheduler.release(self._nodeId)
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Hierarchical timer wheel shared by all timers in pyzwave.
+
+Arming, resetting and cancelling a timer are O(1) and do not touch the event
+loop's scheduler. The wheel itself keeps at most one handle in the event loop,
+armed for the next tick that has work to do.
+"""
+
+import asyncio
+import logging
+import math
+import weakref
+
+_LOGGER = logging.getLogger(__name__)
+
+# Length of one tick in seconds. Timers never fire early but may fire up to one
+# tick late.
+RESOLUTION = 0.01
+
+# The first level holds one slot per tick. Each slot of the following levels
+# spans a whole revolution of the level below
+LEVEL_BITS = (8, 6, 6, 6)
+_SHIFTS = tuple(sum(LEVEL_BITS[:i]) for i in range(len(LEVEL_BITS)))
+_SIZES = tuple(1 << bits for bits in LEVEL_BITS)
+# Timers further away than this are parked in the last level and rescheduled
+MAX_TICKS = (1 << sum(LEVEL_BITS)) - 1
+
+_WHEELS = weakref.WeakKeyDictionary()
+
+
+class Timer:
+    """A timer armed in a :class:`TimerWheel`. Returned by TimerWheel.callLater()"""
+
+    __slots__ = ("_args", "_callback", "_expires", "_slot", "_wheel")
+
+    def __init__(self, wheel: "TimerWheel", callback, args):
+        self._args = args
+        self._callback = callback
+        self._expires = 0
+        self._slot = None
+        self._wheel = wheel
+
+    @property
+    def active(self) -> bool:
+        """Returns True if the timer is armed and has not yet fired"""
+        return self._slot is not None
+
+    def cancel(self):
+        """Stop the timer. Cancelling a timer not armed is allowed."""
+        if self._slot is not None:
+            self._wheel.remove(self)
+
+    def reset(self, delay: float):
+        """(Re)arm the timer to fire delay seconds from now"""
+        if self._slot is not None:
+            self._wheel.remove(self)
+        self._wheel.add(self, delay)
+
+
+class TimerWheel:
+    """
+    Timer wheel for one event loop. Use :func:`timerWheel` to get the wheel shared
+    by everything running in the loop.
+    """
+
+    def __init__(self, loop=None):
+        self._loop = loop or asyncio.get_event_loop()
+        self._count = 0
+        self._handle = None
+        self._levels = tuple(tuple(set() for _ in range(size)) for size in _SIZES)
+        # The next tick to process
+        self._tick = self._now()
+        self._wakeTick = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, timer: Timer, delay: float):
+        """Arm a timer. Use Timer.reset() instead of calling this directly."""
+        # pylint: disable=protected-access
+        if self._count == 0:
+            # Nothing pending, fast forward instead of processing the idle ticks
+            self._tick = max(self._tick, self._now())
+        timer._expires = math.ceil((self._loop.time() + max(delay, 0)) / RESOLUTION)
+        self._count += 1
+        self._schedule(self._insert(timer))
+
+    def callLater(self, delay: float, callback, *args) -> Timer:
+        """
+        Call callback(*args) after delay seconds. Like loop.call_later() but the
+        returned timer can also be reset.
+        """
+        timer = Timer(self, callback, args)
+        self.add(timer, delay)
+        return timer
+
+    @property
+    def loop(self):
+        """The event loop this wheel is running in"""
+        return self._loop
+
+    def remove(self, timer: Timer):
+        """Disarm a timer. Use Timer.cancel() instead of calling this directly."""
+        # pylint: disable=protected-access
+        timer._slot.discard(timer)
+        timer._slot = None
+        # The loop handle is left armed. Cancelling and rearming it on every reset
+        # would cost more than one spurious wakeup.
+        self._count -= 1
+
+    async def sleep(self, delay: float):
+        """Like asyncio.sleep() but using the wheel"""
+        future = self._loop.create_future()
+        timer = self.callLater(delay, _setResult, future)
+        try:
+            await future
+        finally:
+            timer.cancel()
+
+    async def waitFor(self, future, timeout: float):
+        """
+        Like asyncio.wait_for() but using the wheel for the timeout. The future is
+        cancelled and asyncio.TimeoutError is raised if the timeout expires.
+        """
+        future = asyncio.ensure_future(future, loop=self._loop)
+        if timeout is None:
+            return await future
+        expired = []
+
+        def expire():
+            expired.append(True)
+            future.cancel()
+
+        timer = self.callLater(timeout, expire)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if expired:
+                raise asyncio.TimeoutError() from None
+            raise
+        finally:
+            timer.cancel()
+
+    def _cascade(self, level: int, index: int):
+        """Move the timers from a slot down to the levels below"""
+        slot = self._levels[level][index]
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            self._insert(timer)
+
+    def _insert(self, timer: Timer) -> int:
+        """Put the timer in its slot. Returns the tick the slot is processed."""
+        # pylint: disable=protected-access
+        ticks = timer._expires - self._tick
+        if ticks < 0:
+            # Already expired, fire with the next tick
+            level, expires = 0, self._tick
+        else:
+            if ticks > MAX_TICKS:
+                ticks = MAX_TICKS
+            expires = self._tick + ticks
+            level = 0
+            while ticks >= 1 << (_SHIFTS[level] + LEVEL_BITS[level]):
+                level += 1
+        index = (expires >> _SHIFTS[level]) & (_SIZES[level] - 1)
+        slot = self._levels[level][index]
+        slot.add(timer)
+        timer._slot = slot
+        # Timers in the upper levels are cascaded at the start of their slot
+        return expires >> _SHIFTS[level] << _SHIFTS[level]
+
+    def _nextTick(self) -> int:
+        """Return the next tick with timers to fire, or the next cascade"""
+        slots = self._levels[0]
+        if not any(slots):
+            return self._wrapTick()
+        for tick in range(self._tick, self._wrapTick()):
+            if slots[tick & (_SIZES[0] - 1)]:
+                return tick
+        return self._wrapTick()
+
+    def _nextWakeTick(self) -> int:
+        """Return the next tick the wheel has any work to do"""
+        tick = self._nextTick()
+        if any(self._levels[0]):
+            return tick
+        # Only the upper levels hold timers. Skip to the first cascade moving any.
+        limit = None
+        if any(any(level) for level in self._levels[2:]):
+            span = 1 << _SHIFTS[2]
+            limit = -(-tick // span) * span
+        first = tick >> _SHIFTS[1]
+        for block in range(first, first + _SIZES[1]):
+            start = block << _SHIFTS[1]
+            if limit is not None and start >= limit:
+                break
+            if self._levels[1][block & (_SIZES[1] - 1)]:
+                return start
+        return tick if limit is None else limit
+
+    def _now(self) -> int:
+        return math.floor(self._loop.time() / RESOLUTION)
+
+    def _process(self):
+        """Process the current tick and advance to the next"""
+        tick = self._tick
+        index = tick & (_SIZES[0] - 1)
+        if index == 0:
+            for level in range(1, len(_SIZES)):
+                levelIndex = (tick >> _SHIFTS[level]) & (_SIZES[level] - 1)
+                self._cascade(level, levelIndex)
+                if levelIndex != 0:
+                    break
+        # Timers armed by the callbacks must not end up in the current tick
+        self._tick += 1
+        slot = self._levels[0][index]
+        if not slot:
+            return
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            timer._slot = None  # pylint: disable=protected-access
+        self._count -= len(timers)
+        for timer in timers:
+            try:
+                timer._callback(*timer._args)  # pylint: disable=protected-access
+            except Exception as error:  # pylint: disable=broad-except
+                self._loop.call_exception_handler(
+                    {"message": "Error in timer callback", "exception": error}
+                )
+
+    def _run(self):
+        # The loop may wake us slightly early
+        end = max(self._now(), self._wakeTick)
+        self._handle = None
+        self._wakeTick = None
+        while self._count:
+            # Skip the empty ticks, but not the cascades
+            self._tick = min(self._nextTick(), end + 1)
+            if self._tick > end:
+                break
+            self._process()
+        if self._count == 0:
+            self._tick = max(self._tick, end + 1)
+            return
+        self._schedule(self._nextWakeTick())
+
+    def _schedule(self, wakeTick: int):
+        if self._handle is not None:
+            if self._wakeTick <= wakeTick:
+                return
+            self._handle.cancel()
+        self._wakeTick = wakeTick
+        self._handle = self._loop.call_at(wakeTick * RESOLUTION, self._run)
+
+    def _wrapTick(self) -> int:
+        """The next tick where the first level wraps and the upper levels cascade"""
+        mask = _SIZES[0] - 1
+        return (self._tick + mask) & ~mask
+
+
+def _setResult(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def timerWheel(loop=None) -> TimerWheel:
+    """Return the timer wheel shared by everything running in the event loop"""
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    wheel = _WHEELS.get(loop)
+    if wheel is None:
+        wheel = TimerWheel(loop)
+        _WHEELS[loop] = wheel
+    return wheel
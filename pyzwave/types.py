@@ -1,18 +1,67 @@
 import enum
+from functools import lru_cache
 import ipaddress
 import math
+import struct
+
+
+# Struct format characters for byte aligned integer types, keyed on (size, signed)
+STRUCT_FORMATS = {
+    (1, False): "B",
+    (2, False): "H",
+    (4, False): "I",
+    (1, True): "b",
+    (2, True): "h",
+    (4, True): "i",
+}
+
+ENDIAN_PREFIX = {"big": ">", "little": "<"}
+
+# Precompiled structs for integer types, keyed on (size, signed, endian)
+INT_STRUCTS = {
+    (size, signed, endian): struct.Struct(prefix + fmt)
+    for (size, signed), fmt in STRUCT_FORMATS.items()
+    for endian, prefix in ENDIAN_PREFIX.items()
+}
+
+# Values below this are shared between all instances of the same type.
+# See sharedValue()
+SHARED_VALUES = 256
+_sharedValues = {}
+
+
+def sharedValue(cls, value: int, create):
+    """
+    Return the shared instance of cls for value, creating it with create(cls, value)
+    the first time. Only use this for immutable types.
+    """
+    cache = _sharedValues.get(cls)
+    if cache is None:
+        cache = _sharedValues[cls] = {}
+    obj = cache.get(value)
+    if obj is None:
+        obj = cache[value] = create(cls, value)
+    return obj
 
 
 class BitStreamReader:
-    """Class for parsing streams bitwise"""
+    """
+    Class for parsing streams bitwise.
+    The reader wraps the data in a memoryview and keeps an integer bit cursor into it.
+    Sub readers share the same underlying buffer so nested parsers never copy any data.
+    """
 
     def __init__(self, value):
-        self._start = 0
-        self._value = value
+        view = value if isinstance(value, memoryview) else memoryview(value)
+        if view.format != "B":
+            view = view.cast("B")
+        self._value = view
+        self._length = len(view)
+        self._pos = 0
 
     def advance(self, length):
         """Advance the stream length bits"""
-        self._start += length
+        self._pos += length
 
     def bit(self, advance: bool = True) -> int:
         """Return the next bit in the stream"""
@@ -20,21 +69,28 @@ class BitStreamReader:
 
     def bits(self, size: int = 8, advance=True) -> int:
         """Return size number of bits in the stream"""
-        startBit = self._start % 8
-        byte = (self.peekByte() << startBit) & 0xFF  # Mask off top part of byte
+        byte = (self.peekByte() << (self._pos & 7)) & 0xFF  # Mask off top part of byte
         byte = (byte >> 8 - size) & 0xFF  # Shift down and mask
         if advance:
-            self.advance(size)
+            self._pos += size
         return byte
 
     def byte(self, advance: bool = True) -> int:
         """Return one byte from the stream"""
-        return int.from_bytes(self.value(1, advance), "little", signed=False)
+        startByte = self._pos >> 3
+        if startByte >= self._length:
+            raise EOFError("Tried to read past end of data")
+        if advance:
+            self._pos += 8
+        return self._value[startByte]
 
     def bytesLeft(self) -> int:
         """Return the number of bytes remaining from the stream"""
-        startByte = int(self._start / 8)
-        return len(self._value) - startByte
+        return self._length - (self._pos >> 3)
+
+    def isByteAligned(self) -> bool:
+        """Return True if the stream is positioned at the start of a byte"""
+        return self._pos & 7 == 0
 
     def peekByte(self) -> int:
         """Return the next byte from the stream without advancing the stream"""
@@ -46,17 +102,42 @@ class BitStreamReader:
 
     def remaining(self, advance: bool = True) -> bytes:
         """Return all the remaining bytes in the stream"""
-        startByte = int(self._start / 8)
+        startByte = self._pos >> 3
         if advance:
-            self.advance(len(self._value) * 8)
-        return self._value[startByte:]
+            self._pos = max(self._pos, self._length * 8)
+        return self._value[startByte:].tobytes()
+
+    def subReader(self, size: int) -> "BitStreamReader":
+        """
+        Return a new reader for the next size bytes and advance this stream past them.
+        The new reader shares the buffer with this stream, no data is copied.
+        """
+        return BitStreamReader(self.view(size))
+
+    def unpack(self, fmt: struct.Struct, advance: bool = True) -> tuple:
+        """Unpack a precompiled struct from the stream. The stream must be byte aligned"""
+        if not self.isByteAligned():
+            raise ValueError("Stream is not byte aligned")
+        startByte = self._pos >> 3
+        if startByte + fmt.size > self._length:
+            raise EOFError("Tried to read past end of data")
+        if advance:
+            self._pos += fmt.size * 8
+        return fmt.unpack_from(self._value, startByte)
 
     def value(self, size: int, advance: bool = True) -> bytes:
         """Return the next size number of bytes from the stream"""
-        startByte = int(self._start / 8)
+        return self.view(size, advance).tobytes()
+
+    def view(self, size: int, advance: bool = True) -> memoryview:
+        """
+        Return the next size number of bytes from the stream as a memoryview
+        into the underlying buffer without copying
+        """
+        startByte = self._pos >> 3
         if advance:
-            self.advance(size * 8)
-        if startByte + size > len(self._value):
+            self._pos += size * 8
+        if startByte + size > self._length:
             raise EOFError("Tried to read past end of data")
         return self._value[startByte : startByte + size]
 
@@ -86,10 +167,22 @@ class BitStreamWriter(bytearray):
         self.extend(newVal)
         self._start = 0
 
+    def addStruct(self, fmt: struct.Struct, *values):
+        """Add values packed by a precompiled struct. The stream must be byte aligned"""
+        if not self.isByteAligned():
+            raise ValueError("Stream is not byte aligned")
+        self.extend(fmt.pack(*values))
+
+    def isByteAligned(self) -> bool:
+        """Return True if the next value will be written at the start of a new byte"""
+        return self._start == 0
+
 
 class str_t(str):  # pylint: disable=invalid-name
     """Unicode string"""
 
+    __slots__ = ()
+
     def __getstate__(self):
         return str(self)
 
@@ -103,6 +196,8 @@ class str_t(str):  # pylint: disable=invalid-name
 class int_t(int):  # pylint: disable=invalid-name
     """Base class for any int like type"""
 
+    __slots__ = ()
+
     endian = "big"
     signed = True
     size = 0
@@ -113,7 +208,10 @@ class int_t(int):  # pylint: disable=invalid-name
     @classmethod
     def deserialize(cls, stream: BitStreamReader):
         """Deserialize unsigned value from stream"""
-        return cls.from_bytes(stream.value(cls.size), cls.endian, signed=cls.signed)
+        fmt = INT_STRUCTS.get((cls.size, cls.signed, cls.endian))
+        if fmt is not None and stream.isByteAligned():
+            return cls(stream.unpack(fmt)[0])
+        return cls.from_bytes(stream.view(cls.size), cls.endian, signed=cls.signed)
 
     def serialize(self, stream: BitStreamWriter):
         """Serialize into stream"""
@@ -123,9 +221,16 @@ class int_t(int):  # pylint: disable=invalid-name
 class uint_t(int_t):  # pylint: disable=invalid-name
     """Base class for any unsigned int like type"""
 
+    __slots__ = ()
+
     signed = False
     size = 1
 
+    def __new__(cls, value=0, *args):
+        if not args and isinstance(value, int) and 0 <= value < SHARED_VALUES:
+            return sharedValue(cls, int(value), int.__new__)
+        return super().__new__(cls, value, *args)
+
     def __repr__(self):
         return "0x{0:0{1}X} ({0})".format(int(self), self.size)
 
@@ -133,90 +238,120 @@ class uint_t(int_t):  # pylint: disable=invalid-name
 class int24_t(int_t):  # pylint: disable=invalid-name
     """Signed 24 bits value"""
 
+    __slots__ = ()
+
     size = 3
 
 
-class uint3_t(int):  # pylint: disable=invalid-name
-    """Type representing 3 bits value"""
+class uintbits_t(int):  # pylint: disable=invalid-name
+    """Base class for unsigned values smaller than one byte"""
+
+    __slots__ = ()
+
+    sizeBits = 0
+
+    def __new__(cls, value=0, *args):
+        if not args and isinstance(value, int) and 0 <= value < SHARED_VALUES:
+            return sharedValue(cls, int(value), int.__new__)
+        return super().__new__(cls, value, *args)
 
     @classmethod
     def deserialize(cls, stream: BitStreamReader):
         """Deserialize bits from stream"""
-        return stream.bits(3)
+        return stream.bits(cls.sizeBits)
 
     def serialize(self, stream: BitStreamWriter):
         """Serialize bits into stream"""
-        stream.addBits(self, 3)
+        stream.addBits(self, self.sizeBits)
+
+
+class uint3_t(uintbits_t):  # pylint: disable=invalid-name
+    """Type representing 3 bits value"""
+
+    __slots__ = ()
+
+    sizeBits = 3
 
 
-class uint4_t(int):  # pylint: disable=invalid-name
+class uint4_t(uintbits_t):  # pylint: disable=invalid-name
     """Type representing 4 bits value"""
 
-    @classmethod
-    def deserialize(cls, stream: BitStreamReader):
-        """Deserialize bits from stream"""
-        return stream.bits(4)
+    __slots__ = ()
 
-    def serialize(self, stream: BitStreamWriter):
-        """Serialize bits into stream"""
-        stream.addBits(self, 4)
+    sizeBits = 4
 
 
-class uint5_t(int):  # pylint: disable=invalid-name
+class uint5_t(uintbits_t):  # pylint: disable=invalid-name
     """Type representing 5 bits value"""
 
-    @classmethod
-    def deserialize(cls, stream: BitStreamReader):
-        """Deserialize bits from stream"""
-        return stream.bits(5)
+    __slots__ = ()
 
-    def serialize(self, stream: BitStreamWriter):
-        """Serialize bits into stream"""
-        stream.addBits(self, 5)
+    sizeBits = 5
 
 
-class uint7_t(int):  # pylint: disable=invalid-name
+class uint7_t(uintbits_t):  # pylint: disable=invalid-name
     """Type representing 7 bits value"""
 
-    @classmethod
-    def deserialize(cls, stream: BitStreamReader):
-        """Deserialize bits from stream"""
-        return stream.bits(7)
+    __slots__ = ()
 
-    def serialize(self, stream: BitStreamWriter):
-        """Serialize bits into stream"""
-        stream.addBits(self, 7)
+    sizeBits = 7
 
 
 class uint8_t(uint_t):  # pylint: disable=invalid-name
     """Unsigned byte"""
 
+    __slots__ = ()
+
     size = 1
 
 
 class uint16_t(uint_t):  # pylint: disable=invalid-name
     """Unsigned word"""
 
+    __slots__ = ()
+
     size = 2
 
 
 class uint32_t(uint_t):  # pylint: disable=invalid-name
     """Unsigned 32 bits value"""
 
+    __slots__ = ()
+
     size = 4
 
 
 class BitsBase:
     """Base type for bit values"""
 
+    __slots__ = ("_value",)
+
     sizeBits = 1
 
+    def __new__(cls, value: int):
+        if isinstance(value, int) and 0 <= value < min(
+            1 << cls.sizeBits, SHARED_VALUES
+        ):
+            return sharedValue(cls, int(value), BitsBase._create)
+        return super().__new__(cls)
+
     def __init__(self, value: int):
         self._value = int(value)
 
+    @staticmethod
+    def _create(cls, value):  # pylint: disable=bad-staticmethod-argument
+        obj = object.__new__(cls)
+        obj._value = value  # pylint: disable=protected-access
+        return obj
+
     def __eq__(self, other):
+        if isinstance(other, BitsBase):
+            other = other._value
         return self._value.__eq__(other)
 
+    def __hash__(self):
+        return hash(self._value)
+
     def __int__(self):
         return self._value
 
@@ -236,6 +371,8 @@ class BitsBase:
 class bytes_t(bytes):  # pylint: disable=invalid-name
     """Variable size bytes"""
 
+    __slots__ = ()
+
     default = b""
 
     def serialize(self, stream: BitStreamWriter):
@@ -251,6 +388,8 @@ class bytes_t(bytes):  # pylint: disable=invalid-name
 class flag_t(BitsBase):  # pylint: disable=invalid-name
     """Type represeting one bit"""
 
+    __slots__ = ()
+
     def __init__(self, value: int):
         super().__init__(int(value) & 1)
 
@@ -261,23 +400,29 @@ class flag_t(BitsBase):  # pylint: disable=invalid-name
         return "flag_t({})".format(bool(self))
 
 
+@lru_cache(maxsize=None)
 def bits_t(size):  # pylint: disable=invalid-name
     """Return the type for size number of bits"""
     # pylint: disable=redefined-outer-name
     class bits_t(BitsBase):  # pylint: disable=invalid-name
         """Type represting arbitrary bits"""
 
+        __slots__ = ()
+
         sizeBits = size
 
     return bits_t
 
 
+@lru_cache(maxsize=None)
 def enum_t(enumType, baseType):  # pylint: disable=invalid-name
     """Return a new enum type based on the specified type"""
     # pylint: disable=redefined-outer-name
     class enum_t(baseType):  # pylint: disable=invalid-name
         """Type for representing an enum value"""
 
+        __slots__ = ()
+
         def __repr__(self):
             value = int(self)
             try:
@@ -294,6 +439,8 @@ def enum_t(enumType, baseType):  # pylint: disable=invalid-name
 class float_t(float):  # pylint: disable=invalid-name
     """Type for representing signed float values."""
 
+    __slots__ = ("_size", "_scale")
+
     def __new__(cls, value=0, *_args):  # pylint: disable=keyword-arg-before-vararg
         # Override __new__ to allow *args
         return float.__new__(cls, value)
@@ -303,6 +450,21 @@ class float_t(float):  # pylint: disable=invalid-name
         self._size = size
         self._scale = scale
 
+    def __eq__(self, other):
+        if isinstance(other, float_t) and self._scale != other._scale:
+            # Same value in different scales (units) are not the same
+            return False
+        return float.__eq__(self, other)
+
+    def __hash__(self):
+        return float.__hash__(self)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
     @property
     def scale(self) -> int:
         """The scale this value represents"""
@@ -314,18 +476,21 @@ class float_t(float):  # pylint: disable=invalid-name
         precision = stream.bits(3)
         scale = stream.bits(2)
         size = stream.bits(3)
-        value = int.from_bytes(stream.value(size), "big", signed=True) / math.pow(
+        value = int.from_bytes(stream.view(size), "big", signed=True) / math.pow(
             10, precision
         )
         return (value, size, scale)
 
 
+@lru_cache(maxsize=None)
 def reserved_t(size):  # pylint: disable=invalid-name
     """Return the type for bits that are reserved and must not be used"""
     # pylint: disable=redefined-outer-name
     class reserved_t(BitsBase):  # pylint: disable=invalid-name
         """Type for when the bits are reserved and must not be used"""
 
+        __slots__ = ()
+
         default = 0
         sizeBits = size
 
@@ -335,6 +500,8 @@ def reserved_t(size):  # pylint: disable=invalid-name
 class dsk_t:  # pylint: disable=invalid-name
     """Type for a DSK key"""
 
+    __slots__ = ("_dsk",)
+
     def __init__(self, dsk=None):
         self._dsk = dsk or b""
 
@@ -352,6 +519,9 @@ class dsk_t:  # pylint: disable=invalid-name
     def __eq__(self, other):
         return self.__getstate__() == other
 
+    # Mutable, see __setstate__()
+    __hash__ = None
+
     def __setstate__(self, state):
         if isinstance(state, bytes):
             if len(state) == 16 or len(state) == 0:
@@ -392,6 +562,8 @@ class dsk_t:  # pylint: disable=invalid-name
 class IPv6(ipaddress.IPv6Address):
     """Type for a IPv6 address"""
 
+    __slots__ = ()
+
     def serialize(self, stream: BitStreamWriter):
         """Serialize the IPv6 address"""
         stream.extend(self.packed)
@@ -405,5 +577,7 @@ class IPv6(ipaddress.IPv6Address):
 class HomeID(uint32_t):
     """Type for Z-Wave Home ID"""
 
+    __slots__ = ()
+
     def __str__(self):
         return "{:X}".format(self)
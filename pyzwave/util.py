@@ -1,85 +1,173 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+from collections import OrderedDict, deque
 import inspect
 import logging
+import time
 from typing import Dict, Any
 
-from pyzwave.types import BitStreamReader
+from pyzwave.codec import CodecPlan, MISSING
+from pyzwave.timerwheel import timerWheel
+from pyzwave.types import BitStreamReader, BitStreamWriter
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class AttributesMixin:
-    """Inheritable class to implement defined attributes"""
+class AttributeDescriptor:
+    """
+    Descriptor generated for each attribute in the attributes declaration. Reads the
+    value directly from the storage array without going through __getattr__.
+    """
+
+    __slots__ = ("index", "name")
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+    def __get__(self, obj, objType=None):
+        if obj is None:
+            return self
+        if self.index is None:
+            # Attribute declared by a base class only, let __getattr__ handle it
+            raise AttributeError(self.name)
+        value = obj._values[self.index]  # pylint: disable=protected-access
+        if value is MISSING:
+            return obj.__getattr__(self.name)
+        return value
+
+
+class AttributesMeta(type):
+    """
+    Metaclass for AttributesMixin. Classes not declaring __slots__ get an empty one
+    so they do not add a __weakref__ slot to every instance. Other values may still
+    be set on the instances, they are stored in a __dict__ created on first use.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        namespace.setdefault("__slots__", ())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class AttributesMixin(metaclass=AttributesMeta):
+    """
+    Inheritable class to implement defined attributes.
+
+    The attribute values are stored in an array indexed by the position in the
+    attributes declaration. Other values set on the instance are kept in __dict__,
+    which is only allocated for instances using it. Subclasses storing such values
+    on every instance may declare them in __slots__ instead.
+    """
+
+    __slots__ = ("_values", "_lazy", "__dict__")
 
     attributes = ()
+    # Attributes deferred when parsing lazily, see parseAttributes()
+    lazyAttributes = ()
+    # Lookup table name -> (index, type, has __setstate__). Built once per class
+    _attributeTable = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        table = {}
+        for attr in cls.attributes:
+            attrName, attrType = attr[0], attr[1]
+            if attrName in table:
+                # First declaration wins, same as a linear scan would
+                continue
+            table[attrName] = (len(table), attrType, hasattr(attrType, "__setstate__"))
+        cls._attributeTable = table
+        for base in cls.__mro__[1:]:
+            for attrName, value in vars(base).items():
+                if isinstance(value, AttributeDescriptor) and attrName not in table:
+                    setattr(cls, attrName, AttributeDescriptor(attrName, None))
+        for attrName, (index, _, _) in table.items():
+            existing = inspect.getattr_static(cls, attrName, None)
+            if existing is None or isinstance(existing, AttributeDescriptor):
+                setattr(cls, attrName, AttributeDescriptor(attrName, index))
 
     def __init__(self, **kwargs):
         super().__init__()
-        self._attributes = {}
-        for attr in getattr(self, "attributes"):
-            attrName, attrType = attr[0], attr[1]
+        self._lazy = None
+        values = [MISSING] * len(self._attributeTable)
+        self._values = values
+        for attrName, (index, attrType, hasSetstate) in self._attributeTable.items():
             if attrName not in kwargs:
                 continue
             value = kwargs[attrName]
             if isinstance(value, AttributesMixin):
                 # Is a subclass of ourself, not not wrap it
-                self._attributes[attrName] = value
-            elif hasattr(attrType, "__setstate__"):
-                self._attributes[attrName] = attrType()
-                self._attributes[attrName].__setstate__(value)
+                values[index] = value
+            elif hasSetstate:
+                values[index] = attrType()
+                values[index].__setstate__(value)
             else:
-                self._attributes[attrName] = attrType(value)
+                values[index] = attrType(value)
 
     def attributeUpdated(self, name, newValue, oldValue):
         """Called if an attribute value was updated"""
 
+    def composeAttributes(self, stream: BitStreamWriter):
+        """Write the attributes into a bitstream. The reverse of parseAttributes()"""
+        self.resolveAttributes()
+        CodecPlan.forClass(self.__class__).encode(self, stream)
+
     def debugString(self, indent=0):
         """
         Convert all attributes in this object to a human readable string used for debug output.
         """
+        self.resolveAttributes()
         attrs = []
         for attr in self.attributes:
             attrName = attr[0]
-            if attrName not in self._attributes:
+            value = self._values[self._attributeTable[attrName][0]]
+            if value is MISSING:
                 continue
-            if hasattr(self._attributes[attrName], "debugString"):
-                value = self._attributes[attrName].debugString(indent + 1)
+            if hasattr(value, "debugString"):
+                value = value.debugString(indent + 1)
             else:
-                value = repr(self._attributes[attrName])
+                value = repr(value)
             attrs.append("{}{} = {}".format("\t" * (indent + 1), attrName, value))
         return "{}:\n{}".format(str(self), "\n".join(attrs))
 
-    def parseAttributes(self, stream: BitStreamReader):
-        """Populate the attributes from a raw bitstream."""
-        for attr in self.attributes:
-            if stream.bytesLeft() == 0:
-                # No more data, cannot decode rest of the attributes
-                break
-            attrName, attrType = attr[0], attr[1]
-            deserializer = getattr(self, "parse_{}".format(attrName), None)
-            if deserializer:
-                value = deserializer(stream)
-            else:
-                value = attrType.deserialize(stream)
-            # This can be optimized to reduce the second loop in __setattr__
-            setattr(self, attrName, value)
+    def parseAttributes(self, stream: BitStreamReader, lazy: bool = False):
+        """
+        Populate the attributes from a raw bitstream.
+
+        If lazy is True the attributes in lazyAttributes (and all following) are kept
+        undecoded until they are first accessed. Decoding errors in these attributes
+        will then be raised on access instead.
+        """
+        CodecPlan.forClass(self.__class__).decode(self, stream, lazy)
+
+    def resolveAttributes(self):
+        """Decode any attributes deferred by a lazy parseAttributes()"""
+        lazy = self._lazy
+        if lazy is not None:
+            self._lazy = None
+            lazy.decode(self)
 
     def __getattr__(self, name):
-        if name not in self._attributes:
+        entry = self._attributeTable.get(name)
+        if entry is None:
+            return None
+        if self._lazy is not None:
+            self.resolveAttributes()
+        value = self._values[entry[0]]
+        if value is MISSING:
             # Try to load default
-            for attrName, attrType in getattr(self, "attributes"):
-                if attrName != name:
-                    continue
-                attr = attrType()
-                self._attributes[name] = attr
-                return attr
-        return self._attributes.get(name)
+            value = entry[1]()
+            self._values[entry[0]] = value
+        return value
 
     def __getstate__(self) -> Dict[str, Any]:
+        self.resolveAttributes()
         values = {}
-        for attr, value in self._attributes.items():
+        for attr, (index, _, _) in self._attributeTable.items():
+            value = self._values[index]
+            if value is MISSING:
+                continue
             if hasattr(value, "__getstate__"):
                 values[attr] = value.__getstate__()
             else:
@@ -87,37 +175,68 @@ class AttributesMixin:
         return values
 
     def __setattr__(self, name, value):
-        for attr in getattr(self, "attributes"):
-            attrName, attrType = attr[0], attr[1]
-            if attrName == name:
-                oldValue = self._attributes.get(name, None)
-                if isinstance(value, attrType):
-                    # Correct type set, use it directly
-                    newValue = value
-                elif hasattr(attrType, "__setstate__"):
-                    newValue = attrType()
-                    newValue.__setstate__(value)
-                elif isinstance(value, tuple):
-                    newValue = attrType(*value)
-                else:
-                    newValue = attrType(value)
-                if oldValue == newValue:
-                    return
-                self._attributes[name] = newValue
-                self.attributeUpdated(name, newValue, oldValue)
-                return
-        super().__setattr__(name, value)
+        entry = self._attributeTable.get(name)
+        if entry is None:
+            super().__setattr__(name, value)
+            return
+        if self._lazy is not None:
+            self.resolveAttributes()
+        index, attrType, hasSetstate = entry
+        oldValue = self._values[index]
+        if oldValue is MISSING:
+            oldValue = None
+        if isinstance(value, attrType):
+            # Correct type set, use it directly
+            newValue = value
+        elif hasSetstate:
+            newValue = attrType()
+            newValue.__setstate__(value)
+        elif isinstance(value, tuple):
+            newValue = attrType(*value)
+        else:
+            newValue = attrType(value)
+        if oldValue == newValue:
+            return
+        self._values[index] = newValue
+        self.attributeUpdated(name, newValue, oldValue)
 
     def __setstate__(self, state):
-        for attrName, attrType in getattr(self, "attributes"):
+        for attrName, (index, attrType, hasSetstate) in self._attributeTable.items():
             if attrName not in state:
                 continue
-            if hasattr(attrType, "__setstate__"):
+            if hasSetstate:
                 value = attrType()
                 value.__setstate__(state[attrName])
             else:
                 value = attrType(state[attrName])
-            self._attributes[attrName] = value
+            self._values[index] = value
+
+
+class DuplicateFilter:
+    """
+    Detects packets retransmitted because our ack was lost. A packet is a duplicate
+    if an identical packet with the same key was received within window seconds.
+    """
+
+    def __init__(self, window: float = 10):
+        self._seen = OrderedDict()
+        self._window = window
+
+    def isDuplicate(self, key, pkt: bytes) -> bool:
+        """Returns True if pkt is a retransmission. Remembers pkt otherwise."""
+        now = time.monotonic()
+        # Forget packets older than the window. Kept in order received.
+        while self._seen:
+            oldest = next(iter(self._seen))
+            if now - self._seen[oldest][1] <= self._window:
+                break
+            del self._seen[oldest]
+        previous = self._seen.get(key)
+        if previous is not None and previous[0] == pkt:
+            return True
+        self._seen.pop(key, None)
+        self._seen[key] = (bytes(pkt), now)
+        return False
 
 
 class Listenable:
@@ -194,10 +313,84 @@ class MessageWaiter:
         if not session:
             session = self.addWaitingSession(msgType)
         try:
-            await asyncio.wait_for(session, timeout)
+            await timerWheel().waitFor(session, timeout)
         except asyncio.TimeoutError:
             _LOGGER.warning("Timeout waiting for message %s", msgType)
             raise
         finally:
             self._sessions.pop(msgType.hid(), None)
         return session.result()
+
+
+class SequenceAllocation:
+    """
+    Async context manager returned by :meth:`SequenceAllocator.allocate`. Acquires
+    a sequence number on enter and releases it on exit.
+    """
+
+    __slots__ = ("_allocator", "_seqNo")
+
+    def __init__(self, allocator: "SequenceAllocator"):
+        self._allocator = allocator
+        self._seqNo = None
+
+    async def __aenter__(self) -> int:
+        self._seqNo = await self._allocator.acquire()
+        return self._seqNo
+
+    async def __aexit__(self, excType, exc, traceback):
+        self._allocator.release(self._seqNo)
+
+
+class SequenceAllocator:
+    """
+    Hands out 8 bit sequence numbers. Numbers still in use are skipped so two
+    messages in flight never share a sequence number. If all numbers are in use
+    acquire() waits until one is released.
+    """
+
+    def __init__(self, size: int = 256):
+        self._inUse = set()
+        self._next = 1 % size
+        self._size = size
+        self._waiters = deque()
+
+    def __contains__(self, seqNo: int) -> bool:
+        return seqNo in self._inUse
+
+    def __len__(self) -> int:
+        return len(self._inUse)
+
+    async def acquire(self) -> int:
+        """Return the next free sequence number. Release it with release()"""
+        if len(self._inUse) < self._size and not self._waiters:
+            return self._take()
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append(future)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A number was handed to us just before we were cancelled
+                self.release(future.result())
+            raise
+
+    def allocate(self) -> "SequenceAllocation":
+        """Context manager holding a sequence number for the duration of the block"""
+        return SequenceAllocation(self)
+
+    def release(self, seqNo: int):
+        """Return a sequence number to the pool"""
+        self._inUse.discard(seqNo)
+        while self._waiters and len(self._inUse) < self._size:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(self._take())
+
+    def _take(self) -> int:
+        seqNo = self._next
+        while seqNo in self._inUse:
+            seqNo = (seqNo + 1) % self._size
+        self._inUse.add(seqNo)
+        self._next = (seqNo + 1) % self._size
+        return seqNo
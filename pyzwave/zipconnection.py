@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+from collections import deque
 import logging
 
 from pyzwave.message import Message
@@ -11,22 +12,124 @@ from pyzwave.commandclass import (
     ZipND,
 )
 from pyzwave.connection import Connection
-from .adapter import Adapter, TxOptions
+from .adapter import Ack, Adapter, TxOptions
+from .retry import QueuePause, RetryPolicy
+from .scheduler import AirtimeLimiter, routeAirtime
+from .timerwheel import timerWheel
 from .types import dsk_t
+from .util import DuplicateFilter, SequenceAllocator
 
 _LOGGER = logging.getLogger(__name__)
 
+# Default number of packets allowed to wait for an ack at the same time
+WINDOW = 4
+
+
+class SendWindow:
+    """
+    Limits the number of packets in flight. Unlike asyncio.Semaphore the slots are
+    strictly handed out in the order they were requested so packets are sent in the
+    same order send() was called.
+    """
+
+    def __init__(self, size: int = WINDOW):
+        self._inFlight = 0
+        self._size = max(size, 1)
+        self._waiters = deque()
+
+    async def acquire(self):
+        """Wait for a free slot in the window"""
+        if self._inFlight < self._size and not self._waiters:
+            self._inFlight += 1
+            return
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed to us just before we were cancelled
+                self.release()
+            raise
+
+    @property
+    def inFlight(self) -> int:
+        """Number of packets currently in flight"""
+        return self._inFlight
+
+    def release(self):
+        """Release a slot and hand it over to the next waiting sender"""
+        self._inFlight -= 1
+        self._wakeup()
+
+    @property
+    def size(self) -> int:
+        """Maximum number of packets in flight"""
+        return self._size
+
+    @size.setter
+    def size(self, size: int):
+        self._size = max(size, 1)
+        self._wakeup()
+
+    def _wakeup(self):
+        while self._waiters and self._inFlight < self._size:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._inFlight += 1
+            future.set_result(None)
+
 
 class ZIPConnection(Adapter):
-    """Class for connecting to a zipgateway or zipnode"""
+    """
+    Class for connecting to a zipgateway or zipnode.
+
+    Up to window packets may wait for an ack at the same time. Call send()
+    concurrently, for example using asyncio.gather(), to pipeline the packets.
+
+    Packets rejected with a nack are retransmitted according to retryPolicy. If the
+    gateway queue is full all connections sharing queuePause are paused.
 
-    def __init__(self, address, psk):
+    If airtimeLimiter is given every transmission, retransmissions included, is
+    charged with its estimated airtime before it is sent.
+
+    If secure is set the connection uses DTLS running in the event loop, see
+    :class:`pyzwave.dtlsprotocol.DTLSProtocol`. If a
+    :class:`pyzwave.dtlsconnection.DTLSMultiplexer` is given the connection instead
+    uses DTLS and its socket is read by the multiplexer.
+    """
+
+    def __init__(
+        self,
+        address,
+        psk,
+        window: int = WINDOW,
+        retryPolicy: RetryPolicy = None,
+        queuePause: QueuePause = None,
+        multiplexer=None,
+        secure: bool = False,
+        airtimeLimiter: AirtimeLimiter = None,
+    ):
         super().__init__()
-        self._seq = 0
+        self._seq = SequenceAllocator()
         self._address = address
+        self._airtimeLimiter = airtimeLimiter
+        self._duplicates = DuplicateFilter()
         self._keepAlive = None
+        self._lastWorkingRoute = None
         self._psk = psk
-        self._conn = Connection()
+        self._queuePause = queuePause or QueuePause()
+        self._retryPolicy = retryPolicy or RetryPolicy()
+        self._window = SendWindow(window)
+        if multiplexer:
+            # Imported here since dtls is only needed when multiplexing
+            # pylint: disable=import-outside-toplevel
+            from pyzwave import dtlsconnection
+
+            self._conn = dtlsconnection.DTLSConnection(multiplexer=multiplexer)
+        else:
+            self._conn = Connection(secure=secure)
         self._conn.onMessage(self.onPacket)
 
     async def addNode(self, txOptions: TxOptions) -> bool:
@@ -45,6 +148,18 @@ class ZIPConnection(Adapter):
     async def addNodeStop(self) -> bool:
         raise NotImplementedError()
 
+    @property
+    def busy(self) -> bool:
+        """Returns True if there are messages waiting for an ack or a response"""
+        return bool(self._ackQueue or self._sessions)
+
+    def close(self):
+        """Stop the keepalives and close the connection"""
+        if self._keepAlive:
+            self._keepAlive.cancel()
+            self._keepAlive = None
+        self._conn.stop()
+
     async def connect(self):
         await self._conn.connect(self._address, self._psk)
         self.resetKeepAlive()
@@ -70,55 +185,49 @@ class ZIPConnection(Adapter):
 
     def keepAlive(self):
         """Send a keepalive message"""
-        msg = Zip.ZipKeepAlive(ackRequest=True, ackResponse=False,)
-        self._conn.send(msg.compose())
+        self._conn.send(Zip.ZipKeepAlive.frame(True, False))
         self.resetKeepAlive()
 
+    @property
+    def lastWorkingRoute(self) -> Zip.IMELastWorkingRoute:
+        """
+        The last working route to the node as reported by the gateway, or None if
+        not yet known
+        """
+        return self._lastWorkingRoute
+
     def onPacket(self, pkt):
         """Called when a packed has recevied from the connection"""
         try:
-            zipPkt = Message.decode(pkt)
-        except Exception:
-            _LOGGER.error("Could not decode message. Raw message:")
-            _LOGGER.error("%s", pkt)
-            return False
+            # Only the Z/IP header is decoded here. The header extension and the
+            # encapsulated command are decoded when (and if) they are accessed
+            zipPkt = Message.decode(pkt, lazy=True)
+        except Exception:  # pylint: disable=broad-except
+            return self._decodeFailed(pkt)
         if isinstance(zipPkt, Zip.ZipPacket):
-            if zipPkt.ackResponse:
-                self.ackReceived(zipPkt)
-                return True
-            if zipPkt.nackResponse:
-                if zipPkt.nackWaiting:
-                    # Waiting: the preceding Z/IP Packet encapsulated Z-Wave Command is not yet
-                    # delivered to the destination and delivery will be attempted later on
-                    # Threat these as normal acks
-                    self.ackReceived(zipPkt)
-                    return True
-                _LOGGER.error("Nack response not implemented %s", zipPkt.debugString())
-                # self.nackReceived(zipPkt.seqNo)
-                return False
+            if zipPkt.ackResponse or zipPkt.nackResponse:
+                return self._handleResponse(zipPkt)
+            return self._handleCommand(zipPkt, pkt)
+        if isinstance(zipPkt, Zip.ZipKeepAlive):
             if zipPkt.ackRequest:
-                _LOGGER.error("This message needs an ack response. Not implemented")
-                return False
-            if zipPkt.zwCmdIncluded:
-                self.commandReceived(zipPkt)
-        elif isinstance(zipPkt, Zip.ZipKeepAlive):
-            if zipPkt.ackResponse:
-                # Ignore a response
-                return True
-            _LOGGER.error("This message needs an ack response. Not implemented")
-            return False
-        elif isinstance(zipPkt, ZipND.ZipNodeAdvertisement):
+                self._conn.send(Zip.ZipKeepAlive.frame(False, True))
+            return True
+        if isinstance(zipPkt, ZipND.ZipNodeAdvertisement):
             self.commandReceived(zipPkt)
-        else:
-            _LOGGER.warning("Received unknown Z/IP packet from zipgateway: %s", zipPkt)
-            return False
-        return True
+            return True
+        _LOGGER.warning("Received unknown Z/IP packet from zipgateway: %s", zipPkt)
+        return False
 
     @property
     def psk(self) -> bytes:
         """The psk used for the connection"""
         return self._psk
 
+    @property
+    def queuePause(self) -> QueuePause:
+        """The pause used when the gateway queue is full"""
+        return self._queuePause
+
     async def removeFailedNode(
         self, nodeId: int
     ) -> NetworkManagementInclusion.FailedNodeRemoveStatus.Status:
@@ -133,35 +242,145 @@ class ZIPConnection(Adapter):
     def resetKeepAlive(self):
         """Reset the keepalive timeout"""
         if self._keepAlive:
-            # Timer running, reset it
-            self._keepAlive.cancel()
-        self._keepAlive = asyncio.get_event_loop().call_later(25, self.keepAlive)
-
-    async def send(self, cmd, sourceEP=0, destEP=0, timeout=3) -> bool:
-        self._seq = (self._seq + 1) & 0xFF
-        msg = Zip.ZipPacket(
-            ackRequest=True,
-            ackResponse=False,
-            nackResponse=False,
-            nackWaiting=False,
-            nackQueueFull=False,
-            nackOptionError=False,
-            headerExtIncluded=False,
-            zwCmdIncluded=True,
-            moreInformation=False,
-            secureOrigin=True,
-            seqNo=self._seq,
-            sourceEP=sourceEP,
-            destEP=destEP,
-            command=cmd,
-        )
-        self._conn.send(msg.compose())
-        self.resetKeepAlive()
-        try:
-            await self.waitForAck(msg.seqNo, timeout=timeout)
-        except asyncio.TimeoutError:
-            return False
-        return True
+            # Timer already created, rearm it
+            self._keepAlive.reset(25)
+            return
+        self._keepAlive = timerWheel().callLater(25, self.keepAlive)
+
+    @property
+    def retryPolicy(self) -> RetryPolicy:
+        """The policy for retransmitting packets rejected with a nack"""
+        return self._retryPolicy
+
+    async def send(
+        self,
+        cmd,
+        sourceEP=0,
+        destEP=0,
+        timeout=3,
+        headerExtension=None,
+        payload: bytes = None,
+    ) -> bool:
+        """
+        Send cmd, retransmitting it if nacked. If the caller has already composed
+        the command it can be passed as payload to avoid composing it again.
+        """
+        if payload is None:
+            payload = cmd.compose()
+        attempt = 0
+        # Retransmissions keep the sequence number so the gateway can detect
+        # duplicates. Numbers still in use are skipped by the allocator.
+        async with self._seq.allocate() as seqNo:
+            while True:
+                await self._queuePause.wait()
+                status = await self._sendPacket(
+                    seqNo, payload, sourceEP, destEP, timeout, headerExtension
+                )
+                if status is None:
+                    # Timeout
+                    return False
+                if status == Ack.Status.OPTION_ERROR:
+                    _LOGGER.warning("Gateway did not accept the options for %s", cmd)
+                    return False
+                if status not in (Ack.Status.NACKED, Ack.Status.QUEUE_FULL):
+                    return True
+                if attempt >= self._retryPolicy.retries:
+                    _LOGGER.warning(
+                        "Giving up sending %s after %d retries", cmd, attempt
+                    )
+                    return False
+                delay = self._retryPolicy.delay(attempt)
+                attempt += 1
+                if status == Ack.Status.QUEUE_FULL:
+                    # Everything going through the gateway must wait
+                    self._queuePause.pause(delay)
+                else:
+                    await timerWheel().sleep(delay)
 
     async def setNodeInfo(self, generic, specific, cmdClasses):
         raise NotImplementedError()
+
+    @property
+    def window(self) -> int:
+        """Maximum number of packets waiting for an ack at the same time"""
+        return self._window.size
+
+    @window.setter
+    def window(self, size: int):
+        self._window.size = size
+
+    async def _acquireAirtime(self, payload: bytes, headerExtension):
+        # pylint: disable=unused-argument
+        if self._airtimeLimiter:
+            await self._airtimeLimiter.acquire(
+                routeAirtime(len(payload), self._lastWorkingRoute)
+            )
+
+    @staticmethod
+    def _decodeFailed(pkt) -> bool:
+        _LOGGER.error("Could not decode message. Raw message:")
+        _LOGGER.error("%s", pkt)
+        return False
+
+    def _handleCommand(self, zipPkt: Zip.ZipPacket, pkt) -> bool:
+        if zipPkt.ackRequest:
+            # Ack before processing so the gateway does not retransmit while we
+            # are busy. Ack retransmissions too, our first ack may have been lost.
+            self._conn.send(zipPkt.response(success=True).compose())
+        if self._duplicates.isDuplicate((zipPkt.sourceEP, zipPkt.seqNo), pkt):
+            _LOGGER.debug("Dropping retransmitted packet %d", zipPkt.seqNo)
+            return True
+        if zipPkt.zwCmdIncluded:
+            try:
+                zipPkt.resolveAttributes()
+            except Exception:  # pylint: disable=broad-except
+                return self._decodeFailed(pkt)
+            self.commandReceived(zipPkt)
+        return True
+
+    def _handleResponse(self, zipPkt: Zip.ZipPacket) -> bool:
+        if zipPkt.ackResponse:
+            if zipPkt.headerExtIncluded:
+                self._updateRoute(zipPkt)
+            self.ackReceived(zipPkt)
+        elif zipPkt.nackWaiting:
+            # Waiting: the preceding Z/IP Packet encapsulated Z-Wave Command is not yet
+            # delivered to the destination and delivery will be attempted later on
+            # Threat these as normal acks
+            self.ackReceived(zipPkt)
+        else:
+            self.nackReceived(zipPkt)
+        return True
+
+    async def _sendPacket(
+        self, seqNo: int, payload: bytes, sourceEP, destEP, timeout, headerExtension
+    ) -> Ack.Status:
+        """Send the packet once. Returns the ack status or None on timeout."""
+        await self._window.acquire()
+        try:
+            await self._acquireAirtime(payload, headerExtension)
+            self._conn.send(
+                Zip.ZipPacket.frame(
+                    seqNo,
+                    payload,
+                    sourceEP=sourceEP,
+                    destEP=destEP,
+                    headerExtension=headerExtension,
+                )
+            )
+            self.resetKeepAlive()
+            # Acks may arrive out of order, they are matched on the sequence number
+            return await self.waitForAck(seqNo, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._window.release()
+
+    def _updateRoute(self, zipPkt: Zip.ZipPacket):
+        try:
+            route = zipPkt.headerExtension.lastWorkingRoute
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.warning("Could not decode header extension in ack")
+            return
+        if route is not None:
+            self._lastWorkingRoute = route
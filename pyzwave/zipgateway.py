@@ -14,169 +14,232 @@ from pyzwave.commandclass import (
 )
 from pyzwave.adapter import TxOptions
 from pyzwave.connection import Connection
-from pyzwave.zipconnection import ZIPConnection
+from pyzwave.connectionpool import IDLE_TIMEOUT, MAX_SIZE, ConnectionPool
+from pyzwave.scheduler import (
+    AIRTIME_BUDGET,
+    MAX_ACTIVE,
+    AirtimeLimiter,
+    OutboundScheduler,
+    airtime,
+)
+from pyzwave.zipconnection import WINDOW, ZIPConnection
 from pyzwave.types import dsk_t
+from pyzwave.util import SequenceAllocator
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class ZIPGateway(ZIPConnection):
-    """Class for communicating with a zipgateway"""
-
-    def __init__(self, address, psk):
-        super().__init__(address, psk)
+    """
+    Class for communicating with a zipgateway.
+
+    At most maxConnections connections to nodes are kept open. Connections not used
+    for connectionIdleTimeout seconds are closed. The window is used both for the
+    gateway and the node connections.
+
+    Messages to the nodes are scheduled by priority, see :mod:`pyzwave.scheduler`.
+    At most maxActive messages to the nodes are in flight at the same time, at most
+    window of them to the same node, and they may use at most airtimeBudget of the
+    channel.
+
+    If secure is set the connections to the gateway and the nodes use DTLS running
+    in the event loop. If multiplexDtls is set the connections to the nodes instead
+    use DTLS and are all read from one shared thread, see
+    :class:`pyzwave.dtlsconnection.DTLSMultiplexer`.
+    """
+
+    def __init__(
+        self,
+        address,
+        psk,
+        maxConnections: int = MAX_SIZE,
+        connectionIdleTimeout: float = IDLE_TIMEOUT,
+        window: int = WINDOW,
+        maxActive: int = MAX_ACTIVE,
+        airtimeBudget: float = AIRTIME_BUDGET,
+        multiplexDtls: bool = False,
+        secure: bool = False,
+    ):
+        super().__init__(address, psk, window, secure=secure)
         self._unsolicitedConnection = Connection()
         self._unsolicitedConnection.onMessage(self.onUnsolicitedMessage)
-        self._connections = {}
+        self._connections = ConnectionPool(maxConnections, connectionIdleTimeout)
+        # Connections being opened, keyed by node id
+        self._connecting = {}
+        self._multiplexer = None
+        if multiplexDtls:
+            # pylint: disable=import-outside-toplevel
+            from pyzwave.dtlsconnection import DTLSMultiplexer
+
+            self._multiplexer = DTLSMultiplexer()
         self._nodes = {}
-        self._nmSeq = 0
+        self._secure = secure
+        self._nmSeq = SequenceAllocator()
+        # Let the scheduler fill the send window of the node connections
+        self._scheduler = OutboundScheduler(maxActive, maxActivePerNode=window)
+        self._airtime = AirtimeLimiter(airtimeBudget)
 
     async def addNode(self, txOptions: TxOptions) -> bool:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.NodeAdd(
-            seqNo=self._nmSeq,
-            mode=NetworkManagementInclusion.NodeAdd.Mode.ANY_S2,
-            txOptions=txOptions,
-        )
-        try:
-            # We do not get any immediate response
-            await self.send(cmd)
-        except asyncio.TimeoutError:
-            return False
-        return True
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.NodeAdd(
+                seqNo=seqNo,
+                mode=NetworkManagementInclusion.NodeAdd.Mode.ANY_S2,
+                txOptions=txOptions,
+            )
+            try:
+                # We do not get any immediate response
+                await self.send(cmd)
+            except asyncio.TimeoutError:
+                return False
+            return True
 
     async def addNodeDSKSet(
         self, accept: bool, inputDSKLength: int, dsk: dsk_t
     ) -> bool:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.NodeAddDSKSet(
-            seqNo=self._nmSeq, accept=accept, inputDSKLength=inputDSKLength, dsk=dsk,
-        )
-        try:
-            await self.send(cmd)
-        except asyncio.TimeoutError:
-            return False
-        return True
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.NodeAddDSKSet(
+                seqNo=seqNo, accept=accept, inputDSKLength=inputDSKLength, dsk=dsk,
+            )
+            try:
+                await self.send(cmd)
+            except asyncio.TimeoutError:
+                return False
+            return True
 
     async def addNodeKeysSet(
         self, grantCSA: bool, accept: bool, grantedKeys: NetworkManagementInclusion.Keys
     ) -> bool:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.NodeAddKeysSet(
-            seqNo=self._nmSeq,
-            grantCSA=grantCSA,
-            accept=accept,
-            grantedKeys=grantedKeys,
-        )
-        try:
-            await self.send(cmd)
-        except asyncio.TimeoutError:
-            return False
-        return True
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.NodeAddKeysSet(
+                seqNo=seqNo, grantCSA=grantCSA, accept=accept, grantedKeys=grantedKeys,
+            )
+            try:
+                await self.send(cmd)
+            except asyncio.TimeoutError:
+                return False
+            return True
 
     async def addNodeStop(self) -> bool:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.NodeAdd(
-            seqNo=self._nmSeq,
-            mode=NetworkManagementInclusion.NodeAdd.Mode.STOP,
-            txOptions=TxOptions.NULL,
-        )
-        try:
-            await self.send(cmd)
-        except asyncio.TimeoutError:
-            return False
-        return True
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.NodeAdd(
+                seqNo=seqNo,
+                mode=NetworkManagementInclusion.NodeAdd.Mode.STOP,
+                txOptions=TxOptions.NULL,
+            )
+            try:
+                await self.send(cmd)
+            except asyncio.TimeoutError:
+                return False
+            return True
+
+    @property
+    def airtimeLimiter(self) -> AirtimeLimiter:
+        """The limiter for the airtime used by messages sent to the nodes"""
+        return self._airtime
+
+    def close(self):
+        super().close()
+        if self._multiplexer:
+            self._multiplexer.stop()
 
     async def connect(self):
         await super().connect()
         await self.setGatewayMode(1)
         await self.setupUnsolicitedConnection()
 
-    async def connectToNode(self, nodeId) -> ZIPConnection:
-        """Returns a connection to the node"""
-        if nodeId in self._connections:
-            return self._connections[nodeId]
-
-        ipv6 = await self.ipOfNode(nodeId)
+    @property
+    def connectionPool(self) -> ConnectionPool:
+        """The pool holding the connections to the nodes"""
+        return self._connections
 
-        connection = ZIPConnection(ipv6.compressed, self.psk)
-        connection.addListener(self)
-        await connection.connect()
-        self._connections[nodeId] = connection
-        return connection
+    async def connectToNode(self, nodeId) -> ZIPConnection:
+        """
+        Returns a connection to the node. Concurrent calls for the same node share
+        one connection.
+        """
+        connection = self._connections.get(nodeId)
+        if connection is not None:
+            return connection
+        pending = self._connecting.get(nodeId)
+        if pending is None:
+            pending = asyncio.ensure_future(self._openConnection(nodeId))
+            self._connecting[nodeId] = pending
+            pending.add_done_callback(lambda _: self._connecting.pop(nodeId, None))
+        # Do not abort the connect for the other callers if this one is cancelled
+        return await asyncio.shield(pending)
 
     async def getFailedNodeList(self) -> list:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementProxy.FailedNodeListGet(seqNo=self._nmSeq,)
-        try:
-            report = await self.sendAndReceive(
-                cmd, NetworkManagementProxy.FailedNodeListReport
-            )
-        except asyncio.TimeoutError:
-            return set()
-        return report.failedNodeList
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementProxy.FailedNodeListGet(seqNo=seqNo,)
+            try:
+                report = await self.sendAndReceive(
+                    cmd, NetworkManagementProxy.FailedNodeListReport
+                )
+            except asyncio.TimeoutError:
+                return set()
+            return report.failedNodeList
 
     async def getMultiChannelEndPoints(self, nodeId: int) -> int:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementProxy.MultiChannelEndPointGet(
-            seqNo=self._nmSeq, nodeID=nodeId
-        )
-        try:
-            report = await self.sendAndReceive(
-                cmd, NetworkManagementProxy.MultiChannelEndPointReport
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementProxy.MultiChannelEndPointGet(
+                seqNo=seqNo, nodeID=nodeId
             )
-        except asyncio.TimeoutError:
-            # No response
-            return 0
-        return report.individualEndPoints + report.aggregatedEndPoints
+            try:
+                report = await self.sendAndReceive(
+                    cmd, NetworkManagementProxy.MultiChannelEndPointReport
+                )
+            except asyncio.TimeoutError:
+                # No response
+                return 0
+            return report.individualEndPoints + report.aggregatedEndPoints
 
     async def getMultiChannelCapability(
         self, nodeId: int, endpoint: int
     ) -> NetworkManagementProxy.MultiChannelCapabilityReport:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementProxy.MultiChannelCapabilityGet(
-            seqNo=self._nmSeq, nodeID=nodeId, endPoint=endpoint
-        )
-        try:
-            report = await self.sendAndReceive(
-                cmd, NetworkManagementProxy.MultiChannelCapabilityReport
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementProxy.MultiChannelCapabilityGet(
+                seqNo=seqNo, nodeID=nodeId, endPoint=endpoint
             )
-        except asyncio.TimeoutError:
-            # No response
-            return NetworkManagementProxy.MultiChannelCapabilityReport()
-        return report
+            try:
+                report = await self.sendAndReceive(
+                    cmd, NetworkManagementProxy.MultiChannelCapabilityReport
+                )
+            except asyncio.TimeoutError:
+                # No response
+                return NetworkManagementProxy.MultiChannelCapabilityReport()
+            return report
 
     async def getNodeList(self) -> set:
         if self._nodes:
             # Return cached list
             return set(self._nodes.keys())
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementProxy.NodeListGet(seqNo=self._nmSeq)
-        try:
-            report = await self.sendAndReceive(
-                cmd, NetworkManagementProxy.NodeListReport
-            )
-        except asyncio.TimeoutError:
-            # No response
-            return set()
-        self._nodeId = report.nodeListControllerId
-        self._nodes = {x: {} for x in report.nodes}
-        return report.nodes
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementProxy.NodeListGet(seqNo=seqNo)
+            try:
+                report = await self.sendAndReceive(
+                    cmd, NetworkManagementProxy.NodeListReport
+                )
+            except asyncio.TimeoutError:
+                # No response
+                return set()
+            self._nodeId = report.nodeListControllerId
+            self._nodes = {x: {} for x in report.nodes}
+            return report.nodes
 
     async def getNodeInfo(
         self, nodeId: int
     ) -> NetworkManagementProxy.NodeInfoCachedReport:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementProxy.NodeInfoCachedGet(
-            seqNo=self._nmSeq, maxAge=15, nodeID=nodeId
-        )
-        try:
-            report = await self.sendAndReceive(
-                cmd, NetworkManagementProxy.NodeInfoCachedReport
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementProxy.NodeInfoCachedGet(
+                seqNo=seqNo, maxAge=15, nodeID=nodeId
             )
-        except asyncio.TimeoutError:
-            return NetworkManagementProxy.NodeInfoCachedReport()
-        return report
+            try:
+                report = await self.sendAndReceive(
+                    cmd, NetworkManagementProxy.NodeInfoCachedReport
+                )
+            except asyncio.TimeoutError:
+                return NetworkManagementProxy.NodeInfoCachedReport()
+            return report
 
     async def __handleNodeListReport__(
         self, report: NetworkManagementProxy.NodeListReport
@@ -206,43 +269,46 @@ class ZIPGateway(ZIPConnection):
     async def removeFailedNode(
         self, nodeId: int
     ) -> NetworkManagementInclusion.FailedNodeRemoveStatus.Status:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.FailedNodeRemove(
-            seqNo=self._nmSeq, nodeID=nodeId
-        )
-        try:
-            # The timeout might need to be increased. The Z-Wave may need to query the
-            # network for a response first and this may take time on a large network
-            report = await self.sendAndReceive(
-                cmd, NetworkManagementInclusion.FailedNodeRemoveStatus, timeout=10
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.FailedNodeRemove(
+                seqNo=seqNo, nodeID=nodeId
             )
-        except asyncio.TimeoutError:
+            try:
+                # The timeout might need to be increased. The Z-Wave may need to query
+                # the network for a response first and this may take time on a large
+                # network
+                report = await self.sendAndReceive(
+                    cmd, NetworkManagementInclusion.FailedNodeRemoveStatus, timeout=10
+                )
+            except asyncio.TimeoutError:
+                report = None
+        if report is None:
             return NetworkManagementInclusion.FailedNodeRemoveStatus.Status.REMOVE_FAIL
         return report.status
 
     async def removeNode(self) -> bool:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.NodeRemove(
-            seqNo=self._nmSeq, mode=NetworkManagementInclusion.NodeRemove.Mode.ANY
-        )
-        try:
-            # We do not get any immediate response
-            await self.send(cmd)
-        except asyncio.TimeoutError:
-            return False
-        return True
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.NodeRemove(
+                seqNo=seqNo, mode=NetworkManagementInclusion.NodeRemove.Mode.ANY
+            )
+            try:
+                # We do not get any immediate response
+                await self.send(cmd)
+            except asyncio.TimeoutError:
+                return False
+            return True
 
     async def removeNodeStop(self) -> bool:
-        self._nmSeq = self._nmSeq + 1
-        cmd = NetworkManagementInclusion.NodeRemove(
-            seqNo=self._nmSeq, mode=NetworkManagementInclusion.NodeRemove.Mode.STOP
-        )
-        try:
-            # We do not get any immediate response
-            await self.send(cmd)
-        except asyncio.TimeoutError:
-            return False
-        return True
+        async with self._nmSeq.allocate() as seqNo:
+            cmd = NetworkManagementInclusion.NodeRemove(
+                seqNo=seqNo, mode=NetworkManagementInclusion.NodeRemove.Mode.STOP
+            )
+            try:
+                # We do not get any immediate response
+                await self.send(cmd)
+            except asyncio.TimeoutError:
+                return False
+            return True
 
     def onMessageReceived(self, connection: ZIPConnection, message: Message):
         """Called when a message is received from any node connection. Not unsolicited."""
@@ -253,6 +319,7 @@ class ZIPGateway(ZIPConnection):
         for nodeId, nodeConnection in self._connections.items():
             if connection != nodeConnection:
                 continue
+            self._connections.touch(nodeId)
             flags = 0  # Set flags such as encapsulation type
             self.speak("messageReceived", nodeId, sourceEP, message, flags)
             return
@@ -263,11 +330,16 @@ class ZIPGateway(ZIPConnection):
         Called when an unsolicited message is received.
         We do not know the node id the message is from. Only the ip address.
         """
-        zipPkt = Message.decode(pkt)
+        # Decode lazily so frames from unknown senders are dropped without decoding
+        # the encapsulated command
+        zipPkt = Message.decode(pkt, lazy=True)
         sourceIp = ipaddress.IPv6Address(address[0])
         sourceEP = zipPkt.sourceEP
+        commandHid = (
+            zipPkt.commandHid() if isinstance(zipPkt, Zip.ZipPacket) else zipPkt.hid()
+        )
 
-        if isinstance(zipPkt.command, NetworkManagementProxy.NodeListReport):
+        if commandHid == NetworkManagementProxy.NodeListReport.hid():
             return asyncio.ensure_future(self.__handleNodeListReport__(zipPkt.command))
 
         # Find the node this was from
@@ -278,6 +350,9 @@ class ZIPGateway(ZIPConnection):
                 # This message needs an ack response.
                 ackReponse = zipPkt.response(success=True)
                 self._unsolicitedConnection.sendTo(ackReponse.compose(), address)
+            if self._duplicates.isDuplicate((sourceIp, zipPkt.seqNo), pkt):
+                _LOGGER.debug("Dropping retransmitted packet from %s", sourceIp)
+                return True
 
             self.speak(
                 "messageReceived",
@@ -288,13 +363,32 @@ class ZIPGateway(ZIPConnection):
             )
             return True
         _LOGGER.warning(
-            "Got message from unknown sender %s: %s", sourceIp, zipPkt.command
+            "Got message from unknown sender %s: 0x%04X", sourceIp, commandHid
         )
         return False
 
+    @property
+    def scheduler(self) -> OutboundScheduler:
+        """The scheduler for messages sent to the nodes"""
+        return self._scheduler
+
+    async def sendMulticast(self, nodeIds: set, cmd: Message, **kwargs) -> bool:
+        headerExtension = Zip.HeaderExtension()
+        headerExtension[
+            Zip.ZIPPacketOptionType.ZWAVE_MULTICAST_ADDRESSING
+        ] = Zip.ZIPPacketOptionMulticastAddressing(nodeIds)
+        payload = cmd.compose()
+        # Waits until all the nodes are free, like messages to each of them
+        async with self._scheduler.slot(frozenset(nodeIds)):
+            return await self.send(
+                cmd, headerExtension=headerExtension, payload=payload, **kwargs
+            )
+
     async def sendToNode(self, nodeId: int, cmd: Message, **kwargs) -> bool:
-        conn = await self.connectToNode(nodeId)
-        return await conn.send(cmd, **kwargs)
+        payload = cmd.compose()
+        async with self._scheduler.slot(nodeId):
+            conn = await self.connectToNode(nodeId)
+            return await conn.send(cmd, payload=payload, **kwargs)
 
     async def setGatewayMode(self, mode: int, timeout: int = 3) -> bool:
         """Set gateway to standalone or portal mode"""
@@ -330,3 +424,36 @@ class ZIPGateway(ZIPConnection):
         for nodeId in await self.getNodeList():
             if not self._nodes[nodeId].get("ip"):
                 self._nodes[nodeId] = {"ip": await self.ipOfNode(nodeId)}
+
+    @property
+    def supportsMulticast(self) -> bool:
+        return True
+
+    async def _acquireAirtime(self, payload: bytes, headerExtension):
+        # Messages to the gateway itself are not sent to the network
+        if headerExtension and headerExtension.multicastAddressing:
+            # One transmission reaches all the nodes
+            await self._airtime.acquire(airtime(len(payload)))
+
+    async def _openConnection(self, nodeId) -> ZIPConnection:
+        ipv6 = await self.ipOfNode(nodeId)
+
+        # Node messages go through the gateway queue, share its pause
+        connection = ZIPConnection(
+            ipv6.compressed,
+            self.psk,
+            self.window,
+            retryPolicy=self.retryPolicy,
+            queuePause=self.queuePause,
+            multiplexer=self._multiplexer,
+            secure=self._secure,
+            airtimeLimiter=self._airtime,
+        )
+        connection.addListener(self)
+        await connection.connect()
+        if nodeId in self._connections:
+            # Added to the pool while connecting. Keep it, it may be in use.
+            connection.close()
+            return self._connections[nodeId]
+        self._connections[nodeId] = connection
+        return connection
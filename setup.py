@@ -25,7 +25,8 @@ setup(
         "Programming Language :: Python :: 3",
         "Topic :: Home Automation",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
+    entry_points={"console_scripts": ["pyzwave-capture=pyzwave.capture:main"]},
     project_urls={
         "Documentation": "https://pyzwave.readthedocs.io",
         "Source": "http://github.com/pyzwave/pyzwave",
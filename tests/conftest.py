@@ -5,3 +5,26 @@ import sys
 
 # We need to mock away dtls since this may segfault if not patched
 sys.modules["dtls"] = __import__("mock_dtls")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "codec benchmarks (tests/test_benchmark.py)")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="Run the codec benchmarks and compare them to the stored baseline",
+    )
+    group.addoption(
+        "--benchmark-save",
+        action="store_true",
+        default=False,
+        help="Run the codec benchmarks and store the result as the new baseline",
+    )
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=0.25,
+        help="Allowed increase in memory per message compared to the baseline "
+        "(default 0.25 = 25%%)",
+    )
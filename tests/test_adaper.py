@@ -7,7 +7,7 @@ import asyncio
 from unittest.mock import MagicMock
 import pytest
 
-from pyzwave.adapter import Adapter, TxOptions
+from pyzwave.adapter import Ack, Adapter, TxOptions
 from pyzwave.commandclass import (
     Basic,
     NetworkManagementInclusion,
@@ -91,9 +91,10 @@ async def runDelayed(func, *args):
 
 @pytest.mark.asyncio
 async def test_ack(adapter: Adapter):
-    await asyncio.gather(
+    [status, _] = await asyncio.gather(
         adapter.waitForAck(1), runDelayed(adapter.ackReceived, Zip.ZipPacket(seqNo=1))
     )
+    assert status == Ack.Status.RECEIVED
 
 
 @pytest.mark.asyncio
@@ -219,6 +220,30 @@ async def test_nack_waiting(adapter: Adapter):
     await asyncio.gather(adapter.waitForAck(1), sendAck())
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "queueFull,optionError,status",
+    [
+        (False, False, Ack.Status.NACKED),
+        (True, False, Ack.Status.QUEUE_FULL),
+        (False, True, Ack.Status.OPTION_ERROR),
+    ],
+)
+async def test_nackReceived(adapter: Adapter, queueFull, optionError, status):
+    nack = Zip.ZipPacket(
+        nackResponse=True,
+        nackQueueFull=queueFull,
+        nackOptionError=optionError,
+        seqNo=1,
+    )
+    [result, _] = await asyncio.gather(
+        adapter.waitForAck(1), runDelayed(adapter.nackReceived, nack)
+    )
+    assert result == status
+    assert adapter._ackQueue == {}  # pylint: disable=protected-access
+    assert adapter.nackReceived(nack) is False
+
+
 def test_nodeId(adapter: Adapter):
     assert adapter.nodeId == 1
     adapter.nodeId = 2
@@ -262,6 +287,13 @@ async def test_sendAndReceive(adapter: Adapter):
     assert isinstance(values[0], Basic.Report)
 
 
+@pytest.mark.asyncio
+async def test_sendMulticast(adapter: Adapter):
+    assert adapter.supportsMulticast is False
+    with pytest.raises(NotImplementedError):
+        await adapter.sendMulticast({2, 3}, Basic.Get())
+
+
 @pytest.mark.asyncio
 async def test_sendToNode(adapter: Adapter):
     with pytest.raises(NotImplementedError):
@@ -14,7 +14,8 @@ from pyzwave.commandclass import (
     Zip,
 )
 from pyzwave.const.ZW_classcmd import COMMAND_CLASS_MULTI_CHANNEL_V2
-from pyzwave.node import Node
+from pyzwave.node import Node, NodeEndPoint
+from pyzwave.scheduler import Priority, currentPriority
 
 from test_adaper import AdapterImpl
 
@@ -149,6 +150,83 @@ async def test_onMessageReceived(app: Application):
     assert await app.onMessageReceived(None, Zip.ZipPacket()) is False
 
 
+@pytest.fixture
+def multicastApp(app: Application, monkeypatch) -> Application:
+    monkeypatch.setattr(AdapterImpl, "supportsMulticast", True)
+    adapter = app.adapter
+    app._nodes = {
+        "2:0": Node(2, adapter, []),
+        "3:0": Node(3, adapter, []),
+        "4:0": Node(4, adapter, []),
+    }
+    app._nodes["3:1"] = NodeEndPoint(app._nodes["3:0"], 1, adapter, [])
+    adapter.multicasts = []
+    adapter.singlecasts = []
+
+    async def sendMulticast(nodeIds, _cmd, destEP=0, **_kwargs):
+        adapter.multicasts.append((nodeIds, destEP))
+        return True
+
+    async def sendToNode(nodeId, _cmd, destEP=0, **_kwargs):
+        adapter.singlecasts.append(("{}:{}".format(nodeId, destEP), currentPriority()))
+        return True
+
+    adapter.sendMulticast = sendMulticast
+    adapter.sendToNode = sendToNode
+    return app
+
+
+@pytest.mark.asyncio
+async def test_sendMulticast(multicastApp: Application):
+    adapter = multicastApp.adapter
+    nodes = multicastApp.nodes
+    results = await multicastApp.sendMulticast(
+        ["2:0", nodes["3:0"], "4:0", "3:1"], Basic.Set(value=0), followUp=False
+    )
+    assert results == {2: True, 3: True, 4: True}
+    assert adapter.multicasts == [({2, 3, 4}, 0)]
+    # A single destination for an endpoint is sent as singlecast
+    assert adapter.singlecasts == [("3:1", Priority.INTERACTIVE)]
+
+
+@pytest.mark.asyncio
+async def test_sendMulticast_endpointFailed(multicastApp: Application):
+    async def sendToNode(_nodeId, _cmd, destEP=0, **_kwargs):
+        return destEP == 0
+
+    multicastApp.adapter.sendToNode = sendToNode
+    results = await multicastApp.sendMulticast(
+        ["2:0", "3:0", "3:1"], Basic.Set(value=0), followUp=False
+    )
+    # One of the endpoints of node 3 failed
+    assert results == {2: True, 3: False}
+
+
+@pytest.mark.asyncio
+async def test_sendMulticast_followUp(multicastApp: Application):
+    adapter = multicastApp.adapter
+    results = await multicastApp.sendMulticast(["2:0", "4:0"], Basic.Set(value=0))
+    assert results == {2: True, 4: True}
+    assert adapter.multicasts == [({2, 4}, 0)]
+    assert adapter.singlecasts == [
+        ("2:0", Priority.MAINTENANCE),
+        ("4:0", Priority.MAINTENANCE),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sendMulticast_unsupported(multicastApp: Application, monkeypatch):
+    adapter = multicastApp.adapter
+    monkeypatch.setattr(AdapterImpl, "supportsMulticast", False)
+    results = await multicastApp.sendMulticast(["2:0", "4:0"], Basic.Set(value=0))
+    assert results == {2: True, 4: True}
+    assert adapter.multicasts == []
+    assert adapter.singlecasts == [
+        ("2:0", Priority.INTERACTIVE),
+        ("4:0", Priority.INTERACTIVE),
+    ]
+
+
 def test_setNodeInfo(app: Application):
     # Not implemented yet
     app.setNodeInfo(0, 0, [])
@@ -0,0 +1,192 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+# pylint: disable=redefined-outer-name
+"""
+Codec benchmarks for every registered message. These are skipped by default.
+
+Run and compare with the stored baseline:
+    python -m pytest tests/test_benchmark.py --benchmark -s
+Store a new baseline after an intentional change:
+    python -m pytest tests/test_benchmark.py --benchmark-save
+
+Only the memory allocated per message is checked against the baseline. The
+timings depend on the host and its load so they are only reported.
+
+The allocations differ between Python versions, the baseline is only compared
+when running the version it was stored with. Store it with the Python version
+used by the CI.
+"""
+
+import json
+import math
+import os
+import sys
+import timeit
+import tracemalloc
+
+import pytest
+
+from pyzwave.commandclass import ZWaveMessage, loadAll
+from pyzwave.message import Message
+
+BASELINE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+PYTHON = "{}.{}".format(*sys.version_info[:2])
+# Number of messages kept alive when measuring the memory per message
+ALLOC_SAMPLES = 100
+REPEAT = 3
+# Minimum time in seconds for each timing run
+MIN_TIME = 0.02
+
+
+def representativeFrame(hid: int) -> bytes:
+    """
+    Return the shortest frame (with a fixed payload pattern) that decodes and
+    encodes back to itself. Falls back to the longest frame that could be decoded.
+    """
+    header = bytes((hid >> 8, hid & 0xFF))
+    fallback = header
+    for length in range(0, 48):
+        frame = header + bytes((i * 37 + 1) & 0xFF for i in range(length))
+        try:
+            msg = Message.decode(frame)
+            msg.resolveAttributes()
+        except Exception:  # pylint: disable=broad-except
+            continue
+        fallback = frame
+        try:
+            if msg.compose() == frame:
+                return frame
+        except Exception:  # pylint: disable=broad-except
+            pass
+    return fallback
+
+
+def messages():
+    loadAll()
+    return sorted(
+        (hid, cls)
+        for hid, cls in ZWaveMessage.items()
+        if cls.__module__.startswith("pyzwave.")
+    )
+
+
+def timePerOp(func) -> float:
+    """Best time of REPEAT runs in nanoseconds per call"""
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 4
+    return min(timer.repeat(REPEAT, number)) / number * 1e9
+
+
+def allocatedPerMessage(frame: bytes) -> float:
+    """Bytes allocated (and kept) by one decoded message"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        keep = [Message.decode(frame) for _ in range(ALLOC_SAMPLES)]
+        for msg in keep:
+            msg.resolveAttributes()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # The list itself is not part of the message
+    return (size - sys.getsizeof(keep)) / ALLOC_SAMPLES
+
+
+def benchmark(frame: bytes) -> dict:
+    def decode():
+        Message.decode(frame).resolveAttributes()
+
+    result = {
+        "frame": frame.hex(),
+        "decode": timePerOp(decode),
+        "alloc": allocatedPerMessage(frame),
+    }
+    msg = Message.decode(frame)
+    try:
+        roundtrip = msg.compose() == frame
+    except Exception:  # pylint: disable=broad-except
+        roundtrip = False
+    if roundtrip:
+        result["encode"] = timePerOp(msg.compose)
+        result["roundtrip"] = timePerOp(lambda: Message.decode(frame).compose())
+    return result
+
+
+@pytest.fixture(scope="module")
+def results(request):
+    config = request.config
+    if not config.getoption("--benchmark") and not config.getoption("--benchmark-save"):
+        pytest.skip("Benchmarks are only run with --benchmark or --benchmark-save")
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as fd:
+            baseline = json.load(fd)
+    current = {}
+    yield baseline, current
+    if config.getoption("--benchmark-save"):
+        with open(BASELINE, "w") as fd:
+            json.dump(
+                {"python": PYTHON, "messages": current}, fd, indent=2, sort_keys=True
+            )
+            fd.write("\n")
+
+
+@pytest.mark.parametrize(
+    "hid,cls",
+    messages(),
+    ids=lambda v: "0x{:04X}".format(v) if isinstance(v, int) else v.__qualname__,
+)
+def test_codec(results, request, hid, cls):
+    baseline, current = results
+    key = "0x{:04X}".format(hid)
+    frame = representativeFrame(hid)
+    assert isinstance(Message.decode(frame), cls)
+    result = benchmark(frame)
+    current[key] = {
+        name: round(value, 1) if isinstance(value, float) else value
+        for name, value in result.items()
+    }
+    if request.config.getoption("--benchmark-save"):
+        return
+    stored = comparableBaseline(request, baseline).get(key)
+    if stored is None or stored["frame"] != result["frame"]:
+        pytest.skip("No baseline for this message")
+    # Allocations are stable enough to compare per message, timings are reported
+    # for all messages together in test_throughput()
+    limit = stored["alloc"] * (1 + request.config.getoption("--benchmark-threshold"))
+    assert (
+        result["alloc"] <= limit
+    ), "{} allocates {:.0f} bytes, baseline {:.0f}".format(
+        cls.__qualname__, result["alloc"], stored["alloc"]
+    )
+
+
+def test_throughput(results, request):
+    # Report only, the timings are not comparable between hosts or even runs
+    baseline, current = results
+    stored = comparableBaseline(request, baseline)
+    for name in ("decode", "encode", "roundtrip"):
+        ratios = [
+            current[key][name] / stored[key][name]
+            for key in current
+            if key in stored
+            and name in stored[key]
+            and name in current[key]
+            and stored[key]["frame"] == current[key]["frame"]
+        ]
+        if not ratios:
+            continue
+        # Geometric mean of the change for all messages
+        ratio = math.exp(sum(math.log(ratio) for ratio in ratios) / len(ratios))
+        print("{}: {:.1%} of baseline ({} messages)".format(name, ratio, len(ratios)))
+
+
+def comparableBaseline(request, baseline) -> dict:
+    if request.config.getoption("--benchmark-save"):
+        pytest.skip("Storing new baseline")
+    if baseline.get("python") != PYTHON:
+        pytest.skip("Baseline was stored with Python {}".format(baseline.get("python")))
+    return baseline["messages"]
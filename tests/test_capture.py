@@ -0,0 +1,89 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+
+import io
+
+import pytest
+
+from pyzwave import capture
+from pyzwave.commandclass import Basic, NetworkManagementProxy, Zip
+from pyzwave.message import Message
+
+CAPTURE = """# timestamp frame
+1582289938.5 2302805002000052 0102
+1582289939.0 2002
+
+1582289939.5 2003ff
+1582289940.0 2302
+"""
+
+
+@pytest.fixture
+def captureFile(tmp_path):
+    path = tmp_path / "capture.txt"
+    path.write_text(CAPTURE * 50)
+    return path
+
+
+def test_parseCaptureLine():
+    assert capture.parseCaptureLine("# comment") is None
+    assert capture.parseCaptureLine("  \n") is None
+    assert capture.parseCaptureLine("2001\n") == (None, b"\x20\x01")
+    assert capture.parseCaptureLine(b"1.5 20 01\n") == (1.5, b"\x20\x01")
+    # Spaced hex without a timestamp
+    assert capture.parseCaptureLine("20 01") == (None, b"\x20\x01")
+    with pytest.raises(ValueError):
+        capture.parseCaptureLine("1.5 2g")
+
+
+def test_readCapture_malformed():
+    with pytest.raises(ValueError, match="line 2"):
+        list(capture.readCapture(io.StringIO("2001\nxx yy\n")))
+
+
+def test_decodeMany():
+    msgs = list(Message.decodeMany([b"\x20\x02", b"\x20\x03\xff"]))
+    assert isinstance(msgs[0], Basic.Get)
+    assert isinstance(msgs[1], Basic.Report)
+    assert msgs[1].value == 0xFF
+
+
+def test_decodeMany_capture(captureFile):
+    msgs = Message.decodeMany(str(captureFile), lazy=True)
+    timestamp, msg = next(msgs)
+    assert timestamp == 1582289938.5
+    assert isinstance(msg, Zip.ZipPacket)
+    assert isinstance(msg.command, NetworkManagementProxy.NodeListGet)
+    assert len(list(msgs)) == 50 * 4 - 1
+
+
+def test_decodeMany_fileobj():
+    msgs = list(Message.decodeMany(io.StringIO(CAPTURE)))
+    assert [ts for ts, _ in msgs] == [
+        1582289938.5,
+        1582289939.0,
+        1582289939.5,
+        1582289940.0,
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_analyze(captureFile, jobs):
+    # Small chunks to make sure frames on chunk borders are counted exactly once
+    stats = capture.analyze(captureFile, jobs=jobs, chunkSize=37)
+    assert stats.frames == 200
+    assert stats.errors == 0
+    assert stats.commands[NetworkManagementProxy.NodeListGet.hid()] == 50
+    assert stats.commands[Basic.Get.hid()] == 50
+    assert stats.commands[Basic.Report.hid()] == 50
+    assert stats.commands[Zip.ZipPacket.hid()] == 50
+    assert stats.cmdClasses()[0x20] == 100
+    assert stats.firstTimestamp == 1582289938.5
+    assert stats.lastTimestamp == 1582289940.0
+
+
+def test_main(captureFile, capsys):
+    assert capture.main(["--jobs", "1", str(captureFile)]) == 0
+    out = capsys.readouterr().out
+    assert "Frames: 200" in out
+    assert "BASIC" in out
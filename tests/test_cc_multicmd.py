@@ -0,0 +1,121 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+# pylint: disable=protected-access
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pyzwave.commandclass import Basic, MultiCmd
+from pyzwave.message import Message
+from pyzwave.types import BitStreamReader
+
+from test_commandclass import MockNode
+
+
+def test_encap():
+    encap = MultiCmd.Encap(commands=[Basic.Get(), Basic.Set(value=0xFF)],)
+    pkt = encap.compose()
+    assert pkt == b"\x8f\x01\x02\x02\x20\x02\x03\x20\x01\xff"
+    msg = Message.decode(pkt)
+    assert isinstance(msg, MultiCmd.Encap)
+    assert len(msg.commands) == 2
+    assert isinstance(msg.commands[0], Basic.Get)
+    assert msg.commands[1] == Basic.Set(value=0xFF)
+    assert msg.__getstate__() == {"commands": [{}, {"value": 0xFF}]}
+
+
+def test_commands_default():
+    first = MultiCmd.Encap()
+    second = MultiCmd.Encap()
+    first.commands.append(Basic.Get())
+    assert second.commands == []
+    assert MultiCmd.Encap().compose() == b"\x8f\x01\x00"
+
+
+def test_commands_deserialize():
+    stream = BitStreamReader(b"\x01\x03\x20\x03\x10")
+    commands = MultiCmd.Commands.deserialize(stream)
+    assert commands == [Basic.Report(value=0x10)]
+
+
+def test_pack():
+    commands = [Basic.Set(value=i) for i in range(5)]
+    # Header of 3 bytes plus two commands of 1 + 3 bytes each
+    frames = MultiCmd.Batch.pack(commands, maxPayload=11)
+    assert len(frames) == 3
+    assert frames[0].commands == commands[0:2]
+    assert frames[1].commands == commands[2:4]
+    # A single command is sent without encapsulation
+    assert frames[2] is commands[4]
+    assert all(len(frame.compose()) <= 11 for frame in frames)
+    assert MultiCmd.Batch.pack([]) == []
+
+
+def test_pack_composes_once():
+    commands = [Basic.Set(value=i) for i in range(3)]
+    with patch.object(
+        Basic.Set, "compose", autospec=True, side_effect=Message.compose
+    ) as compose:
+        [frame] = MultiCmd.Batch.pack(commands)
+        assert frame.compose() == (
+            b"\x8f\x01\x03\x03\x20\x01\x00\x03\x20\x01\x01\x03\x20\x01\x02"
+        )
+        assert compose.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_maxPayload():
+    node = MockNode([MultiCmd.COMMAND_CLASS_MULTI_CMD])
+    async with node.batch(maxPayload=7) as batch:
+        batch.add(Basic.Set(value=1))
+        batch.add(Basic.Set(value=2))
+    # Too large to share a frame
+    assert node._sent == [Basic.Set(value=1), Basic.Set(value=2)]
+
+
+@pytest.mark.asyncio
+async def test_batch():
+    node = MockNode([MultiCmd.COMMAND_CLASS_MULTI_CMD])
+    async with node.batch() as batch:
+        batch.add(Basic.Set(value=1))
+        batch.add(Basic.Get())
+        assert len(batch) == 2
+    assert len(batch) == 0
+    assert node._sent == [
+        MultiCmd.Encap(commands=[Basic.Set(value=1), Basic.Get()]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_unsupported():
+    # Commands are sent one by one to nodes not supporting multi command
+    node = MockNode([])
+    batch = node.batch()
+    batch.add(Basic.Set(value=1))
+    batch.add(Basic.Get())
+    await batch.flush()
+    assert node._sent == [Basic.Set(value=1), Basic.Get()]
+
+
+@pytest.mark.asyncio
+async def test_batch_exception():
+    node = MockNode([MultiCmd.COMMAND_CLASS_MULTI_CMD])
+    with pytest.raises(ValueError):
+        async with node.batch() as batch:
+            batch.add(Basic.Set(value=1))
+            raise ValueError()
+    assert node._sent == []
+
+
+@pytest.mark.asyncio
+async def test_handle_encap():
+    node = MockNode([MultiCmd.COMMAND_CLASS_MULTI_CMD])
+    listener = MagicMock()
+    listener.onMessage.return_value = True
+    node.addListener(listener)
+    encap = MultiCmd.Encap(commands=[Basic.Report(value=1), Basic.Report(value=2)])
+    assert await node.handleMessage(encap, 0) is True
+    assert [call[0][1] for call in listener.onMessage.call_args_list] == [
+        Basic.Report(value=1),
+        Basic.Report(value=2),
+    ]
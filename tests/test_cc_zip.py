@@ -4,9 +4,9 @@
 # pylint: disable=singleton-comparison
 
 import pytest
-from pyzwave.commandclass import NetworkManagementProxy, Zip
+from pyzwave.commandclass import Basic, NetworkManagementProxy, Zip
 from pyzwave.message import Message
-from pyzwave.types import BitStreamReader
+from pyzwave.types import BitStreamReader, BitStreamWriter
 
 
 def test_zip_packet_networkmanagementproxt_nodelistget():
@@ -51,6 +51,30 @@ def test_zip_packet_networkmanagementproxt_nodelistreport():
     assert type(msg.command) is NetworkManagementProxy.NodeListReport
 
 
+def test_zip_packet_lazy():
+    # pylint: disable=line-too-long
+    pkt = b"#\x02\x00\xd0`\x00\x00\x05\x84\x02\x04\x00R\x02\x01\x00\x01!\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    msg = Message.decode(pkt, lazy=True)
+    assert msg.seqNo == 96
+    assert msg.headerExtIncluded == True
+    assert msg._lazy is not None
+    assert msg.commandHid() == NetworkManagementProxy.NodeListReport.hid()
+    assert msg._lazy is not None
+    assert type(msg.command) is NetworkManagementProxy.NodeListReport
+    assert msg._lazy is None
+    assert msg.headerExtension.get(
+        Zip.ZIPPacketOptionType.ENCAPSULATION_FORMAT_INFORMATION
+    )
+    assert msg.commandHid() == NetworkManagementProxy.NodeListReport.hid()
+    assert msg.command.nodes == {1, 6}
+
+
+def test_zip_packet_lazy_compose():
+    pkt = b"#\x02\x80P\x02\x00\x00R\x01\x02"
+    msg = Message.decode(pkt, lazy=True)
+    assert msg.compose() == pkt
+
+
 def test_zip_packet_response():
     # pylint: disable=line-too-long
     pkt = b"#\x02\x00\xd0`\x00\x00\x05\x84\x02\x04\x00R\x02\x01\x00\x01!\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
@@ -93,3 +117,154 @@ def test_zip_packet_ima(header, includedReport):
     hdr = Zip.HeaderExtension()
     hdr.__setstate__(data)
     assert hdr.get(includedReport)
+
+
+@pytest.mark.parametrize(
+    "seqNo,sourceEP,destEP,secureOrigin",
+    [(0, 0, 0, True), (1, 3, 5, False), (255, 127, 127, True)],
+)
+def test_zip_packet_frame(seqNo, sourceEP, destEP, secureOrigin):
+    cmd = NetworkManagementProxy.NodeListGet(seqNo=2)
+    pkt = Zip.ZipPacket(
+        ackRequest=True,
+        ackResponse=False,
+        nackResponse=False,
+        nackWaiting=False,
+        nackQueueFull=False,
+        nackOptionError=False,
+        headerExtIncluded=False,
+        zwCmdIncluded=True,
+        moreInformation=False,
+        secureOrigin=secureOrigin,
+        seqNo=seqNo,
+        sourceEP=sourceEP,
+        destEP=destEP,
+        command=cmd,
+    )
+    frame = Zip.ZipPacket.frame(
+        seqNo, cmd, sourceEP=sourceEP, destEP=destEP, secureOrigin=secureOrigin
+    )
+    assert frame == pkt.compose()
+    # The command may be passed already composed
+    assert frame == Zip.ZipPacket.frame(
+        seqNo,
+        cmd.compose(),
+        sourceEP=sourceEP,
+        destEP=destEP,
+        secureOrigin=secureOrigin,
+    )
+
+
+def test_zip_keep_alive_frame():
+    assert Zip.ZipKeepAlive.frame(True, False) == b"#\x03\x80"
+    assert Zip.ZipKeepAlive.frame(True, False) is Zip.ZipKeepAlive.frame(True, False)
+
+
+def test_header_extension_last_working_route():
+    # pylint: disable=line-too-long
+    header = b"\x1e\x03\x1b\x00\x01\x00\x01\x02\x00m\x02\x054\x00\x00\x00\x02\x03\x05~\x7f\x7f\x7f\x7f\x04\x01\x01\x05\x01\x01"
+    hdr = Zip.HeaderExtension()
+    hdr.__setstate__(Zip.HeaderExtension.deserialize(BitStreamReader(header)))
+    route = hdr.lastWorkingRoute
+    assert route.repeater1 == 0x34
+    assert route.speed == Zip.IMELastWorkingRoute.Speed.SPEED_40_KBIT_S
+    assert Zip.HeaderExtension().lastWorkingRoute is None
+
+
+def test_header_extension_multicast():
+    hdr = Zip.HeaderExtension()
+    hdr[
+        Zip.ZIPPacketOptionType.ZWAVE_MULTICAST_ADDRESSING
+    ] = Zip.ZIPPacketOptionMulticastAddressing({1, 3, 10})
+    stream = BitStreamWriter()
+    hdr.serialize(stream)
+    # Critical option 5 with the node mask
+    assert stream == b"\x05\x85\x02\x05\x02"
+    decoded = Zip.HeaderExtension()
+    decoded.__setstate__(Zip.HeaderExtension.deserialize(BitStreamReader(stream)))
+    assert decoded.multicastAddressing == {1, 3, 10}
+    assert Zip.HeaderExtension().multicastAddressing is None
+
+
+def test_zip_packet_frame_header_extension():
+    cmd = NetworkManagementProxy.NodeListGet(seqNo=2)
+    hdr = Zip.HeaderExtension()
+    hdr[
+        Zip.ZIPPacketOptionType.ZWAVE_MULTICAST_ADDRESSING
+    ] = Zip.ZIPPacketOptionMulticastAddressing({2, 4})
+    frame = Zip.ZipPacket.frame(7, cmd, headerExtension=hdr)
+    pkt = Message.decode(frame)
+    assert pkt.headerExtIncluded
+    assert pkt.seqNo == 7
+    assert pkt.headerExtension.multicastAddressing == {2, 4}
+    assert pkt.command == cmd
+
+
+def test_header_extension_serialize_report():
+    # pylint: disable=line-too-long
+    header = b"\x1e\x03\x1b\x00\x01\x00\x01\x02\x00m\x02\x054\x00\x00\x00\x02\x03\x05~\x7f\x7f\x7f\x7f\x04\x01\x01\x05\x01\x01"
+    hdr = Zip.HeaderExtension()
+    hdr.__setstate__(Zip.HeaderExtension.deserialize(BitStreamReader(header)))
+    stream = BitStreamWriter()
+    hdr.serialize(stream)
+    assert stream == header
+
+
+def test_header_extension_serialize_all():
+    OptionType = Zip.ZIPPacketOptionType
+    hdr = Zip.HeaderExtension()
+    hdr[OptionType.EXPECTED_DELAY] = Zip.ZIPPacketOptionExpectedDelay(300)
+    hdr[OptionType.MAINTENANCE_GET] = Zip.ZIPPacketOptionMaintenanceGet()
+    report = Zip.ZIPPacketOptionMaintenanceReport()
+    report[Zip.IMEType.TRANSMISION_TIME] = Zip.IMETransmissionTime(109)
+    report[Zip.IMEType.LAST_WORKING_ROUTE] = Zip.IMELastWorkingRoute(
+        repeater1=0x34,
+        repeater2=0,
+        repeater3=0,
+        repeater4=0,
+        speed=Zip.IMELastWorkingRoute.Speed.SPEED_100_KBIT_S,
+    )
+    hdr[OptionType.MAINTENANCE_REPORT] = report
+    hdr[
+        OptionType.ENCAPSULATION_FORMAT_INFORMATION
+    ] = Zip.ZIPPacketOptionEncapsulationFormatInfo(security2SecurityClass=2, crc16=True)
+    stream = BitStreamWriter()
+    hdr.serialize(stream)
+    assert stream == (
+        b"\x19"
+        + b"\x01\x03\x00\x01\x2c"
+        + b"\x02\x00"
+        + b"\x03\x0b\x01\x02\x00\x6d\x02\x05\x34\x00\x00\x00\x03"
+        + b"\x04\x02\x02\x01"
+    )
+    decoded = Zip.HeaderExtension()
+    decoded.__setstate__(Zip.HeaderExtension.deserialize(BitStreamReader(stream)))
+    assert decoded.expectedDelay == 300
+    assert isinstance(
+        decoded[OptionType.MAINTENANCE_GET], Zip.ZIPPacketOptionMaintenanceGet
+    )
+    assert decoded.lastWorkingRoute.repeater1 == 0x34
+    info = decoded[OptionType.ENCAPSULATION_FORMAT_INFORMATION]
+    assert info.security2SecurityClass == 2
+    assert info.crc16 == True
+
+
+def test_header_extension_unknown_option():
+    # Expected delay, unknown option 0x10 and unknown critical option 0x11
+    header = b"\x0d\x01\x03\x00\x00\x05\x10\x02\xab\xcd\x91\x01\xef"
+    hdr = Zip.HeaderExtension()
+    hdr.__setstate__(Zip.HeaderExtension.deserialize(BitStreamReader(header)))
+    assert hdr.expectedDelay == 5
+    assert hdr[0x10] == b"\xab\xcd"
+    assert isinstance(hdr[0x10], Zip.ZIPPacketOptionUnknown)
+    assert hdr[0x10].critical is False
+    assert hdr[0x11].critical is True
+    stream = BitStreamWriter()
+    hdr.serialize(stream)
+    assert stream == header
+    # The whole packet is composed again unchanged
+    pkt = b"\x23\x02\x00\xc0\x01\x00\x00" + header + b"\x20\x02"
+    decoded = Message.decode(pkt)
+    assert decoded.headerExtension[0x10] == b"\xab\xcd"
+    assert decoded.command == Basic.Get()
+    assert decoded.compose() == pkt
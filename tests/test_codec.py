@@ -0,0 +1,72 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=invalid-name
+# pylint: disable=protected-access
+# pylint: disable=unidiomatic-typecheck
+
+from pyzwave.codec import CodecPlan, FieldStep, RunStep
+from pyzwave.commandclass import SensorMultilevel, Zip, ZWaveMessage
+from pyzwave.message import Message
+from pyzwave.types import BitStreamReader, uint8_t, uint16_t
+from pyzwave.util import AttributesMixin
+
+
+class Unregistered(AttributesMixin):
+    attributes = (
+        ("foo", uint8_t),
+        ("bar", uint16_t),
+    )
+
+
+def test_plan_compiled_on_registration():
+    plan = Zip.ZipPacket.__dict__["__codecPlan__"]
+    assert plan.hid == 0x2302
+    assert plan.header == b"\x23\x02"
+    assert Zip.ZipPacket.hid() == 0x2302
+    # Flags, sequence number and endpoints are folded into a single struct
+    assert type(plan.steps[0]) is RunStep
+    assert plan.steps[0].struct.size == 5
+    assert [type(step) for step in plan.steps[1:]] == [FieldStep, FieldStep]
+
+
+def test_plan_compiled_on_demand():
+    assert "__codecPlan__" not in Unregistered.__dict__
+    obj = Unregistered()
+    obj.parseAttributes(BitStreamReader(b"\x01\x02\x03"))
+    assert obj.foo == 1
+    assert obj.bar == 0x0203
+    plan = CodecPlan.forClass(Unregistered)
+    assert plan.hid is None
+    assert CodecPlan.forClass(Unregistered) is plan
+
+
+def test_plan_custom_hook():
+    @ZWaveMessage(0x01, 0x02)
+    class Hooked(Message):
+        attributes = (("foo", uint8_t), ("bar", uint8_t))
+
+        @staticmethod
+        def parse_bar(stream: BitStreamReader):
+            return stream.byte() + 1
+
+    plan = Hooked.__dict__["__codecPlan__"]
+    assert [type(step) for step in plan.steps] == [RunStep, FieldStep]
+    msg = Message.decode(b"\x01\x02\x05\x05")
+    assert msg.foo == 5
+    assert msg.bar == 6
+
+
+def test_plan_short_data():
+    msg = Message.decode(b"\x23\x02\x80\x50")
+    assert msg.ackRequest
+    assert msg.secureOrigin
+    assert msg.seqNo is None
+
+
+def test_zip_packet_sensor_multilevel_report():
+    pkt = b"#\x02\x00\x50\x07\x00\x00\x31\x05\x01\x22\x00\xe4"
+    msg = Message.decode(pkt)
+    assert msg.seqNo == 7
+    assert type(msg.command) is SensorMultilevel.Report
+    assert msg.command.sensorType == SensorMultilevel.SensorType.TEMPERATURE
+    assert msg.command.sensorValue == 22.8
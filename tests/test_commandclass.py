@@ -5,9 +5,12 @@
 
 import asyncio
 import inspect
+import subprocess
+import sys
 from unittest.mock import MagicMock
 import pytest
 
+from pyzwave.commandclass import buildIndex, index
 from pyzwave.commandclass import CommandClass, VarDictAttribute, Version
 from pyzwave.message import Message, UnknownMessage
 from pyzwave.node import Node
@@ -234,3 +237,37 @@ def test_VarDictAttribute_uint8_t():
         attribute.debugString()
         == "VarDictAttributeType:\n\t1 = 0x2 (2)\n\t3 = 0x4 (4)\n\t5 = 0x6 (6)"
     )
+
+
+def test_index_up_to_date():
+    with open(index.__file__) as fd:
+        assert fd.read() == buildIndex()
+
+
+def test_lazy_loading():
+    code = (
+        "import sys\n"
+        "from pyzwave.message import Message\n"
+        "assert 'pyzwave.commandclass.Basic' not in sys.modules\n"
+        "assert 'pyzwave.const.ZW_classcmd' not in sys.modules\n"
+        "msg = Message.decode(b'\\x20\\x03\\xff')\n"
+        "assert type(msg).__module__ == 'pyzwave.commandclass.Basic'\n"
+        "assert 'pyzwave.commandclass.Zip' not in sys.modules\n"
+        "import pyzwave.commandclass\n"
+        "assert pyzwave.commandclass.Zip.ZipPacket.hid() == 0x2302\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_lazy_iteration():
+    code = (
+        "import sys\n"
+        "from pyzwave.commandclass import ZWaveCommandClass, ZWaveMessage, index\n"
+        "assert 'pyzwave.commandclass.Basic' not in sys.modules\n"
+        "assert len(ZWaveMessage) >= len(index.MESSAGES)\n"
+        "assert 'pyzwave.commandclass.Basic' in sys.modules\n"
+        "assert set(index.MESSAGES) <= set(ZWaveMessage)\n"
+        "assert all(isinstance(cls, type) for cls in ZWaveCommandClass.values())\n"
+        "assert dict(ZWaveCommandClass.items()).keys() >= index.COMMAND_CLASSES.keys()\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
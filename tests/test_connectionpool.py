@@ -0,0 +1,101 @@
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+# pylint: disable=redefined-outer-name
+# pylint: disable=protected-access
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pyzwave.connectionpool import ConnectionPool
+
+
+def connection(busy=False):
+    return MagicMock(busy=busy)
+
+
+@pytest.fixture
+def pool() -> ConnectionPool:
+    return ConnectionPool(maxSize=3, idleTimeout=60)
+
+
+def test_get(pool: ConnectionPool):
+    conn = connection()
+    pool[1] = conn
+    assert pool.get(1) is conn
+    assert pool.get(2) is None
+    assert 1 in pool
+    assert 2 not in pool
+    assert pool.metrics == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_evictLeastRecentlyUsed(pool: ConnectionPool):
+    connections = {i: connection() for i in range(1, 5)}
+    for i in range(1, 4):
+        pool[i] = connections[i]
+    # Node 1 is now used more recently than 2
+    pool.get(1)
+    pool[4] = connections[4]
+    assert list(pool) == [3, 1, 4]
+    connections[2].close.assert_called_once()
+    assert pool.evictions == 1
+
+
+def test_evictSkipsBusy(pool: ConnectionPool):
+    busy = connection(busy=True)
+    pool[1] = busy
+    pool[2] = connection()
+    pool[3] = connection()
+    pool[4] = connection()
+    assert list(pool) == [1, 3, 4]
+    busy.close.assert_not_called()
+
+
+def test_evictIdle(pool: ConnectionPool):
+    idle = connection()
+    busy = connection(busy=True)
+    with patch("time.monotonic", return_value=100):
+        pool[1] = idle
+        pool[2] = busy
+    with patch("time.monotonic", return_value=150):
+        pool[3] = connection()
+    with patch("time.monotonic", return_value=200):
+        assert pool.evictIdle() == 1
+    assert list(pool) == [2, 3]
+    idle.close.assert_called_once()
+    busy.close.assert_not_called()
+
+
+def test_replace(pool: ConnectionPool):
+    old = connection()
+    pool[1] = old
+    pool[1] = connection()
+    old.close.assert_called_once()
+    assert len(pool) == 1
+
+
+def test_pop(pool: ConnectionPool):
+    conn = connection()
+    pool[1] = conn
+    assert pool.pop(1) is conn
+    assert pool.pop(1, None) is None
+    conn.close.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sweep():
+    pool = ConnectionPool(idleTimeout=0)
+    conn = connection()
+    pool[1] = conn
+    assert pool._sweep is not None
+    pool._sweep.cancel()
+    pool._runSweep()
+    assert len(pool) == 0
+    conn.close.assert_called_once()
+    assert pool._sweep is None
+    pool[2] = connection()
+    pool.clear()
+    assert pool._sweep is None
+    await asyncio.sleep(0)
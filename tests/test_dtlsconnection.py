@@ -5,9 +5,13 @@
 # pylint: disable=protected-access
 # pylint: disable=attribute-defined-outside-init
 
+import asyncio
+import socket
+import threading
+
 import pytest
 
-from pyzwave.dtlsconnection import DTLSConnection
+from pyzwave.dtlsconnection import DTLSConnection, DTLSMultiplexer, PacketHandoff
 
 
 @pytest.fixture
@@ -29,3 +33,76 @@ def test_stop(dtlsconnection: DTLSConnection):
     dtlsconnection._running = True
     dtlsconnection.stop()
     assert dtlsconnection._running is False
+
+
+@pytest.mark.asyncio
+async def test_multiplexer():
+    multiplexer = DTLSMultiplexer()
+    received = asyncio.Queue()
+    connections = []
+    remotes = []
+    threads = threading.active_count()
+    for i in range(10):
+        local, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        connection = DTLSConnection(multiplexer=multiplexer)
+        connection._sock = local
+        connection.onMessage(lambda pkt, i=i: received.put_nowait((i, pkt)))
+        multiplexer.register(connection)
+        connections.append(connection)
+        remotes.append(remote)
+    # Only one thread for all connections
+    assert threading.active_count() == threads + 1
+    for i, remote in enumerate(remotes):
+        remote.send(bytes([i, 1]))
+        remote.send(bytes([i, 2]))
+    result = set()
+    for _ in range(20):
+        result.add(await asyncio.wait_for(received.get(), timeout=2))
+    assert result == {(i, bytes([i, n])) for i in range(10) for n in (1, 2)}
+
+    connections[0].stop()
+    await asyncio.sleep(0.05)
+    remotes[0].send(b"\x00\x03")
+    remotes[1].send(b"\x01\x03")
+    assert await asyncio.wait_for(received.get(), timeout=2) == (1, b"\x01\x03")
+    multiplexer.stop()
+    multiplexer.join(timeout=2)
+    assert not multiplexer.is_alive()
+    for sock in remotes + [connection.sock for connection in connections]:
+        sock.close()
+
+
+@pytest.mark.asyncio
+async def test_packetHandoff():
+    loop = asyncio.get_event_loop()
+    handoff = PacketHandoff(loop)
+    received = []
+    wakeups = 0
+    callSoonThreadsafe = loop.call_soon_threadsafe
+
+    def countWakeups(*args):
+        nonlocal wakeups
+        wakeups += 1
+        return callSoonThreadsafe(*args)
+
+    def failing(_pkt):
+        raise ValueError()
+
+    loop.call_soon_threadsafe = countWakeups
+    try:
+        reader = threading.Thread(
+            target=lambda: [handoff.put(received.append, i) for i in range(50)]
+        )
+        reader.start()
+        reader.join()
+        handoff.put(failing, 50)
+        handoff.put(received.append, 51)
+        await asyncio.sleep(0)
+        assert wakeups == 1
+        assert received == list(range(50)) + [51]
+        handoff.put(received.append, 52)
+        await asyncio.sleep(0)
+        assert wakeups == 2
+        assert received[-1] == 52
+    finally:
+        del loop.call_soon_threadsafe
@@ -0,0 +1,152 @@
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+# pylint: disable=redefined-outer-name
+# pylint: disable=protected-access
+
+import asyncio
+import ssl
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+from pyzwave.connection import Connection
+from pyzwave.dtlsprotocol import DTLSProtocol, DTLSSession
+
+PSK = bytes.fromhex("123456789012345678901234567890AA")
+
+
+def handshake(client: DTLSSession, server: DTLSSession):
+    client.doHandshake()
+    for _ in range(10):
+        data = client.outgoing()
+        if data:
+            server.feed(data)
+        data = server.outgoing()
+        if data:
+            client.feed(data)
+        if client.handshakeDone and server.handshakeDone:
+            return
+    raise AssertionError("Handshake did not finish")
+
+
+def test_import():
+    # Must not depend on pyzwave.connection being imported first
+    subprocess.run([sys.executable, "-c", "import pyzwave.dtlsprotocol"], check=True)
+
+
+def test_session():
+    client = DTLSSession(PSK)
+    server = DTLSSession(PSK, server=True)
+    assert client.server is False
+    assert server.server is True
+    handshake(client, server)
+    client.write(b"\x23\x02\x80\x50\x01\x00\x00\x20\x02")
+    client.write(b"\x25\x01")
+    # Two records in one datagram
+    assert server.feed(client.outgoing()) == [
+        b"\x23\x02\x80\x50\x01\x00\x00\x20\x02",
+        b"\x25\x01",
+    ]
+    server.write(b"\x23\x02\x40\x10\x01\x00\x00")
+    assert client.feed(server.outgoing()) == [b"\x23\x02\x40\x10\x01\x00\x00"]
+    client.close()
+    with pytest.raises(ConnectionResetError):
+        server.feed(client.outgoing())
+
+
+def test_session_wrong_psk():
+    client = DTLSSession(PSK)
+    server = DTLSSession(b"\x00" * 16, server=True)
+    # DTLS silently drops records it cannot decrypt
+    with pytest.raises(AssertionError):
+        handshake(client, server)
+    assert not client.handshakeDone
+
+
+def test_session_write_before_handshake():
+    with pytest.raises(ssl.SSLError):
+        DTLSSession(PSK).write(b"\x00")
+
+
+@pytest.mark.asyncio
+async def test_protocol():
+    loop = asyncio.get_event_loop()
+    serverMessages = asyncio.Queue()
+    clientMessages = asyncio.Queue()
+    _, server = await loop.create_datagram_endpoint(
+        lambda: DTLSProtocol(
+            loop.create_future(),
+            lambda pkt, addr: serverMessages.put_nowait((pkt, addr)),
+            PSK,
+            server=True,
+        ),
+        local_addr=("127.0.0.1", 0),
+    )
+    port = server.transport.get_extra_info("sockname")[1]
+    _, client = await loop.create_datagram_endpoint(
+        lambda: DTLSProtocol(
+            loop.create_future(), lambda pkt, addr: clientMessages.put_nowait(pkt), PSK,
+        ),
+        remote_addr=("127.0.0.1", port),
+    )
+    await asyncio.wait_for(client.handshakeDone, timeout=5)
+    client.sendto(b"\x25\x01")
+    pkt, addr = await asyncio.wait_for(serverMessages.get(), timeout=5)
+    assert pkt == b"\x25\x01"
+    server.sendto(b"\x25\x03\xff", addr)
+    assert await asyncio.wait_for(clientMessages.get(), timeout=5) == b"\x25\x03\xff"
+    client.close()
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_secure():
+    connection = Connection(secure=True)
+    connection._psk = PSK
+    protocol = connection._createProtocol(MagicMock())
+    assert isinstance(protocol, DTLSProtocol)
+    assert Connection()._createProtocol(MagicMock()).__class__ is not DTLSProtocol
+
+
+def serverProtocol(**kwargs) -> DTLSProtocol:
+    protocol = DTLSProtocol(MagicMock(), MagicMock(), PSK, server=True, **kwargs)
+    protocol.connection_made(MagicMock())
+    return protocol
+
+
+def clientHello(protocol: DTLSProtocol, addr):
+    client = DTLSSession(PSK)
+    client.doHandshake()
+    protocol.datagram_received(client.outgoing(), addr)
+    client.free()
+
+
+@pytest.mark.asyncio
+async def test_protocol_maxSessions():
+    protocol = serverProtocol(maxSessions=2)
+    clientHello(protocol, ("::1", 1))
+    clientHello(protocol, ("::1", 2))
+    # Traffic makes the session the most recently used
+    clientHello(protocol, ("::1", 1))
+    clientHello(protocol, ("::1", 3))
+    assert list(protocol._sessions) == [("::1", 1), ("::1", 3)]
+    assert list(protocol._idleTimers) == [("::1", 1), ("::1", 3)]
+    protocol.close()
+    assert not protocol._sessions
+    assert not protocol._idleTimers
+
+
+@pytest.mark.asyncio
+async def test_protocol_idleTimeout():
+    protocol = serverProtocol(idleTimeout=0.05)
+    clientHello(protocol, ("::1", 1))
+    await asyncio.sleep(0.03)
+    clientHello(protocol, ("::1", 2))
+    await asyncio.sleep(0.03)
+    assert list(protocol._sessions) == [("::1", 2)]
+    await asyncio.sleep(0.05)
+    assert not protocol._sessions
+    assert not protocol._idleTimers
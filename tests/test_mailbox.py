@@ -12,6 +12,7 @@ import pytest
 
 from pyzwave.commandclass import Mailbox
 from pyzwave.mailbox import MailboxService, QueueItem
+from pyzwave.timerwheel import TimerWheel
 from test_adaper import AdapterImpl
 
 sleep = asyncio.sleep
@@ -140,7 +141,7 @@ async def test_pushQueue(mailbox: MailboxService):
 @pytest.mark.asyncio
 async def test_QueueItem_runner(mailbox: MailboxService):
     async def runner():
-        with patch("asyncio.sleep", new_callable=SleepMock):
+        with patch.object(TimerWheel, "sleep", new_callable=SleepMock):
             queueItem = QueueItem(1, 2, b"hello", mailbox._adapter)
             await queueItem._runner()
 
@@ -5,7 +5,12 @@
 import pytest
 
 from pyzwave.message import Message
-from pyzwave.commandclass import Basic, ZWaveMessage
+from pyzwave.commandclass import (
+    Association,
+    Basic,
+    NetworkManagementInclusion,
+    ZWaveMessage,
+)
 from pyzwave.types import BitStreamWriter
 
 
@@ -87,5 +92,56 @@ def test_eq():
     assert Basic.Report() != 42
 
 
+def test_eq_structural():
+    assert Basic.Report(value=1) == Basic.Report(value=1)
+    assert Basic.Report(value=1) != Basic.Report(value=2)
+    assert Basic.Report(value=1) != Basic.Set(value=1)
+    # Unset attributes with a default compare equal to the default
+    pkt = b"#\x02\x80P\x02\x00\x00R\x01\x02"
+    msg = Message.decode(pkt)
+    assert msg == Message.decode(pkt)
+    assert msg == Message.decode(pkt, lazy=True)
+    assert msg != Message.decode(b"#\x02\x80P\x03\x00\x00R\x01\x02")
+    # Incomplete messages can be compared even if they cannot be composed
+    assert Basic.Report() == Basic.Report()
+    assert Basic.Report() != Basic.Report(value=0)
+
+
+def test_hash():
+    pkt = b"#\x02\x80P\x02\x00\x00R\x01\x02"
+    seen = {Message.decode(pkt): 1}
+    assert Message.decode(pkt) in seen
+    assert Message.decode(pkt, lazy=True) in seen
+    assert hash(Basic.Report(value=1)) == hash(Basic.Report(value=1))
+    msg = Basic.Report(value=1)
+    first = hash(msg)
+    msg.value = 2
+    assert hash(msg) != first
+    assert hash(msg) == hash(Basic.Report(value=2))
+
+
+def test_hash_nested():
+    msg = Association.Report(
+        groupingIdentifier=1, maxNodesSupported=5, reportsToFollow=0, nodes=[1]
+    )
+    hash(msg)
+    # Modifying a nested value must not leave a stale hash
+    msg.nodes.append((2, None))
+    assert hash(msg) == hash(
+        Association.Report(
+            groupingIdentifier=1, maxNodesSupported=5, reportsToFollow=0, nodes=[1, 2]
+        )
+    )
+    # Unhashable values, such as dsk_t, are hashed by their representation
+    first = NetworkManagementInclusion.NodeAddDSKReport(
+        seqNo=1, inputDSKLength=0, dsk=b"\x01" * 16
+    )
+    second = NetworkManagementInclusion.NodeAddDSKReport(
+        seqNo=1, inputDSKLength=0, dsk=b"\x01" * 16
+    )
+    assert first == second
+    assert hash(first) == hash(second)
+
+
 def test_repr():
     assert str(Basic.Report()) == "<Z-Wave BASIC.REPORT>"
@@ -0,0 +1,36 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+import asyncio
+
+import pytest
+
+from pyzwave.retry import QueuePause, RetryPolicy
+
+
+def test_delay():
+    policy = RetryPolicy(baseDelay=0.1, maxDelay=1.0, jitter=0.5)
+    for attempt, expected in enumerate([0.1, 0.2, 0.4, 0.8, 1.0, 1.0]):
+        for _ in range(20):
+            assert expected / 2 <= policy.delay(attempt) <= expected
+
+
+def test_delay_no_jitter():
+    policy = RetryPolicy(baseDelay=0.1, maxDelay=1.0, jitter=0)
+    assert [policy.delay(i) for i in range(3)] == pytest.approx([0.1, 0.2, 0.4])
+
+
+@pytest.mark.asyncio
+async def test_queuePause():
+    pause = QueuePause()
+    assert not pause.paused
+    await asyncio.wait_for(pause.wait(), 0.01)
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    pause.pause(0.05)
+    # A shorter pause does not shorten the current one
+    pause.pause(0.01)
+    assert pause.paused
+    assert pause.pauses == 2
+    await pause.wait()
+    assert loop.time() - start >= 0.05
+    assert not pause.paused
@@ -0,0 +1,184 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+# pylint: disable=protected-access
+import asyncio
+
+import pytest
+
+from pyzwave.commandclass.Zip import IMELastWorkingRoute
+from pyzwave.scheduler import (
+    AirtimeLimiter,
+    OutboundScheduler,
+    Priority,
+    airtime,
+    currentPriority,
+    routeAirtime,
+    sendPriority,
+)
+
+
+async def sendAll(scheduler: OutboundScheduler, messages):
+    """Queue all (nodeId, priority) messages and return the order they were sent"""
+    sent = []
+    gate = asyncio.get_event_loop().create_future()
+
+    async def send(nodeId, priority, name):
+        async with scheduler.slot(nodeId, priority):
+            sent.append(name)
+            await gate
+
+    # Occupy all slots while queueing
+    blockers = [
+        asyncio.ensure_future(send(nodeId, Priority.INTERACTIVE, None))
+        for nodeId in range(100, 100 + scheduler._maxActive)
+    ]
+    await asyncio.sleep(0)
+    tasks = [
+        asyncio.ensure_future(send(nodeId, priority, name))
+        for name, (nodeId, priority) in enumerate(messages)
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.pending == len(messages)
+    gate.set_result(None)
+    await asyncio.gather(*blockers, *tasks)
+    assert scheduler.active == 0
+    return [name for name in sent if name is not None]
+
+
+def test_sendPriority():
+    assert currentPriority() == Priority.INTERACTIVE
+    with sendPriority(Priority.MAINTENANCE):
+        assert currentPriority() == Priority.MAINTENANCE
+    assert currentPriority() == Priority.INTERACTIVE
+
+
+@pytest.mark.asyncio
+async def test_priority():
+    scheduler = OutboundScheduler(maxActive=1)
+    order = await sendAll(
+        scheduler,
+        [
+            (1, Priority.MAINTENANCE),
+            (1, Priority.MAINTENANCE),
+            (1, Priority.REPORTING),
+            (1, Priority.INTERACTIVE),
+        ],
+    )
+    assert order == [3, 2, 0, 1]
+
+
+@pytest.mark.asyncio
+async def test_roundRobin():
+    scheduler = OutboundScheduler(maxActive=1)
+    order = await sendAll(
+        scheduler,
+        [
+            (1, Priority.MAINTENANCE),
+            (1, Priority.MAINTENANCE),
+            (1, Priority.MAINTENANCE),
+            (2, Priority.MAINTENANCE),
+            (3, Priority.MAINTENANCE),
+        ],
+    )
+    assert order == [0, 3, 4, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_busyNode():
+    # A node busy with a message must not block messages to the other nodes
+    scheduler = OutboundScheduler(maxActive=4)
+    await scheduler.acquire(1)
+    waiter = asyncio.ensure_future(scheduler.acquire(1, Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    await asyncio.wait_for(scheduler.acquire(2, Priority.MAINTENANCE), 1)
+    scheduler.release(1)
+    await waiter
+    assert scheduler.active == 2
+
+
+@pytest.mark.asyncio
+async def test_multicast():
+    # A multicast holds the slot of each node it is sent to
+    scheduler = OutboundScheduler(maxActive=4)
+    await scheduler.acquire(2)
+    multicast = asyncio.ensure_future(scheduler.acquire(frozenset({1, 2})))
+    await asyncio.sleep(0)
+    assert not multicast.done()
+    scheduler.release(2)
+    await asyncio.wait_for(multicast, 1)
+    assert scheduler.active == 1
+    single = asyncio.ensure_future(scheduler.acquire(1))
+    await asyncio.sleep(0)
+    assert not single.done()
+    await asyncio.wait_for(scheduler.acquire(3), 1)
+    scheduler.release(frozenset({1, 2}))
+    await asyncio.wait_for(single, 1)
+    assert scheduler.active == 2
+
+
+@pytest.mark.asyncio
+async def test_cancel():
+    scheduler = OutboundScheduler(maxActive=1)
+    await scheduler.acquire(1)
+    waiter = asyncio.ensure_future(scheduler.acquire(2))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    scheduler.release(1)
+    assert scheduler.active == 0
+    assert scheduler.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_slot():
+    scheduler = OutboundScheduler(maxActive=1)
+    with sendPriority(Priority.MAINTENANCE):
+        slot = scheduler.slot(1)
+    # The priority is taken from the context creating the slot
+    assert slot._priority == Priority.MAINTENANCE
+    with pytest.raises(ValueError):
+        async with slot:
+            assert scheduler.active == 1
+            raise ValueError()
+    assert scheduler.active == 0
+
+
+def test_airtime():
+    Speed = IMELastWorkingRoute.Speed
+    assert airtime(10, Speed.SPEED_9_6_KBIT_S) > airtime(10, Speed.SPEED_40_KBIT_S)
+    assert airtime(10, Speed.SPEED_40_KBIT_S) > airtime(10, Speed.SPEED_100_KBIT_S)
+    assert airtime(20) > airtime(10)
+    assert airtime(10, repeaters=2) > 3 * airtime(10)
+    # 2 * (10 + 10 + 1) + 10 bytes at 9.6 kbit/s
+    assert airtime(10, Speed.SPEED_9_6_KBIT_S) == pytest.approx(52 * 8 / 9600)
+
+
+def test_routeAirtime():
+    route = IMELastWorkingRoute(
+        repeater1=0x34,
+        repeater2=0,
+        repeater3=0,
+        repeater4=0,
+        speed=IMELastWorkingRoute.Speed.SPEED_100_KBIT_S,
+    )
+    assert routeAirtime(10, route) == airtime(
+        10, IMELastWorkingRoute.Speed.SPEED_100_KBIT_S, 1
+    )
+    assert routeAirtime(10) == airtime(10)
+
+
+@pytest.mark.asyncio
+async def test_airtimeLimiter():
+    limiter = AirtimeLimiter(budget=0.5, burst=0.02)
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    # Within the burst
+    await limiter.acquire(0.02)
+    await limiter.acquire(0.02)
+    assert loop.time() - start < 0.04
+    # Using half the channel the first 0.04 seconds of airtime takes 0.08 seconds.
+    # The burst lets the third message start 0.04 seconds early.
+    await limiter.acquire(0.02)
+    assert loop.time() - start >= 0.04
+    assert limiter.used == pytest.approx(0.06)
@@ -0,0 +1,128 @@
+# pylint: disable=missing-function-docstring
+# pylint: disable=invalid-name
+# pylint: disable=protected-access
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from pyzwave.timerwheel import RESOLUTION, TimerWheel, timerWheel
+
+
+class FakeLoop:
+    """Loop where the time only advances when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.handles = []
+
+    def advance(self, seconds):
+        end = self.now + seconds
+        while True:
+            self.handles.sort(key=lambda h: h[0])
+            due = [h for h in self.handles if h[0] <= end and not h[2].cancelled()]
+            if not due:
+                break
+            when, callback, _ = due[0]
+            self.handles.remove(due[0])
+            self.now = max(self.now, when)
+            callback()
+        self.now = end
+
+    def call_at(self, when, callback):
+        handle = asyncio.Handle(callback, (), self)
+        self.handles.append((when, callback, handle))
+        return handle
+
+    def call_exception_handler(self, context):
+        raise context["exception"]
+
+    def get_debug(self):  # pylint: disable=no-self-use
+        return False
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def fakeLoop() -> FakeLoop:
+    return FakeLoop()
+
+
+def test_callLater(fakeLoop: FakeLoop):
+    wheel = TimerWheel(fakeLoop)
+    callback = MagicMock()
+    timer = wheel.callLater(1, callback, 1, 2)
+    assert timer.active
+    assert len(wheel) == 1
+    fakeLoop.advance(0.99)
+    callback.assert_not_called()
+    fakeLoop.advance(0.01 + RESOLUTION)
+    callback.assert_called_once_with(1, 2)
+    assert not timer.active
+    assert len(wheel) == 0
+
+
+def test_cancel(fakeLoop: FakeLoop):
+    wheel = TimerWheel(fakeLoop)
+    callback = MagicMock()
+    timer = wheel.callLater(1, callback)
+    timer.cancel()
+    timer.cancel()
+    assert not timer.active
+    fakeLoop.advance(2)
+    callback.assert_not_called()
+
+
+@pytest.mark.parametrize("delay", [0.5, 10, 700, 20000])
+def test_longDelays(fakeLoop: FakeLoop, delay):
+    # Timers in the upper levels must be cascaded down and fire on time
+    wheel = TimerWheel(fakeLoop)
+    fired = []
+    wheel.callLater(delay, lambda: fired.append(fakeLoop.time()))
+    fakeLoop.advance(delay - RESOLUTION)
+    assert not fired
+    fakeLoop.advance(2 * RESOLUTION)
+    assert len(fired) == 1
+    assert delay <= fired[0] <= delay + 2 * RESOLUTION
+    # Waking up on every revolution of the first level is not needed
+    assert len(fakeLoop.handles) == 0
+
+
+def test_reset(fakeLoop: FakeLoop):
+    wheel = TimerWheel(fakeLoop)
+    callback = MagicMock()
+    timer = wheel.callLater(1, callback)
+    for _ in range(10):
+        fakeLoop.advance(0.5)
+        timer.reset(1)
+    callback.assert_not_called()
+    assert len(wheel) == 1
+    fakeLoop.advance(1 + RESOLUTION)
+    callback.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_sleep():
+    wheel = timerWheel()
+    assert wheel is timerWheel(asyncio.get_event_loop())
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    await wheel.sleep(0.05)
+    assert loop.time() - start >= 0.05
+    assert len(wheel) == 0
+
+
+@pytest.mark.asyncio
+async def test_waitFor():
+    wheel = timerWheel()
+    future = wheel.loop.create_future()
+    wheel.loop.call_soon(future.set_result, 42)
+    assert await wheel.waitFor(future, 1) == 42
+    assert len(wheel) == 0
+
+    future = wheel.loop.create_future()
+    with pytest.raises(asyncio.TimeoutError):
+        await wheel.waitFor(future, 0.02)
+    assert future.cancelled()
+    assert len(wheel) == 0
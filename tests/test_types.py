@@ -6,6 +6,7 @@
 
 from enum import Enum, IntFlag
 import ipaddress
+import struct
 import pytest
 
 from pyzwave.types import (
@@ -19,12 +20,14 @@ from pyzwave.types import (
     float_t,
     HomeID,
     IPv6,
+    reserved_t,
     str_t,
     uint3_t,
     uint4_t,
     uint5_t,
     uint7_t,
     uint8_t,
+    uint16_t,
 )
 
 
@@ -93,6 +96,54 @@ def test_BitStreamReader_remaining(streamReader: BitStreamReader):
     assert streamReader.remaining() == b"\x01\xcb@"
 
 
+def test_BitStreamReader_subReader():
+    data = bytearray(b"\x02\x01\xCB\x40")
+    streamReader = BitStreamReader(data)
+    assert streamReader.byte() == 0x02
+    subReader = streamReader.subReader(2)
+    assert streamReader.bytesLeft() == 1
+    assert subReader.bytesLeft() == 2
+    # The sub reader shares the buffer with the parent
+    data[1] = 0x05
+    assert subReader.byte() == 0x05
+    assert subReader.remaining() == b"\xCB"
+    assert subReader.bytesLeft() == 0
+    with pytest.raises(EOFError):
+        subReader.byte()
+    assert streamReader.byte() == 0x40
+
+
+def test_BitStreamReader_view(streamReader: BitStreamReader):
+    view = streamReader.view(2)
+    assert isinstance(view, memoryview)
+    assert view == b"\x02\x01"
+    assert streamReader.bytesLeft() == 2
+    with pytest.raises(EOFError):
+        streamReader.view(3)
+
+
+def test_BitStreamReader_unpack(streamReader: BitStreamReader):
+    fmt = struct.Struct(">BH")
+    assert streamReader.unpack(fmt) == (0x02, 0x01CB)
+    assert streamReader.bytesLeft() == 1
+    streamReader.bit()
+    assert streamReader.isByteAligned() is False
+    with pytest.raises(ValueError):
+        streamReader.unpack(fmt)
+    streamReader.advance(7)
+    with pytest.raises(EOFError):
+        streamReader.unpack(fmt)
+
+
+def test_BitStreamWriter_addStruct(streamWriter: BitStreamWriter):
+    streamWriter.addStruct(struct.Struct(">BH"), 1, 2)
+    assert streamWriter == b"\x01\x00\x02"
+    streamWriter.addBits(1, 1)
+    assert streamWriter.isByteAligned() is False
+    with pytest.raises(ValueError):
+        streamWriter.addStruct(struct.Struct(">B"), 1)
+
+
 def test_BitStreamWriter_bits(streamWriter: BitStreamWriter):
     streamWriter.addBits(1, 1)
     assert streamWriter == b"\x80"
@@ -177,11 +228,28 @@ def test_enum_t_IntFlags():
     assert repr(MyFlags_t(3)) == "MyFlags.BAR|FOO (11)"
 
 
+def test_enum_t_shared():
+    class MyEnum(Enum):
+        FOO = 1
+
+    assert enum_t(MyEnum, uint8_t) is enum_t(MyEnum, uint8_t)
+    assert enum_t(MyEnum, uint8_t)(1) is enum_t(MyEnum, uint8_t)(1)
+    assert type(enum_t(MyEnum, uint8_t)(1)) is enum_t(MyEnum, uint8_t)
+
+
 def test_flags_t():
     assert str(flag_t(True)) == "flag_t(True)"
     assert str(flag_t(False)) == "flag_t(False)"
 
 
+def test_flags_t_shared():
+    assert flag_t(True) is flag_t(1)
+    assert flag_t(0) is flag_t(False)
+    assert flag_t(1) is not flag_t(0)
+    assert flag_t(2) == 0
+    assert bits_t(4)(3) is not flag_t(1)
+
+
 def test_float_t():
     value = float_t(23.2, 1, 2)
     assert value == 23.2
@@ -283,6 +351,27 @@ def test_uint7_t(streamReader):
     assert streamWriter == b"\x28"
 
 
+def test_eq_hash():
+    assert bits_t(16)(300) == bits_t(16)(300)
+    assert hash(bits_t(16)(300)) == hash(300)
+    assert float_t(22.3, 1, 1) == 22.3
+    assert float_t(22.3, 1, 1) != float_t(22.3, 1, 0)
+    assert hash(float_t(22.3, 1, 1)) == hash(22.3)
+    with pytest.raises(TypeError):
+        hash(dsk_t(b""))
+
+
+def test_shared_values():
+    assert bits_t(3) is bits_t(3)
+    assert reserved_t(4) is reserved_t(4)
+    assert uint8_t(7) is uint8_t(7)
+    assert uint16_t(7) is not uint8_t(7)
+    assert uint16_t(0x1234) == 0x1234
+    assert type(uint8_t(0)) is uint8_t
+    assert uint7_t(5) is uint7_t(5)
+    assert uint8_t("10", 16) == 16
+
+
 def test_uint8_t(streamReader):
     assert uint8_t.deserialize(streamReader) == 2
     assert uint8_t.deserialize(streamReader) == 1
@@ -8,11 +8,17 @@
 # pylint: disable=blacklisted-name
 import asyncio
 import logging
-from unittest.mock import MagicMock
+import time
+from unittest.mock import MagicMock, patch
 
 import pytest
 
-from pyzwave.util import AttributesMixin, Listenable
+from pyzwave.util import (
+    AttributesMixin,
+    DuplicateFilter,
+    Listenable,
+    SequenceAllocator,
+)
 from pyzwave.types import BitStreamReader, float_t, uint8_t
 
 
@@ -127,6 +133,23 @@ def test_attributes_parseAttributes():
     assert attributable.bar == 2
 
 
+def test_attributes_table():
+    class Duplicated(AttributesMixin):
+        attributes = (
+            ("foo", uint8_t),
+            ("-", float_t),
+            ("-", CustomAttribute),
+        )
+
+    assert Attributable._attributeTable["foo"] == (0, uint8_t, False)
+    assert Attributable._attributeTable["custom"] == (3, CustomAttribute, True)
+    assert "-" in Duplicated._attributeTable
+    assert Duplicated._attributeTable["-"] == (1, float_t, False)
+    duplicated = Duplicated()
+    setattr(duplicated, "-", (2.5, 1, 0))
+    assert type(getattr(duplicated, "-")) is float_t
+
+
 def test_attributes_state(attributable: Attributable):
     assert attributable.__getstate__() == {}
     attributable.__setstate__({"foo": 1, "bar": 2, "custom": 3, "native": 4})
@@ -172,3 +195,67 @@ def test_speaker_listener_exception(speaker: Speaker, listener: Listener):
     # The exception should not propagate
     speaker.addListener(listener)
     speaker.speak("enrage")
+
+
+def test_attributes_slots():
+    class Reduced(AnotherAttributable):
+        attributes = (("bar", uint8_t),)
+
+    another = AnotherAttributable(foo=1, bar=2)
+    assert another._values[:2] == [1, 2]
+    assert AnotherAttributable.__weakrefoffset__ == 0
+    # Values not declared as attributes fall back to __dict__
+    another.notDeclared = 1
+    assert another.notDeclared == 1
+    assert another.__dict__ == {"notDeclared": 1}
+    assert another.__getstate__() == {"foo": 1, "bar": 2}
+    reduced = Reduced(bar=3)
+    assert reduced.bar == 3
+    # Attributes only declared in the base class are not available
+    assert reduced.foo is None
+    assert reduced.__getstate__() == {"bar": 3}
+
+
+@pytest.mark.asyncio
+async def test_sequenceAllocator():
+    allocator = SequenceAllocator(4)
+    assert [await allocator.acquire() for _ in range(3)] == [1, 2, 3]
+    allocator.release(2)
+    # Wraps around and skips the numbers still in use
+    assert await allocator.acquire() == 0
+    assert await allocator.acquire() == 2
+    assert len(allocator) == 4
+    assert 3 in allocator
+    # Exhausted, wait for a number to be released
+    waiter = asyncio.ensure_future(allocator.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    allocator.release(3)
+    assert await waiter == 3
+
+
+@pytest.mark.asyncio
+async def test_sequenceAllocator_allocate():
+    allocator = SequenceAllocator(1)
+    async with allocator.allocate() as seqNo:
+        assert seqNo == 0
+        assert seqNo in allocator
+        waiter = asyncio.ensure_future(allocator.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+    assert len(allocator) == 0
+    with pytest.raises(ValueError):
+        async with allocator.allocate():
+            raise ValueError()
+    assert len(allocator) == 0
+
+
+def test_duplicateFilter():
+    duplicates = DuplicateFilter(window=10)
+    assert duplicates.isDuplicate(1, b"foo") is False
+    assert duplicates.isDuplicate(1, b"foo") is True
+    assert duplicates.isDuplicate(2, b"foo") is False
+    assert duplicates.isDuplicate(1, b"bar") is False
+    assert duplicates.isDuplicate(1, b"foo") is False
+    with patch("time.monotonic", return_value=time.monotonic() + 11):
+        assert duplicates.isDuplicate(1, b"foo") is False
@@ -12,12 +12,18 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from pyzwave.adapter import TxOptions
+from pyzwave.retry import RetryPolicy
+from pyzwave.scheduler import AirtimeLimiter, airtime
 from pyzwave.message import Message
 from pyzwave.commandclass import Basic, Zip, ZipND
+from pyzwave.timerwheel import Timer
 
 # We need to mock away dtls since this may segfault if not patched
 sys.modules["dtls"] = __import__("mock_dtls")
-from pyzwave.zipconnection import ZIPConnection  # pylint: disable=wrong-import-position
+from pyzwave.zipconnection import (  # pylint: disable=wrong-import-position
+    SendWindow,
+    ZIPConnection,
+)
 
 
 class ZIPConnectionImpl(ZIPConnection):
@@ -158,7 +164,9 @@ def test_onPacket_Zip(connection: ZIPConnection):
     assert msg.ackRequest == False
     assert msg.ackResponse == False
     assert msg.nackResponse == True
-    assert connection.onPacket(nackResponse.compose()) is False
+    connection.nackReceived = MagicMock()
+    assert connection.onPacket(nackResponse.compose()) is True
+    connection.nackReceived.assert_called_once()
 
     nackResponse = Zip.ZipPacket(
         ackRequest=False,
@@ -199,7 +207,10 @@ def test_onPacket_Zip(connection: ZIPConnection):
         destEP=0,
         command=None,
     )
-    assert connection.onPacket(ackRequest.compose()) is False
+    assert connection.onPacket(ackRequest.compose()) is True
+    connection._conn.send.assert_called_once_with(
+        ackRequest.response(success=True).compose()
+    )
 
     pkt = Zip.ZipPacket(
         ackRequest=False,
@@ -221,6 +232,32 @@ def test_onPacket_Zip(connection: ZIPConnection):
     connection.commandReceived.assert_called_once()
 
 
+def test_onPacket_duplicate(connection: ZIPConnection):
+    connection.commandReceived = MagicMock()
+    pkt = b"#\x02\x80\x50\x05\x00\x00%\x03\x00"
+    assert connection.onPacket(pkt) is True
+    assert connection.onPacket(pkt) is True
+    # Both are acked but only processed once
+    assert connection._conn.send.call_count == 2
+    connection._conn.send.assert_called_with(b"#\x02\x40\x10\x05\x00\x00")
+    connection.commandReceived.assert_called_once()
+    # Same sequence number but another packet
+    assert connection.onPacket(b"#\x02\x80\x50\x05\x00\x00%\x03\xff") is True
+    assert connection.commandReceived.call_count == 2
+    # Same sequence number from another endpoint
+    assert connection.onPacket(b"#\x02\x80\x50\x05\x01\x00%\x03\xff") is True
+    assert connection.commandReceived.call_count == 3
+
+
+def test_onPacket_duplicate_noAckRequest(connection: ZIPConnection):
+    connection.commandReceived = MagicMock()
+    pkt = b"#\x02\x00\x50\x06\x00\x00%\x03\x00"
+    assert connection.onPacket(pkt) is True
+    assert connection.onPacket(pkt) is True
+    connection._conn.send.assert_not_called()
+    connection.commandReceived.assert_called_once()
+
+
 def test_onPacket_ZipND(connection: ZIPConnection):
     pkt = ZipND.ZipNodeAdvertisement(
         local=False, validity=0, nodeId=6, ipv6=0, homeId=0,
@@ -228,7 +265,8 @@ def test_onPacket_ZipND(connection: ZIPConnection):
     assert connection.onPacket(pkt.compose()) is True
 
     pkt = Zip.ZipKeepAlive(ackRequest=True, ackResponse=False)
-    assert connection.onPacket(pkt.compose()) is False
+    assert connection.onPacket(pkt.compose()) is True
+    connection._conn.send.assert_called_once_with(b"#\x03\x40")
 
     pkt = Zip.ZipKeepAlive(ackRequest=False, ackResponse=True)
     assert connection.onPacket(pkt.compose()) is True
@@ -239,6 +277,20 @@ def test_keepAlive(connection: ZIPConnection):
     connection._conn.send.assert_called_with(b"#\x03\x80")
 
 
+def test_onPacket_lastWorkingRoute(connection: ZIPConnection):
+    # pylint: disable=line-too-long
+    header = b"\x1e\x03\x1b\x00\x01\x00\x01\x02\x00m\x02\x054\x00\x00\x00\x02\x03\x05~\x7f\x7f\x7f\x7f\x04\x01\x01\x05\x01\x01"
+    connection.ackReceived = MagicMock()
+    assert connection.lastWorkingRoute is None
+    assert connection.onPacket(b"#\x02\x40\x90\x01\x00\x00" + header) is True
+    connection.ackReceived.assert_called_once()
+    assert connection.lastWorkingRoute.repeater1 == 0x34
+    assert (
+        connection.lastWorkingRoute.speed
+        == Zip.IMELastWorkingRoute.Speed.SPEED_40_KBIT_S
+    )
+
+
 def test_psk():
     psk = b"Foobar"
     connection = ZIPConnectionImpl(None, psk)
@@ -263,15 +315,16 @@ async def test_removeNodeStop(connection: ZIPConnection):
         await connection.removeNodeStop()
 
 
-def test_resetKeepAlive(connection: ZIPConnection):
-    with patch.object(asyncio.TimerHandle, "cancel"):
+@pytest.mark.asyncio
+async def test_resetKeepAlive(connection: ZIPConnection):
+    with patch.object(Timer, "reset") as reset:
         assert connection._keepAlive is None
         connection.resetKeepAlive()
         assert connection._keepAlive is not None
         timer = connection._keepAlive
         connection.resetKeepAlive()
-        timer.cancel.assert_called_once()
-        assert connection._keepAlive != timer
+        reset.assert_called_once_with(25)
+        assert connection._keepAlive is timer
 
 
 @pytest.mark.asyncio
@@ -286,13 +339,160 @@ async def test_send(connection: ZIPConnection):
     connection._conn.send.assert_called_once_with(b"#\x02\x80\x50\x01\x00\x00 \x02")
 
 
+ACK = 0x40
+NACK = 0x20
+NACK_QUEUE_FULL = 0x28
+
+
+async def respond(connection: ZIPConnection, responses):
+    """Answer each (re)transmitted packet with the next response flags"""
+    for count, flags in enumerate(responses, start=1):
+        while connection._conn.send.call_count < count:
+            await asyncio.sleep(0.001)
+        seqNo = connection._conn.send.call_args[0][0][4]
+        connection.onPacket(bytes([0x23, 0x02, flags, 0x10, seqNo, 0, 0]))
+
+
+@pytest.mark.asyncio
+async def test_send_nack_retry(connection: ZIPConnection):
+    connection._retryPolicy = RetryPolicy(retries=3, baseDelay=0)
+    [res, _] = await asyncio.gather(
+        connection.send(Basic.Get()), respond(connection, [NACK, NACK, ACK])
+    )
+    assert res is True
+    assert connection._conn.send.call_count == 3
+    # The retransmissions use the same sequence number
+    seqNos = {call[0][0][4] for call in connection._conn.send.call_args_list}
+    assert seqNos == {1}
+    assert len(connection._seq) == 0
+
+
+@pytest.mark.asyncio
+async def test_send_nack_retry_airtime(connection: ZIPConnection):
+    connection._retryPolicy = RetryPolicy(retries=3, baseDelay=0)
+    connection._airtimeLimiter = AirtimeLimiter()
+    [res, _] = await asyncio.gather(
+        connection.send(Basic.Get()), respond(connection, [NACK, ACK])
+    )
+    assert res is True
+    # Every transmission is charged
+    assert connection._airtimeLimiter.used == pytest.approx(2 * airtime(2))
+
+
+@pytest.mark.asyncio
+async def test_send_nack_give_up(connection: ZIPConnection):
+    connection._retryPolicy = RetryPolicy(retries=1, baseDelay=0)
+    [res, _] = await asyncio.gather(
+        connection.send(Basic.Get()), respond(connection, [NACK, NACK])
+    )
+    assert res is False
+    assert connection._conn.send.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_send_nack_option_error(connection: ZIPConnection):
+    [res, _] = await asyncio.gather(
+        connection.send(Basic.Get()),
+        runDelayed(
+            connection.nackReceived,
+            Zip.ZipPacket(nackResponse=True, nackOptionError=True, seqNo=1),
+        ),
+    )
+    assert res is False
+    assert connection._conn.send.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_send_nack_queue_full(connection: ZIPConnection):
+    connection._retryPolicy = RetryPolicy(retries=3, baseDelay=0.02, jitter=0)
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    [res, _] = await asyncio.gather(
+        connection.send(Basic.Get()), respond(connection, [NACK_QUEUE_FULL, ACK]),
+    )
+    assert res is True
+    # The connection was paused before retrying
+    assert loop.time() - start >= 0.02
+    assert connection.queuePause.pauses == 1
+    assert connection._conn.send.call_count == 2
+
+
 @pytest.mark.asyncio
 async def test_send_timeout(connection: ZIPConnection):
     basicGet = Basic.Get()
     assert await connection.send(basicGet, timeout=0) is False
 
 
+@pytest.mark.asyncio
+async def test_send_window(connection: ZIPConnection):
+    connection.window = 2
+    sends = [
+        asyncio.ensure_future(connection.send(Basic.Set(value=i))) for i in range(4)
+    ]
+    await asyncio.sleep(0)
+    # Only two packets may be in flight
+    assert connection._conn.send.call_count == 2
+    assert connection._window.inFlight == 2
+    # Acks out of order
+    connection.ackReceived(Zip.ZipPacket(seqNo=2))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert connection._conn.send.call_count == 3
+    connection.ackReceived(Zip.ZipPacket(seqNo=1))
+    connection.ackReceived(Zip.ZipPacket(seqNo=3))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    connection.ackReceived(Zip.ZipPacket(seqNo=4))
+    assert await asyncio.gather(*sends) == [True] * 4
+    assert connection._window.inFlight == 0
+    # Packets are sent in the order send() was called
+    values = [
+        Message.decode(call[0][0]).command.value
+        for call in connection._conn.send.call_args_list
+    ]
+    assert values == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_send_window_timeout(connection: ZIPConnection):
+    connection.window = 1
+    results = await asyncio.gather(
+        connection.send(Basic.Get(), timeout=0),
+        connection.send(Basic.Get(), timeout=0),
+    )
+    assert results == [False, False]
+    assert connection._conn.send.call_count == 2
+    assert connection._window.inFlight == 0
+
+
+@pytest.mark.asyncio
+async def test_sendWindow_cancel():
+    window = SendWindow(1)
+    await window.acquire()
+    waiter = asyncio.ensure_future(window.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    window.release()
+    assert window.inFlight == 0
+    await window.acquire()
+    assert window.inFlight == 1
+
+
 @pytest.mark.asyncio
 async def test_setNodeInfo(connection: ZIPConnection):
     with pytest.raises(NotImplementedError):
         await connection.setNodeInfo(0, 0, [])
+
+
+@pytest.mark.asyncio
+async def test_close(connection: ZIPConnection):
+    connection.resetKeepAlive()
+    timer = connection._keepAlive
+    assert connection.busy is False
+    connection._ackQueue[1] = object()
+    assert connection.busy is True
+    connection.close()
+    assert connection._keepAlive is None
+    assert not timer.active
+    connection._conn.stop.assert_called_once()
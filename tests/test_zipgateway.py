@@ -8,8 +8,10 @@
 
 import asyncio
 import ipaddress
+import socket
 import sys
-from unittest.mock import MagicMock
+import threading
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -18,7 +20,8 @@ import pytest
 sys.modules["dtls"] = __import__("mock_dtls")
 
 # pylint: disable=wrong-import-position
-from pyzwave.adapter import TxOptions
+from pyzwave.adapter import Ack, TxOptions
+from pyzwave.dtlsconnection import DTLSConnection
 from pyzwave.zipgateway import ZIPGateway
 from pyzwave.message import Message
 from pyzwave.commandclass import (
@@ -30,6 +33,7 @@ from pyzwave.commandclass import (
     ZipGateway,
     ZipND,
 )
+from pyzwave.scheduler import OutboundScheduler, Priority, airtime, sendPriority
 from pyzwave.types import IPv6
 import pyzwave.zipconnection
 
@@ -37,12 +41,18 @@ from test_zipconnection import DummyConnection, runDelayed, ZIPConnectionImpl
 
 
 class DummyDTLSConnection:
+    def __init__(self, secure=False):
+        self.secure = secure
+
     async def connect(self, address, psk):
         pass
 
     def onMessage(self, func):
         pass
 
+    def stop(self):
+        pass
+
 
 pyzwave.zipconnection.DTLSConnection = DummyDTLSConnection
 pyzwave.zipconnection.Connection = DummyDTLSConnection
@@ -51,7 +61,7 @@ pyzwave.zipconnection.Connection = DummyDTLSConnection
 class ZIPGatewayTester(ZIPGateway):
     async def waitForAck(self, ackId: int, timeout: int = 3):
         # Auto ack all messages during testing
-        return
+        return Ack.Status.RECEIVED
 
 
 class Listener:
@@ -151,8 +161,89 @@ async def test_connect(gateway: ZIPGateway):
 async def test_connectToNode(gateway: ZIPGateway):
     gateway.ipOfNode = ipOfNode
     assert 2 not in gateway._connections
-    assert await gateway.connectToNode(2)
-    assert 2 in gateway._connections
+    connection = await gateway.connectToNode(2)
+    assert gateway._connections[2] is connection
+    # Transmissions to the node are charged to the gateway budget
+    assert connection._airtimeLimiter is gateway.airtimeLimiter
+
+
+@pytest.mark.asyncio
+async def test_connectToNode_concurrent(gateway: ZIPGateway):
+    lookups = []
+
+    async def slowIpOfNode(nodeId):
+        lookups.append(nodeId)
+        await asyncio.sleep(0.01)
+        return await ipOfNode(nodeId)
+
+    gateway.ipOfNode = slowIpOfNode
+    first, second = await asyncio.gather(
+        gateway.connectToNode(2), gateway.connectToNode(2)
+    )
+    assert first is second
+    assert lookups == [2]
+    assert gateway._connections[2] is first
+    assert not gateway._connecting
+
+
+@pytest.mark.asyncio
+async def test_connectToNode_added_while_connecting(gateway: ZIPGateway):
+    existing = ZIPConnectionImpl(None, None)
+
+    async def slowIpOfNode(nodeId):
+        gateway._connections[nodeId] = existing
+        return await ipOfNode(nodeId)
+
+    gateway.ipOfNode = slowIpOfNode
+    # The connection already handed out is kept
+    assert await gateway.connectToNode(2) is existing
+    assert gateway._connections[2] is existing
+
+
+@pytest.mark.asyncio
+async def test_connectToNode_multiplexDtls(monkeypatch):
+    gateway = ZIPGatewayTester(None, None, multiplexDtls=True)
+    gateway.ipOfNode = ipOfNode
+    received = asyncio.Queue()
+    remotes = []
+
+    def createDtlsPskSock(_self):
+        local, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        remotes.append(remote)
+        return local
+
+    monkeypatch.setattr(DTLSConnection, "createDtlsPskSock", createDtlsPskSock)
+    monkeypatch.setattr(
+        pyzwave.zipconnection.ZIPConnection,
+        "onPacket",
+        lambda self, pkt: received.put_nowait((self, pkt)),
+    )
+    connections = [await gateway.connectToNode(nodeId) for nodeId in range(2, 7)]
+    # All node connections are read from one thread
+    assert [
+        thread.name
+        for thread in threading.enumerate()
+        if thread.name.startswith("Z-Wave DTLS")
+    ] == ["Z-Wave DTLS multiplexer"]
+    for connection in connections:
+        assert isinstance(connection._conn, DTLSConnection)
+    remotes[3].send(b"\x23\x02")
+    assert await asyncio.wait_for(received.get(), timeout=2) == (
+        connections[3],
+        b"\x23\x02",
+    )
+    gateway.close()
+    gateway._multiplexer.join(timeout=2)
+    assert not gateway._multiplexer.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_connectToNode_secure():
+    gateway = ZIPGatewayTester(None, None, secure=True)
+    gateway.ipOfNode = ipOfNode
+    assert gateway._conn.secure
+    connection = await gateway.connectToNode(2)
+    assert connection._conn.secure
 
 
 @pytest.mark.asyncio
@@ -261,6 +352,23 @@ async def test_getNodeList(gateway: ZIPGateway):
     assert gateway.nodeId == 1
 
 
+@pytest.mark.asyncio
+async def test_nmSeq(gateway: ZIPGateway):
+    sent = []
+
+    async def dummySendAndReceive(cmd, _waitFor, **_kwargs):
+        sent.append(cmd.seqNo)
+        await asyncio.sleep(0)
+        raise asyncio.TimeoutError()
+
+    gateway.sendAndReceive = dummySendAndReceive
+    # Concurrent requests must not share a sequence number
+    await asyncio.gather(*[gateway.getNodeInfo(i) for i in range(300)])
+    assert len(set(sent[:256])) == 256
+    assert all(0 <= seqNo <= 255 for seqNo in sent)
+    assert len(gateway._nmSeq) == 0
+
+
 @pytest.mark.asyncio
 async def test_getNodeList_cached(gateway: ZIPGateway):
     gateway._nodes = {1: {}, 2: {}}
@@ -311,13 +419,15 @@ async def test_ipOfNode(gateway: ZIPGateway):
 def test_onMessageReceived(gateway: ZIPGateway):
     connection = DummyConnection()
     msg = Basic.Get()
-    gateway._connections = {2: connection}
+    gateway._connections.clear()
+    gateway._connections[2] = connection
     gateway.onMessageReceived(connection, Zip.ZipPacket(sourceEP=0, command=msg))
     gateway.listener.messageReceived.assert_called_once_with(gateway, 2, 0, msg, 0)
 
 
 def test_onMessageReceived_noNode(gateway: ZIPGateway):
-    gateway._connections = {2: DummyConnection()}
+    gateway._connections.clear()
+    gateway._connections[2] = DummyConnection()
     gateway.onMessageReceived(DummyConnection(), Basic.Get())
     gateway.listener.messageReceived.assert_not_called()
 
@@ -340,6 +450,28 @@ def test_onUnsolicitedMessage(gateway: ZIPGateway):
     )
 
 
+@pytest.mark.asyncio
+async def test_onUnsolicitedMessage_duplicate(gateway: ZIPGateway):
+    ip = ipaddress.IPv6Address("::ffff:c0a8:ee")
+    gateway._nodes = {7: {"ip": ip}}
+    pkt = b"#\x02\x80\xc0\xf9\x00\x00\x05\x84\x02\x00\x00%\x03\x00"
+    assert gateway.onUnsolicitedMessage(pkt, (ip, 4123)) is True
+    assert gateway.onUnsolicitedMessage(pkt, (ip, 4123)) is True
+    assert gateway._unsolicitedConnection.sendTo.call_count == 2
+    gateway.listener.messageReceived.assert_called_once()
+    # Not acked, but still filtered
+    pkt = b"#\x02\x00\xc0\xfa\x00\x00\x05\x84\x02\x00\x00%\x03\x00"
+    assert gateway.onUnsolicitedMessage(pkt, (ip, 4123)) is True
+    assert gateway.onUnsolicitedMessage(pkt, (ip, 4123)) is True
+    assert gateway._unsolicitedConnection.sendTo.call_count == 2
+    assert gateway.listener.messageReceived.call_count == 2
+    # The same sequence number from another node is not a duplicate
+    other = ipaddress.IPv6Address("::ffff:c0a8:ef")
+    gateway._nodes[8] = {"ip": other}
+    assert gateway.onUnsolicitedMessage(pkt, (other, 4123)) is True
+    assert gateway.listener.messageReceived.call_count == 3
+
+
 def test_onUnsolicitedMessage_unknownNode(gateway: ZIPGateway):
     ip = ipaddress.IPv6Address("::ffff:c0a8:ee")
     gateway._nodes = {7: {"ip": ipaddress.IPv6Address("::ffff:c0a8:ef")}}
@@ -396,6 +528,40 @@ async def test_removeNodeTimeout(gateway: ZIPGateway):
     assert await gateway.removeNode() is False
 
 
+@pytest.mark.asyncio
+async def test_sendMulticast(gateway: ZIPGateway):
+    assert gateway.supportsMulticast is True
+    gateway._conn.send = MagicMock()
+    assert await gateway.sendMulticast({2, 3}, Basic.Set(value=0), destEP=1) is True
+    pkt = Message.decode(gateway._conn.send.call_args[0][0])
+    assert pkt.headerExtension.multicastAddressing == {2, 3}
+    assert pkt.destEP == 1
+    assert pkt.command == Basic.Set(value=0)
+    # One transmission reaches all the nodes
+    assert gateway.airtimeLimiter.used == pytest.approx(airtime(3))
+
+
+@pytest.mark.asyncio
+async def test_sendMulticast_scheduled(gateway: ZIPGateway):
+    gateway._conn.send = MagicMock()
+    gateway._scheduler = OutboundScheduler(maxActive=1)
+    with patch.object(
+        Basic.Set, "compose", autospec=True, side_effect=Message.compose
+    ) as compose:
+        await gateway.scheduler.acquire(6)
+        multicast = asyncio.ensure_future(
+            gateway.sendMulticast({2, 3}, Basic.Set(value=0))
+        )
+        await asyncio.sleep(0)
+        # Waits for a free slot like messages to single nodes
+        assert gateway.scheduler.pending == 1
+        gateway.scheduler.release(6)
+        assert await multicast is True
+        # The command is composed once for the airtime and the frame
+        assert compose.call_count == 1
+    assert gateway.scheduler.active == 0
+
+
 @pytest.mark.asyncio
 async def test_sendToNode(gateway: ZIPGateway):
     connection = await gateway.connectToNode(6)
@@ -404,6 +570,45 @@ async def test_sendToNode(gateway: ZIPGateway):
         runDelayed(connection.ackReceived, Zip.ZipPacket(seqNo=1)),
     )
     assert res == True
+    with patch.object(
+        Basic.Get, "compose", autospec=True, side_effect=Message.compose
+    ) as compose:
+        [res, _] = await asyncio.gather(
+            gateway.sendToNode(6, Basic.Get()),
+            runDelayed(connection.ackReceived, Zip.ZipPacket(seqNo=2)),
+        )
+        assert res is True
+        assert compose.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_sendToNode_priority(gateway: ZIPGateway):
+    sent = []
+
+    class Connection:
+        lastWorkingRoute = None
+
+        async def send(self, cmd, **_kwargs):
+            sent.append(cmd.value)
+            await asyncio.sleep(0)
+            return True
+
+    async def connectToNode(_nodeId):
+        return Connection()
+
+    gateway.connectToNode = connectToNode
+    with sendPriority(Priority.MAINTENANCE):
+        background = [
+            asyncio.ensure_future(gateway.sendToNode(6, Basic.Set(value=i)))
+            for i in range(6)
+        ]
+    await asyncio.sleep(0)
+    # The send window of the node is filled
+    assert gateway.scheduler.active == gateway.window == 4
+    assert gateway.scheduler.pending == 2
+    assert await gateway.sendToNode(6, Basic.Set(value=99)) is True
+    await asyncio.gather(*background)
+    assert sent == [0, 1, 2, 3, 99, 4, 5]
 
 
 @pytest.mark.asyncio
@@ -444,3 +649,17 @@ async def test_setupUnsolicitedConnection(gateway: ZIPGateway):
         ),
     )
     assert gateway._nodes == {1: {"ip": IPv6("2001:db8::1")}}
+
+
+@pytest.mark.asyncio
+async def test_connectionPool(gateway: ZIPGateway):
+    gateway.ipOfNode = ipOfNode
+    pool = gateway.connectionPool
+    assert pool.maxSize == 32
+    assert await gateway.connectToNode(6) is pool[6]
+    assert pool.metrics == {"size": 1, "hits": 1, "misses": 0, "evictions": 0}
+    connection = await gateway.connectToNode(7)
+    assert pool.metrics == {"size": 2, "hits": 1, "misses": 1, "evictions": 0}
+    assert await gateway.connectToNode(7) is connection
+    gateway.connectionPool.clear()
+    assert len(pool) == 0